@@ -0,0 +1,202 @@
+"""Benchmark de arranque: cuánto tarda un worker en poder atender peticiones.
+
+Cada medición corre en un intérprete nuevo y registra:
+
+    importar_ms            `from app import create_app` (modelos, blueprints, comandos)
+    create_app_ms          construir la aplicación
+    primera_peticion_ms    primera petición (GET /libros), que abre la primera conexión
+    conexiones_al_arrancar conexiones abiertas antes de esa petición (debe ser 0)
+
+Con `--workers N` además se simula gunicorn con N workers:
+
+    sin_preload  N intérpretes nuevos, cada uno importa, construye y atiende
+    con_preload  la aplicación se construye una vez y los N hijos nacen por
+                 fork; `conexiones_propias` de cada hijo debe ser 1: no usa la
+                 conexión que el padre dejó en el pool
+
+`listo_ms` es lo que tarda cada worker, desde que se lanza, en responder su
+primera petición.
+
+Uso:
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/arranque.py --repeticiones 10 --workers 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+RUTA = '/libros'
+REPETICIONES = 10
+
+
+def ms(segundos):
+    return round(segundos * 1000, 1)
+
+
+def contador_conexiones():
+    from sqlalchemy import event
+    from sqlalchemy.pool import Pool
+
+    contador = [0]
+
+    def contar(*_):
+        contador[0] += 1
+
+    event.listen(Pool, 'connect', contar)
+    return contador
+
+
+# ---------------------------
+# MEDICIONES (en el proceso hijo)
+# ---------------------------
+def arrancar():
+    inicio = time.perf_counter()
+    conexiones = contador_conexiones()
+    from app import create_app
+    importado = time.perf_counter()
+    app = create_app()
+    creada = time.perf_counter()
+    al_arrancar = conexiones[0]
+    estado = app.test_client().get(RUTA).status_code
+    fin = time.perf_counter()
+    return {
+        'importar_ms': ms(importado - inicio),
+        'create_app_ms': ms(creada - importado),
+        'primera_peticion_ms': ms(fin - creada),
+        'total_ms': ms(fin - inicio),
+        'conexiones_al_arrancar': al_arrancar,
+        'estado': estado,
+    }
+
+
+def prefork(workers):
+    conexiones = contador_conexiones()
+    from sqlalchemy import text
+
+    from app import create_app
+    from database import db
+
+    app = create_app()
+    # Peor caso: algo en el padre ya usó la base y dejó la conexión en el pool
+    with app.app_context():
+        db.session.execute(text('SELECT 1'))
+        db.session.close()
+    hijos = []
+    inicio = time.perf_counter()
+    for _ in range(workers):
+        lectura, escritura = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(lectura)
+            previas = conexiones[0]
+            estado = app.test_client().get(RUTA).status_code
+            datos = {
+                'listo_ms': ms(time.perf_counter() - inicio),
+                'conexiones_propias': conexiones[0] - previas,
+                'estado': estado,
+            }
+            os.write(escritura, json.dumps(datos).encode())
+            os._exit(0)
+        os.close(escritura)
+        hijos.append((pid, lectura))
+    resultados = []
+    for pid, lectura in hijos:
+        with os.fdopen(lectura) as tuberia:
+            resultados.append(json.loads(tuberia.read()))
+        os.waitpid(pid, 0)
+    return resultados
+
+
+# ---------------------------
+# ORQUESTACIÓN
+# ---------------------------
+def lanzar(*argumentos):
+    return subprocess.Popen(
+        [sys.executable, __file__, '--interno', *argumentos],
+        stdout=subprocess.PIPE, text=True, cwd=RAIZ,
+    )
+
+
+def leer(proceso):
+    salida, _ = proceso.communicate()
+    if proceso.returncode:
+        raise SystemExit(f'el proceso de medición terminó con código {proceso.returncode}')
+    return json.loads(salida)
+
+
+def resumir(muestras, campo):
+    valores = [m[campo] for m in muestras]
+    return {
+        'p50': round(statistics.median(valores), 1),
+        'max': max(valores),
+    }
+
+
+def sin_preload(workers):
+    inicio = time.perf_counter()
+    procesos = [lanzar('arrancar') for _ in range(workers)]
+    muestras = []
+    for proceso in procesos:
+        muestra = leer(proceso)
+        muestra['listo_ms'] = ms(time.perf_counter() - inicio)
+        muestras.append(muestra)
+    return {
+        'listo_ms': resumir(muestras, 'listo_ms'),
+        'conexiones_al_arrancar': max(m['conexiones_al_arrancar'] for m in muestras),
+        'errores': sum(m['estado'] >= 500 for m in muestras),
+    }
+
+
+def con_preload(workers):
+    inicio = time.perf_counter()
+    muestras = leer(lanzar('prefork', str(workers)))
+    return {
+        'padre_ms': ms(time.perf_counter() - inicio),
+        'listo_ms': resumir(muestras, 'listo_ms'),
+        'conexiones_propias': sorted({m['conexiones_propias'] for m in muestras}),
+        'errores': sum(m['estado'] >= 500 for m in muestras),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    parser.add_argument('--workers', type=int, default=0, help='Simula N workers con y sin --preload.')
+    parser.add_argument('--salida', help='Archivo donde guardar el informe JSON.')
+    parser.add_argument('--interno', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        if args.interno[0] == 'prefork':
+            print(json.dumps(prefork(int(args.interno[1]))))
+        else:
+            print(json.dumps(arrancar()))
+        return
+
+    muestras = [leer(lanzar('arrancar')) for _ in range(args.repeticiones)]
+    informe = {
+        'arranque': {
+            campo: resumir(muestras, campo)
+            for campo in ('importar_ms', 'create_app_ms', 'primera_peticion_ms', 'total_ms')
+        },
+        'conexiones_al_arrancar': max(m['conexiones_al_arrancar'] for m in muestras),
+    }
+    if args.workers:
+        informe['sin_preload'] = sin_preload(args.workers)
+        if hasattr(os, 'fork'):
+            informe['con_preload'] = con_preload(args.workers)
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        Path(args.salida).write_text(texto + '\n', encoding='utf-8')
+    print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""Benchmark de concurrencia: varios procesos leyendo y escribiendo a la vez.
+
+Simula N workers de gunicorn contra el mismo archivo SQLite. Cada proceso
+abre su propio motor y, durante el tiempo indicado, alterna lecturas (la
+primera página del listado de préstamos) y escrituras (prestar un ejemplar con
+`disponibilidad.prestar` o devolver uno, que además disparan los triggers de
+estadísticas). Se comparan dos perfiles:
+
+    base  journal por defecto (rollback) y sin PRAGMA
+    wal   el perfil de configuracion.py (WAL, synchronous=NORMAL, busy_timeout...)
+
+Al terminar se comprueba que ningún título haya prestado más ejemplares de
+los que tiene: con préstamos concurrentes sobre pocos ejemplares, cualquier
+carrera entre leer y descontar aparecería como una diferencia.
+
+Uso:
+    python benchmarks/concurrencia.py --procesos 8 --segundos 10 --escrituras 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+import configuracion  # noqa: E402
+import disponibilidad  # noqa: E402
+
+LECTURA = text("""
+    SELECT p.id, p.fecha_prestamo, p.fecha_devolucion, p.devuelto, l.titulo, u.nombre
+    FROM prestamo p
+    JOIN libro l ON l.id = p.libro_id
+    JOIN usuario u ON u.id = p.usuario_id
+    ORDER BY p.fecha_prestamo DESC, p.id DESC
+    LIMIT 50
+""")
+ESCRITURA = text("""
+    INSERT INTO prestamo (libro_id, usuario_id, fecha_prestamo, fecha_devolucion, devuelto)
+    VALUES (:libro_id, :usuario_id, :fecha_prestamo, :fecha_devolucion, 0)
+""")
+
+INVARIANTE = text("""
+    SELECT COUNT(*) FROM disponibilidad d
+    WHERE d.ejemplares - d.disponibles != (
+        SELECT COUNT(*) FROM prestamo p WHERE p.libro_id = d.libro_id AND p.devuelto = 0
+    ) + (
+        SELECT COUNT(*) FROM reserva r WHERE r.libro_id = d.libro_id AND r.estado = 'lista'
+    )
+""")
+
+LIBROS = 2000
+USUARIOS = 500
+PRESTAMOS = 20000
+EJEMPLARES = 12
+
+
+def crear_base(ruta, perfil):
+    """Crea el esquema de la aplicación en `ruta` y carga datos de prueba."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta}'
+    from app import create_app
+    from database import db
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(text("INSERT INTO autor (nombre) VALUES ('Autor de prueba')"))
+        db.session.execute(
+            text("INSERT INTO libro (titulo, autor_id) VALUES (:titulo, 1)"),
+            [{'titulo': f'Libro {i}'} for i in range(LIBROS)],
+        )
+        db.session.execute(
+            text("INSERT INTO usuario (nombre, email) VALUES (:nombre, :email)"),
+            [{'nombre': f'Usuario {i}', 'email': f'usuario{i}@example.org'} for i in range(USUARIOS)],
+        )
+        db.session.execute(ESCRITURA, [_prestamo(random.Random(i)) for i in range(PRESTAMOS)])
+        db.session.execute(text('UPDATE disponibilidad SET ejemplares = :n, disponibles = :n'), {'n': EJEMPLARES})
+        disponibilidad.reconstruir(db.session.connection())
+        db.session.commit()
+        db.session.close()
+        # La aplicación ya deja el archivo en WAL; el perfil base vuelve al journal clásico
+        with db.engine.connect() as conexion:
+            conexion.exec_driver_sql(f"PRAGMA journal_mode = {'WAL' if perfil == 'wal' else 'DELETE'}")
+        db.engine.dispose()
+
+
+def _prestamo(azar):
+    inicio = date(2024, 1, 1) + timedelta(days=azar.randint(0, 700))
+    return {
+        'libro_id': azar.randint(1, LIBROS),
+        'usuario_id': azar.randint(1, USUARIOS),
+        'fecha_prestamo': inicio.isoformat(),
+        'fecha_devolucion': (inicio + timedelta(days=14)).isoformat(),
+    }
+
+
+def trabajador(args):
+    ruta, perfil, segundos, proporcion_escrituras, semilla = args
+    engine = create_engine(f'sqlite:///{ruta}')
+    if perfil == 'wal':
+        configuracion.aplicar_pragmas(engine)
+    azar = random.Random(semilla)
+    lecturas, escrituras, errores, sin_ejemplares = [], [], 0, 0
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        escribir = azar.random() < proporcion_escrituras
+        inicio = time.perf_counter()
+        try:
+            if escribir and azar.random() < 0.5:
+                with engine.begin() as conexion:
+                    disponibilidad.devolver(conexion, [azar.randint(1, PRESTAMOS)])
+            elif escribir:
+                prestamo = _prestamo(azar)
+                with engine.begin() as conexion:
+                    disponibilidad.prestar(
+                        conexion, prestamo['libro_id'], prestamo['usuario_id'],
+                        date.fromisoformat(prestamo['fecha_prestamo']),
+                        date.fromisoformat(prestamo['fecha_devolucion']),
+                    )
+            else:
+                with engine.connect() as conexion:
+                    conexion.execute(LECTURA).all()
+        except OperationalError:
+            errores += 1
+            continue
+        except disponibilidad.SinEjemplares:
+            sin_ejemplares += 1
+        (escrituras if escribir else lecturas).append(time.perf_counter() - inicio)
+    engine.dispose()
+    return lecturas, escrituras, errores, sin_ejemplares
+
+
+def verificar(ruta):
+    """Cantidad de libros cuyos disponibles no cuadran con los préstamos pendientes."""
+    engine = create_engine(f'sqlite:///{ruta}')
+    with engine.connect() as conexion:
+        inconsistentes = conexion.execute(INVARIANTE).scalar()
+    engine.dispose()
+    return inconsistentes
+
+
+def percentiles(muestras):
+    if len(muestras) < 2:
+        return {'p50': None, 'p95': None, 'p99': None}
+    cortes = statistics.quantiles(muestras, n=100)
+    return {f'p{p}': round(cortes[p - 1] * 1000, 3) for p in (50, 95, 99)}
+
+
+def medir(perfil, procesos, segundos, proporcion_escrituras):
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'bench.db')
+        contexto = multiprocessing.get_context('spawn')
+        # La base se crea en otro proceso porque create_app() lee DATABASE_URL del entorno
+        with contexto.Pool(1) as pool:
+            pool.apply(crear_base, (ruta, perfil))
+        tareas = [(ruta, perfil, segundos, proporcion_escrituras, i) for i in range(procesos)]
+        with contexto.Pool(procesos) as pool:
+            resultados = pool.map(trabajador, tareas)
+        inconsistentes = verificar(ruta)
+    lecturas = [m for r in resultados for m in r[0]]
+    escrituras = [m for r in resultados for m in r[1]]
+    return {
+        'perfil': perfil,
+        'procesos': procesos,
+        'lecturas_por_segundo': round(len(lecturas) / segundos, 1),
+        'escrituras_por_segundo': round(len(escrituras) / segundos, 1),
+        'errores_bloqueo': sum(r[2] for r in resultados),
+        'sin_ejemplares': sum(r[3] for r in resultados),
+        'libros_inconsistentes': inconsistentes,
+        'lectura_ms': percentiles(lecturas),
+        'escritura_ms': percentiles(escrituras),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--procesos', type=int, default=8)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--escrituras', type=float, default=0.2, help='Proporción de operaciones que escriben.')
+    parser.add_argument('--perfil', choices=['base', 'wal', 'ambos'], default='ambos')
+    args = parser.parse_args()
+
+    perfiles = ['base', 'wal'] if args.perfil == 'ambos' else [args.perfil]
+    informe = [medir(p, args.procesos, args.segundos, args.escrituras) for p in perfiles]
+    print(json.dumps(informe, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""Generador de datos sintéticos reproducibles para benchmarks.
+
+Llena `autor`, `libro`, `usuario` y `prestamo` con los volúmenes pedidos y
+distribuciones sesgadas como las de una biblioteca real: la cantidad de libros
+por autor, la popularidad de cada libro y la actividad de cada usuario siguen
+una ley de Zipf (`--zipf 0` la vuelve uniforme). Con la misma semilla se
+generan exactamente los mismos datos.
+
+Los préstamos se reparten en los últimos `--anios` años; los que ya vencieron
+están casi todos devueltos y el resto queda pendiente, así que las vistas de
+pendientes y vencidos tienen volúmenes realistas. Las filas se insertan por
+lotes con los triggers activos, de modo que estadísticas, búsqueda y vencidos
+quedan al día; sólo los disponibles por título se recalculan al final.
+
+Uso:
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/generar_datos.py \\
+        --libros 1000000 --prestamos 5000000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+
+LOTE = 10000
+DIAS_PRESTAMO = 14
+PROPORCION_DEVUELTOS = 0.97
+
+NOMBRES = [
+    'Ana', 'Beatriz', 'Carlos', 'Diego', 'Elena', 'Federico', 'Gabriela', 'Héctor', 'Inés', 'Julián',
+    'Lucía', 'Martín', 'Natalia', 'Óscar', 'Paula', 'Ramiro', 'Sofía', 'Tomás', 'Valeria', 'Ximena',
+]
+APELLIDOS = [
+    'García', 'Fernández', 'López', 'Martínez', 'González', 'Pérez', 'Rodríguez', 'Sánchez', 'Romero',
+    'Díaz', 'Torres', 'Álvarez', 'Ruiz', 'Castro', 'Núñez', 'Ortega', 'Méndez', 'Ibáñez', 'Cortázar',
+]
+NACIONALIDADES = ['Argentina', 'Chile', 'Colombia', 'España', 'México', 'Perú', 'Uruguay', 'Venezuela']
+GENEROS = ['Novela', 'Cuento', 'Poesía', 'Ensayo', 'Historia', 'Ciencia', 'Infantil', 'Teatro', 'Biografía']
+PALABRAS = [
+    'amor', 'noche', 'ciudad', 'tiempo', 'sombra', 'memoria', 'río', 'casa', 'silencio', 'jardín',
+    'viaje', 'mar', 'fuego', 'invierno', 'corazón', 'camino', 'isla', 'espejo', 'laberinto', 'canción',
+    'guerra', 'pájaro', 'otoño', 'ciencia', 'historia', 'montaña', 'desierto', 'lluvia', 'luna', 'sueño',
+]
+
+
+class Zipf:
+    """Muestreo con pesos 1/k**s sobre `ids`, en un orden aleatorio fijo por semilla."""
+
+    def __init__(self, ids, s, azar):
+        self.ids = list(ids)
+        azar.shuffle(self.ids)
+        self.acumulado = list(itertools.accumulate(1 / k ** s for k in range(1, len(self.ids) + 1)))
+        self.azar = azar
+
+    def muestras(self, k):
+        return self.azar.choices(self.ids, cum_weights=self.acumulado, k=k)
+
+
+def _nombre(azar):
+    return f'{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}'
+
+
+def _titulo(azar):
+    palabras = azar.sample(PALABRAS, azar.randint(1, 3))
+    return ' '.join(palabras).capitalize()
+
+
+def autores(azar, n):
+    for _ in range(n):
+        yield {'nombre': _nombre(azar), 'nacionalidad': azar.choice(NACIONALIDADES)}
+
+
+def libros(azar, n, autores_zipf):
+    while n > 0:
+        k = min(LOTE, n)
+        n -= k
+        for autor_id in autores_zipf.muestras(k):
+            yield {
+                'titulo': _titulo(azar),
+                'genero': azar.choice(GENEROS),
+                'anio_publicacion': azar.randint(1900, 2025),
+                'autor_id': autor_id,
+            }
+
+
+def usuarios(azar, n):
+    for i in range(1, n + 1):
+        nombre = _nombre(azar)
+        yield {
+            'nombre': nombre,
+            'email': f'usuario{i}@example.org',
+            'telefono': f'+54 11 {azar.randint(4000, 6999)}-{azar.randint(1000, 9999)}',
+            'rol': 'bibliotecario' if azar.random() < 0.01 else 'lector',
+        }
+
+
+def prestamos(azar, n, libros_zipf, usuarios_zipf, hoy, anios):
+    dias = 365 * anios
+    while n > 0:
+        k = min(LOTE, n)
+        n -= k
+        for libro_id, usuario_id in zip(libros_zipf.muestras(k), usuarios_zipf.muestras(k)):
+            inicio = hoy - timedelta(days=azar.randint(0, dias))
+            devolucion = inicio + timedelta(days=DIAS_PRESTAMO)
+            yield {
+                'libro_id': libro_id,
+                'usuario_id': usuario_id,
+                'fecha_prestamo': inicio.isoformat(),
+                'fecha_devolucion': devolucion.isoformat(),
+                'devuelto': devolucion < hoy and azar.random() < PROPORCION_DEVUELTOS,
+            }
+
+
+INSERTS = {
+    'autor': text('INSERT INTO autor (nombre, nacionalidad) VALUES (:nombre, :nacionalidad)'),
+    'libro': text('INSERT INTO libro (titulo, genero, anio_publicacion, autor_id) '
+                  'VALUES (:titulo, :genero, :anio_publicacion, :autor_id)'),
+    'usuario': text('INSERT INTO usuario (nombre, email, telefono, rol) '
+                    'VALUES (:nombre, :email, :telefono, :rol)'),
+    'prestamo': text('INSERT INTO prestamo (libro_id, usuario_id, fecha_prestamo, fecha_devolucion, devuelto) '
+                     'VALUES (:libro_id, :usuario_id, :fecha_prestamo, :fecha_devolucion, :devuelto)'),
+}
+
+
+def insertar(engine, tabla, filas, total):
+    """Inserta `filas` por lotes y devuelve el rango de ids asignados."""
+    with engine.connect() as conexion:
+        primero = (conexion.execute(text(f'SELECT MAX(id) FROM {tabla}')).scalar() or 0) + 1
+    inicio = time.perf_counter()
+    insertados = 0
+    filas = iter(filas)
+    while lote := list(itertools.islice(filas, LOTE)):
+        with engine.begin() as conexion:
+            conexion.execute(INSERTS[tabla], lote)
+        insertados += len(lote)
+        segundos = time.perf_counter() - inicio
+        print(f'\r{tabla}: {insertados}/{total} ({insertados / segundos:.0f} filas/s)', end='', flush=True)
+    print()
+    return range(primero, primero + insertados)
+
+
+def generar(engine, autores_n, libros_n, usuarios_n, prestamos_n, s=1.1, semilla=42, anios=3, hoy=None):
+    import cache_respuestas
+    import disponibilidad
+    import vencidos
+
+    hoy = hoy or date.today()
+    azar = random.Random(semilla)
+    ids_autores = insertar(engine, 'autor', autores(azar, autores_n), autores_n)
+    ids_libros = insertar(engine, 'libro', libros(azar, libros_n, Zipf(ids_autores, s, azar)), libros_n)
+    ids_usuarios = insertar(engine, 'usuario', usuarios(azar, usuarios_n), usuarios_n)
+    insertar(engine, 'prestamo', prestamos(
+        azar, prestamos_n, Zipf(ids_libros, s, azar), Zipf(ids_usuarios, s, azar), hoy, anios,
+    ), prestamos_n)
+    with engine.begin() as conexion:
+        vencidos.actualizar(conexion, hoy)
+        disponibilidad.reconstruir(conexion)
+        cache_respuestas.incrementar(conexion, cache_respuestas.TABLAS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--autores', type=int, default=20000)
+    parser.add_argument('--libros', type=int, default=100000)
+    parser.add_argument('--usuarios', type=int, default=50000)
+    parser.add_argument('--prestamos', type=int, default=500000)
+    parser.add_argument('--zipf', type=float, default=1.1, help='Exponente de Zipf (0 = uniforme).')
+    parser.add_argument('--anios', type=int, default=3, help='Años de historial de préstamos.')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--url', help='URI de la base (por defecto DATABASE_URL).')
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ['DATABASE_URL'] = args.url
+    from app import create_app
+    from database import db
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        with db.engine.connect() as conexion:
+            if conexion.execute(text('SELECT COUNT(*) FROM autor')).scalar():
+                parser.error('la base ya tiene datos; los benchmarks necesitan una base vacía')
+        inicio = time.perf_counter()
+        generar(db.engine, args.autores, args.libros, args.usuarios, args.prestamos,
+                s=args.zipf, semilla=args.semilla, anios=args.anios)
+    print(f'Datos generados en {time.perf_counter() - inicio:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Benchmark de plantillas: render de los listados con y sin caché de fragmentos.
+
+Renderiza `libros.html`, `prestamos.html` y `usuarios.html` con filas
+sintéticas (no hace falta base de datos) para cada tamaño de `--filas`, y
+registra la mediana en milisegundos de:
+
+    sin_cache        CACHE_FRAGMENTOS_MAX=0: el bucle completo, como antes
+    frio             caché vacía: cada fila se renderiza y se guarda
+    caliente         todas las filas salen de la caché
+    una_fila_nueva   caliente, pero con una fila modificada (una escritura)
+
+Además mide la carga de todas las plantillas en un entorno nuevo:
+
+    compilar_ms      sin caché de bytecode (lo que paga cada worker nuevo)
+    bytecode_ms      con la caché de bytecode ya llena (JINJA_CACHE_DIR)
+
+Uso:
+    python benchmarks/plantillas.py --filas 50 500 5000 --repeticiones 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import render_template  # noqa: E402
+from jinja2 import FileSystemBytecodeCache  # noqa: E402
+
+from cache_respuestas import CacheMemoria  # noqa: E402
+
+REPETICIONES = 20
+
+FilaLibro = namedtuple('FilaLibro', ['id', 'titulo', 'genero', 'anio_publicacion', 'autor'])
+FilaPrestamo = namedtuple('FilaPrestamo', ['id', 'fecha_prestamo', 'fecha_devolucion', 'devuelto', 'libro', 'usuario'])
+FilaUsuario = namedtuple('FilaUsuario', ['id', 'nombre', 'email', 'telefono', 'rol'])
+
+
+def filas(plantilla, n, hoy):
+    if plantilla == 'libros.html':
+        return [FilaLibro(i, f'Libro {i}', 'Novela', 1900 + i % 120, f'Autor {i % 300}') for i in range(1, n + 1)]
+    if plantilla == 'prestamos.html':
+        return [
+            FilaPrestamo(
+                i, hoy - timedelta(days=i % 40), hoy - timedelta(days=i % 40 - 14), i % 3 == 0,
+                f'Libro {i % 5000}', f'Usuario {i % 800}',
+            )
+            for i in range(1, n + 1)
+        ]
+    return [FilaUsuario(i, f'Usuario {i}', f'usuario{i}@example.org', f'555-{i:04d}', 'lector') for i in range(1, n + 1)]
+
+
+def contexto(plantilla, lista, hoy):
+    nombre = plantilla.removesuffix('.html')
+    extra = {'hoy': hoy, 'estados': ('pendientes', 'devueltos', 'vencidos')} if nombre == 'prestamos' else {}
+    return {nombre: lista, 'pagina': None, **extra}
+
+
+def mediana_ms(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return round(statistics.median(tiempos) * 1000, 3)
+
+
+def medir_render(app, tamanios, repeticiones):
+    entorno = app.jinja_env
+    hoy = date.today()
+    informe = {}
+    with app.test_request_context('/'):
+        for plantilla in ('libros.html', 'prestamos.html', 'usuarios.html'):
+            for n in tamanios:
+                lista = filas(plantilla, n, hoy)
+                datos = contexto(plantilla, lista, hoy)
+
+                def renderizar(datos=datos):
+                    return render_template(plantilla, **datos)
+
+                renderizar()  # compila la plantilla fuera de la medición
+                entorno.fragmentos = None
+                sin_cache = mediana_ms(renderizar, repeticiones)
+                esperado = renderizar()
+
+                entorno.fragmentos = CacheMemoria(max(n * 2, 1))
+
+                def en_frio():
+                    entorno.fragmentos.clear()
+                    return renderizar()
+
+                frio = mediana_ms(en_frio, repeticiones)
+                caliente = mediana_ms(renderizar, repeticiones)
+                iguales = renderizar() == esperado
+
+                # Una escritura por vuelta, cada vez en otra fila: sólo esa se vuelve a renderizar
+                modificadas = iter(range(repeticiones))
+
+                def tras_escribir():
+                    i = next(modificadas) % n
+                    modificada = list(lista)
+                    modificada[i] = lista[i]._replace(id=-lista[i].id)
+                    return render_template(plantilla, **contexto(plantilla, modificada, hoy))
+
+                una_fila = mediana_ms(tras_escribir, repeticiones)
+
+                informe[f'{plantilla} ({n} filas)'] = {
+                    'sin_cache': sin_cache,
+                    'frio': frio,
+                    'caliente': caliente,
+                    'una_fila_nueva': una_fila,
+                    'aceleracion': round(sin_cache / caliente, 1) if caliente else None,
+                    'mismo_html': iguales,
+                }
+    return informe
+
+
+def medir_carga(app, repeticiones):
+    """Cargar todas las plantillas en un entorno nuevo, compilando o desde la caché de bytecode."""
+    nombres = app.jinja_env.list_templates(extensions=('html',))
+
+    def cargar(bytecode):
+        entorno = app.create_jinja_environment()
+        entorno.bytecode_cache = bytecode
+        for nombre in nombres:
+            entorno.get_template(nombre)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        cargar(FileSystemBytecodeCache(carpeta))
+        return {
+            'plantillas': len(nombres),
+            'compilar_ms': mediana_ms(lambda: cargar(None), repeticiones),
+            'bytecode_ms': mediana_ms(lambda: cargar(FileSystemBytecodeCache(carpeta)), repeticiones),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    args = parser.parse_args()
+
+    os.environ.setdefault('JINJA_CACHE_DIR', '')
+    from app import create_app
+
+    app = create_app()
+    informe = {
+        'render_ms': medir_render(app, args.filas, args.repeticiones),
+        'carga': medir_carga(app, args.repeticiones),
+    }
+    print(json.dumps(informe, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
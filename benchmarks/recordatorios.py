@@ -0,0 +1,216 @@
+"""Benchmark de recordatorios: envío de vencidos contra un SMTP local de prueba.
+
+Crea una base temporal con `--usuarios` usuarios que tienen entre uno y tres
+préstamos vencidos, levanta en un hilo un servidor SMTP mínimo (acepta todo,
+con `--latencia` ms por mensaje y una proporción `--fallas` de respuestas
+451 para ejercitar los reintentos) y corre `recordatorios.enviar` dos veces.
+Registra:
+
+    enviados, fallidos     lo que informa la primera corrida
+    por_minuto             mensajes por minuto de la primera corrida
+    recibidos              mensajes que aceptó el servidor (con reintentos, igual a enviados)
+    duplicados             destinatarios que recibieron más de un correo (debe ser 0)
+    conexiones_smtp        conexiones que abrió el pool
+    concurrencia_maxima    conexiones SMTP activas a la vez (<= --conexiones)
+    conexion_bd_max_ms     lo más que estuvo tomada una conexión de la base
+    segunda_corrida        enviados al repetir el mismo día (debe ser 0)
+
+Uso:
+    python benchmarks/recordatorios.py --usuarios 5000 --conexiones 8 --latencia 20 --fallas 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event, text  # noqa: E402
+
+
+# ---------------------------
+# SERVIDOR SMTP DE PRUEBA
+# ---------------------------
+class ServidorPrueba:
+    """SMTP mínimo sobre asyncio: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP y QUIT."""
+
+    def __init__(self, latencia=0.0, fallas=0.0, semilla=1):
+        self.latencia = latencia
+        self.fallas = fallas
+        self.azar = random.Random(semilla)
+        self.recibidos = Counter()
+        self.rechazados = 0
+        self.conexiones = 0
+        self.activas = 0
+        self.concurrencia_maxima = 0
+        self._loop = asyncio.new_event_loop()
+        self._servidor = None
+
+    def iniciar(self):
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        self._servidor = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._atender, '127.0.0.1', 0), self._loop,
+        ).result()
+        return self._servidor.sockets[0].getsockname()[1]
+
+    def detener(self):
+        self._servidor.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _atender(self, lector, escritor):
+        self.conexiones += 1
+        self.activas += 1
+        self.concurrencia_maxima = max(self.concurrencia_maxima, self.activas)
+        destinatarios = []
+
+        def responder(*lineas):
+            escritor.write(''.join(f'{linea}\r\n' for linea in lineas).encode())
+
+        responder('220 prueba ESMTP')
+        try:
+            while linea := await lector.readline():
+                comando = linea.decode('utf-8', 'replace').strip()
+                verbo = comando[:4].upper()
+                if verbo == 'EHLO':
+                    responder('250-prueba', '250-8BITMIME', '250 SMTPUTF8')
+                elif verbo == 'HELO':
+                    responder('250 prueba')
+                elif verbo in ('MAIL', 'RSET'):
+                    destinatarios = []
+                    responder('250 OK')
+                elif verbo == 'RCPT':
+                    destinatarios.append(comando.split(':', 1)[1].strip(' <>'))
+                    responder('250 OK')
+                elif verbo == 'DATA':
+                    responder('354 Terminar con .')
+                    await escritor.drain()
+                    while (await lector.readline()) not in (b'.\r\n', b''):
+                        pass
+                    await asyncio.sleep(self.latencia)
+                    if self.azar.random() < self.fallas:
+                        self.rechazados += 1
+                        responder('451 Intente más tarde')
+                    else:
+                        self.recibidos.update(destinatarios)
+                        responder('250 OK')
+                    destinatarios = []
+                elif verbo == 'NOOP':
+                    responder('250 OK')
+                elif verbo == 'QUIT':
+                    responder('221 Adiós')
+                    break
+                else:
+                    responder('502 No implementado')
+                await escritor.drain()
+        finally:
+            self.activas -= 1
+            escritor.close()
+
+
+# ---------------------------
+# DATOS
+# ---------------------------
+def crear_base(ruta, usuarios, semilla=1):
+    """Esquema de la aplicación en `ruta` con usuarios que tienen préstamos vencidos."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta}'
+    from app import create_app
+    from database import db
+
+    app = create_app()
+    azar = random.Random(semilla)
+    hoy = date.today()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(text("INSERT INTO autor (nombre) VALUES ('Autor de prueba')"))
+        db.session.execute(
+            text("INSERT INTO libro (titulo, autor_id) VALUES (:titulo, 1)"),
+            [{'titulo': f'Libro {i}'} for i in range(1000)],
+        )
+        db.session.execute(
+            text("INSERT INTO usuario (nombre, email) VALUES (:nombre, :email)"),
+            [{'nombre': f'Usuario {i}', 'email': f'usuario{i}@example.org'} for i in range(usuarios)],
+        )
+        prestamos = []
+        for usuario_id in range(1, usuarios + 1):
+            for _ in range(azar.randint(1, 3)):
+                vence = hoy - timedelta(days=azar.randint(1, 60))
+                prestamos.append({
+                    'libro_id': azar.randint(1, 1000), 'usuario_id': usuario_id,
+                    'fecha_prestamo': vence - timedelta(days=14), 'fecha_devolucion': vence,
+                })
+        # Los triggers los agregan a prestamo_vencido al insertarlos
+        db.session.execute(text("""
+            INSERT INTO prestamo (libro_id, usuario_id, fecha_prestamo, fecha_devolucion, devuelto)
+            VALUES (:libro_id, :usuario_id, :fecha_prestamo, :fecha_devolucion, 0)
+        """), prestamos)
+        db.session.commit()
+    return app, db
+
+
+def medir(usuarios, conexiones, latencia_ms, fallas, lote):
+    import recordatorios
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        app, db = crear_base(os.path.join(carpeta, 'recordatorios.db'), usuarios)
+        servidor = ServidorPrueba(latencia_ms / 1000, fallas)
+        puerto = servidor.iniciar()
+        with app.app_context():
+            engine = db.engine
+            tomadas, maximo = {}, [0.0]
+
+            @event.listens_for(engine, 'checkout')
+            def _tomar(conexion_dbapi, registro, proxy):
+                tomadas[id(registro)] = time.perf_counter()
+
+            @event.listens_for(engine, 'checkin')
+            def _devolver(conexion_dbapi, registro):
+                inicio = tomadas.pop(id(registro), None)
+                if inicio is not None:
+                    maximo[0] = max(maximo[0], time.perf_counter() - inicio)
+
+            smtp = {'host': '127.0.0.1', 'puerto': puerto, 'conexiones': conexiones, 'espera': 0.05}
+            primera = recordatorios.enviar(engine, lote=lote, progreso=lambda m: None, **smtp)
+            segunda = recordatorios.enviar(engine, lote=lote, progreso=lambda m: None, **smtp)
+            engine.dispose()
+        servidor.detener()
+    return {
+        'usuarios': usuarios,
+        'conexiones': conexiones,
+        'latencia_ms': latencia_ms,
+        'fallas': fallas,
+        'enviados': primera.enviados,
+        'fallidos': primera.fallidos,
+        'segundos': round(primera.segundos, 2),
+        'por_minuto': round(primera.enviados / primera.segundos * 60) if primera.segundos else None,
+        'recibidos': sum(servidor.recibidos.values()),
+        'reintentados': servidor.rechazados,
+        'duplicados': sum(1 for n in servidor.recibidos.values() if n > 1),
+        'conexiones_smtp': servidor.conexiones,
+        'concurrencia_maxima': servidor.concurrencia_maxima,
+        'conexion_bd_max_ms': round(maximo[0] * 1000, 1),
+        'segunda_corrida': segunda.enviados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=2000)
+    parser.add_argument('--conexiones', type=int, default=8)
+    parser.add_argument('--latencia', type=float, default=20, help='Milisegundos por mensaje en el servidor.')
+    parser.add_argument('--fallas', type=float, default=0.02, help='Proporción de respuestas 451.')
+    parser.add_argument('--lote', type=int, default=200)
+    args = parser.parse_args()
+    informe = medir(args.usuarios, args.conexiones, args.latencia, args.fallas, args.lote)
+    print(json.dumps(informe, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,543 @@
+"""Benchmark de punta a punta: todas las rutas de la aplicación y las consultas de funciones.py.
+
+Cada caso se ejecuta `--iteraciones` veces (después de un par de vueltas de
+calentamiento) con el cliente de pruebas de Flask, o dentro de un contexto de
+aplicación con `db.session` para las funciones del servicio. Por caso se
+registra:
+
+    ms               latencia p50/p95/p99 en milisegundos
+    consultas        sentencias SQL por ejecución (mediana)
+    memoria_pico_kb  pico de memoria Python de una ejecución, medida aparte
+                     con tracemalloc para no distorsionar la latencia
+    errores          ejecuciones que respondieron 5xx o lanzaron una excepción
+
+Las páginas cacheadas se miden en frío (se vacía la caché antes de cada
+ejecución) salvo con `--con-cache`. Las escrituras de funciones.py se hacen
+con rollback y las rutas que borran primero crean lo que van a borrar, así que
+la base queda prácticamente igual entre corridas. El informe JSON está
+indexado por nombre de caso para poder compararlo entre versiones:
+
+    python benchmarks/generar_datos.py --url sqlite:////tmp/bench.db
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/rendimiento.py --salida antes.json
+    ...
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/rendimiento.py --comparar antes.json
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, timedelta
+from itertools import count
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event, text  # noqa: E402
+
+from generar_datos import GENEROS, PALABRAS  # noqa: E402
+
+ITERACIONES = 30
+CALENTAMIENTO = 2
+# Casos que recorren tablas enteras: se ejecutan menos veces
+ITERACIONES_PESADAS = 3
+
+# endpoint: nombre de la vista, con su blueprint (None para funciones.py)
+# preparar(contexto) -> argumentos para ejecutar, fuera de la medición
+# ejecutar(contexto, **argumentos) -> código HTTP o None
+Caso = namedtuple('Caso', ['nombre', 'endpoint', 'ejecutar', 'preparar', 'pesado'])
+
+
+def caso(nombre, endpoint, ejecutar, preparar=None, pesado=False):
+    return Caso(nombre, endpoint, ejecutar, preparar, pesado)
+
+
+class Contexto:
+    """Cliente, sesiones y generadores de ids al azar sobre los datos existentes.
+
+    Entre casos no queda ningún contexto de aplicación activo: cada petición
+    del cliente (y cada `sesion()`) abre el suyo, igual que en producción.
+    """
+
+    def __init__(self, app, db, semilla):
+        self.app = app
+        self.db = db
+        self.cliente = app.test_client()
+        self.azar = random.Random(semilla)
+        self.secuencia = count()
+        with self.sesion() as session:
+            self.maximos = {
+                tabla: session.execute(text(f'SELECT MAX(id) FROM {tabla}')).scalar() or 0
+                for tabla in ('autor', 'libro', 'usuario', 'prestamo')
+            }
+            fecha = session.execute(text('SELECT MAX(fecha_prestamo) FROM prestamo')).scalar()
+        self.ultima_fecha = date.fromisoformat(fecha) if isinstance(fecha, str) else (fecha or date.today())
+
+    @contextmanager
+    def sesion(self):
+        """`db.session` dentro de un contexto propio; al salir se descarta lo que no se confirmó."""
+        with self.app.app_context():
+            try:
+                yield self.db.session
+            finally:
+                self.db.session.rollback()
+
+    def id(self, tabla):
+        return self.azar.randint(1, max(1, self.maximos[tabla]))
+
+    def palabra(self):
+        return self.azar.choice(PALABRAS)
+
+    def get(self, url):
+        respuesta = self.cliente.get(url)
+        respuesta.get_data()
+        return respuesta.status_code
+
+    def post(self, url, datos):
+        respuesta = self.cliente.post(url, data=datos)
+        respuesta.get_data()
+        return respuesta.status_code
+
+    def unico(self):
+        return f'bench{time.time_ns()}{next(self.secuencia)}'
+
+
+# ---------------------------
+# CASOS: RUTAS
+# ---------------------------
+def _crear(funcion, **campos):
+    """Preparación para las rutas que borran: crea la fila y devuelve su id."""
+    def preparar(ctx):
+        import funciones
+        with funciones.unidad_de_trabajo() as session:
+            return {'id': funcion(session, **{k: v(ctx) if callable(v) else v for k, v in campos.items()})}
+    return preparar
+
+
+def _leer(tabla, columnas):
+    def preparar(ctx):
+        with ctx.sesion() as session:
+            fila = session.execute(
+                text(f'SELECT {", ".join(columnas)} FROM {tabla} WHERE id = :id'), {'id': ctx.id(tabla)},
+            ).mappings().first()
+        return {'datos': {k: '' if v is None else v for k, v in (fila or {}).items()}, 'id': fila and fila['id']}
+    return preparar
+
+
+def _agotado(hoy, reservar=False):
+    """Preparación: un libro nuevo con su único ejemplar prestado (y, si se pide, una reserva)."""
+    def preparar(ctx):
+        import disponibilidad
+        import funciones
+        with funciones.unidad_de_trabajo() as session:
+            libro_id = funciones.crear_libro(session, 'Agotado', None, None, ctx.id('autor'))
+            funciones.registrar_prestamo(session, libro_id, ctx.id('usuario'), hoy, hoy + timedelta(days=14))
+            if reservar:
+                return {'id': disponibilidad.reservar(session, libro_id, ctx.id('usuario'))}
+            return {'datos': {'libro_id': libro_id, 'usuario_id': ctx.id('usuario')}}
+    return preparar
+
+
+def _prestamo_nuevo(hoy):
+    """Preparación para devolver: un préstamo de un libro recién creado, que seguro tiene ejemplar."""
+    def preparar(ctx):
+        import funciones
+        with funciones.unidad_de_trabajo() as session:
+            libro_id = funciones.crear_libro(session, 'Prestado', None, None, ctx.id('autor'))
+            return {'id': funciones.registrar_prestamo(
+                session, libro_id, ctx.id('usuario'), hoy, hoy + timedelta(days=14),
+            )}
+    return preparar
+
+
+def _libros_nuevos(n):
+    """Preparación para retirar por lote: `n` libros recién creados, sin préstamos."""
+    def preparar(ctx):
+        import funciones
+        with funciones.unidad_de_trabajo() as session:
+            return {'ids': funciones.crear_libros(
+                session, [{'titulo': 'Retirar', 'autor_id': ctx.id('autor')} for _ in range(n)],
+            )}
+    return preparar
+
+
+def _autor_con_libros(n, hoy):
+    """Preparación para borrar en cascada: un autor nuevo con `n` libros, cada uno con un préstamo devuelto."""
+    def preparar(ctx):
+        import funciones
+        with funciones.unidad_de_trabajo() as session:
+            autor_id = funciones.crear_autor(session, 'Prolífico')
+            funciones.crear_libros(session, [{'titulo': 'Obra', 'autor_id': autor_id} for _ in range(n)])
+            session.execute(text("""
+                INSERT INTO prestamo (libro_id, usuario_id, fecha_prestamo, fecha_devolucion, devuelto)
+                SELECT id, :usuario_id, :hoy, :hoy, true FROM libro WHERE autor_id = :autor_id
+            """), {'usuario_id': ctx.id('usuario'), 'hoy': hoy, 'autor_id': autor_id})
+            return {'id': autor_id}
+    return preparar
+
+
+def casos_rutas():
+    import funciones
+
+    hoy = date.today()
+    return [
+        caso('GET /', 'libros.listar_libros', lambda c: c.get('/')),
+        caso('GET /libros', 'libros.listar_libros', lambda c: c.get('/libros')),
+        caso('GET /libros/crear', 'libros.crear_libro', lambda c: c.get('/libros/crear')),
+        caso('POST /libros/crear', 'libros.crear_libro', lambda c: c.post('/libros/crear', {
+            'titulo': 'Libro ' + c.unico(), 'genero': c.azar.choice(GENEROS),
+            'anio_publicacion': '2020', 'autor_id': c.id('autor'),
+        })),
+        caso('GET /libros/editar', 'libros.editar_libro', lambda c: c.get(f"/libros/editar/{c.id('libro')}")),
+        caso('POST /libros/editar', 'libros.editar_libro',
+             lambda c, datos, id: c.post(f'/libros/editar/{id}', datos),
+             _leer('libro', ['id', 'titulo', 'genero', 'anio_publicacion', 'autor_id'])),
+        caso('GET /libros/eliminar', 'libros.eliminar_libro',
+             lambda c, id: c.get(f'/libros/eliminar/{id}'),
+             _crear(funciones.crear_libro, titulo='Borrar', genero=None, anio=None,
+                    autor_id=lambda c: c.id('autor'))),
+        caso('GET /libros/retirar', 'libros.retirar_libros', lambda c: c.get('/libros/retirar')),
+        caso('POST /libros/retirar (200 ids)', 'libros.retirar_libros',
+             lambda c, ids: c.post('/libros/retirar', {'ids': ' '.join(map(str, ids))}), _libros_nuevos(200)),
+        caso('GET /autores', 'autores.listar_autores', lambda c: c.get('/autores'), pesado=True),
+        caso('GET /autores/crear', 'autores.crear_autor', lambda c: c.get('/autores/crear')),
+        caso('POST /autores/crear', 'autores.crear_autor', lambda c: c.post('/autores/crear', {
+            'nombre': 'Autor ' + c.unico(), 'nacionalidad': 'Argentina',
+        })),
+        caso('GET /autores/editar', 'autores.editar_autor', lambda c: c.get(f"/autores/editar/{c.id('autor')}")),
+        caso('POST /autores/editar', 'autores.editar_autor',
+             lambda c, datos, id: c.post(f'/autores/editar/{id}', datos),
+             _leer('autor', ['id', 'nombre', 'nacionalidad'])),
+        caso('GET /autores/eliminar', 'autores.eliminar_autor',
+             lambda c, id: c.get(f'/autores/eliminar/{id}'),
+             _crear(funciones.crear_autor, nombre='Borrar')),
+        caso('GET /autores/eliminar (2000 libros con préstamos)', 'autores.eliminar_autor',
+             lambda c, id: c.get(f'/autores/eliminar/{id}'), _autor_con_libros(2000, hoy), pesado=True),
+        caso('GET /autores/eliminar?simular=1', 'autores.eliminar_autor',
+             lambda c: c.get(f"/autores/eliminar/{c.id('autor')}?simular=1")),
+        caso('GET /usuarios', 'usuarios.listar_usuarios', lambda c: c.get('/usuarios'), pesado=True),
+        caso('GET /usuarios/crear', 'usuarios.crear_usuario', lambda c: c.get('/usuarios/crear')),
+        caso('POST /usuarios/crear', 'usuarios.crear_usuario', lambda c: c.post('/usuarios/crear', {
+            'nombre': 'Usuario', 'email': c.unico() + '@example.org', 'telefono': '', 'rol': 'lector',
+        })),
+        caso('GET /usuarios/editar', 'usuarios.editar_usuario', lambda c: c.get(f"/usuarios/editar/{c.id('usuario')}")),
+        caso('POST /usuarios/editar', 'usuarios.editar_usuario',
+             lambda c, datos, id: c.post(f'/usuarios/editar/{id}', datos),
+             _leer('usuario', ['id', 'nombre', 'email', 'telefono', 'rol'])),
+        caso('GET /usuarios/eliminar', 'usuarios.eliminar_usuario',
+             lambda c, id: c.get(f'/usuarios/eliminar/{id}'),
+             _crear(funciones.crear_usuario, nombre='Borrar', email=lambda c: c.unico() + '@example.org')),
+        caso('GET /usuarios/eliminar?simular=1', 'usuarios.eliminar_usuario',
+             lambda c: c.get(f"/usuarios/eliminar/{c.id('usuario')}?simular=1")),
+        caso('GET /prestamos', 'prestamos.listar_prestamos', lambda c: c.get('/prestamos')),
+        caso('GET /prestamos?estado=pendientes', 'prestamos.listar_prestamos', lambda c: c.get('/prestamos?estado=pendientes')),
+        caso('GET /prestamos?estado=vencidos', 'prestamos.listar_prestamos', lambda c: c.get('/prestamos?estado=vencidos')),
+        caso('GET /prestamos?desde&hasta', 'prestamos.listar_prestamos', lambda c: c.get(
+            f'/prestamos?desde={c.ultima_fecha - timedelta(days=30)}&hasta={c.ultima_fecha}',
+        )),
+        caso('GET /prestamos/crear', 'prestamos.crear_prestamo', lambda c: c.get('/prestamos/crear')),
+        caso('POST /prestamos/crear', 'prestamos.crear_prestamo', lambda c: c.post('/prestamos/crear', {
+            'libro_id': c.id('libro'), 'usuario_id': c.id('usuario'),
+            'fecha_prestamo': hoy.isoformat(), 'fecha_devolucion': (hoy + timedelta(days=14)).isoformat(),
+        })),
+        caso('GET /prestamos/devolver', 'prestamos.marcar_devueltos',
+             lambda c, id: c.get(f'/prestamos/devolver/{id}'),
+             _prestamo_nuevo(hoy)),
+        caso('GET /prestamos/devolver (lote)', 'prestamos.devolver_prestamos', lambda c: c.get('/prestamos/devolver')),
+        caso('POST /prestamos/devolver (500 ids)', 'prestamos.devolver_prestamos', lambda c: c.post(
+            '/prestamos/devolver', {'ids': '\n'.join(str(c.id('prestamo')) for _ in range(500))},
+        )),
+        caso('GET /prestamos/vencidos', 'prestamos.usuarios_con_prestamos_vencidos', lambda c: c.get('/prestamos/vencidos')),
+        caso('GET /libros/disponibilidad', 'libros.disponibilidad_libro',
+             lambda c: c.get(f"/libros/{c.id('libro')}/disponibilidad")),
+        caso('GET /libros/similares', 'libros.similares_libro',
+             lambda c: c.get(f"/libros/{c.id('libro')}/similares")),
+        caso('GET /reservas', 'reservas.listar_reservas', lambda c: c.get('/reservas')),
+        caso('POST /reservas/crear', 'reservas.crear_reserva',
+             lambda c, datos: c.post('/reservas/crear', datos), _agotado(hoy)),
+        caso('GET /reservas/cancelar', 'reservas.cancelar_reserva',
+             lambda c, id: c.get(f'/reservas/cancelar/{id}'), _agotado(hoy, reservar=True)),
+        caso('GET /autor/mas-libros', 'consultas.autor_mas_libros', lambda c: c.get('/autor/mas-libros')),
+        caso('GET /ranking/autores', 'consultas.ranking_autores', lambda c: c.get('/ranking/autores')),
+        caso('GET /ranking/libros', 'consultas.ranking_libros', lambda c: c.get('/ranking/libros')),
+        caso('GET /estadisticas', 'consultas.estadisticas_circulacion', lambda c: c.get('/estadisticas')),
+        caso('GET /estadisticas.json (3 años)', 'consultas.estadisticas_circulacion_json', lambda c: c.get(
+            f'/estadisticas.json?desde={c.ultima_fecha - timedelta(days=3 * 365)}&hasta={c.ultima_fecha}',
+        )),
+        caso('GET /buscar', 'consultas.buscar', lambda c: c.get(f'/buscar?q={c.palabra()}')),
+        caso('GET /buscar?campo=autor', 'consultas.buscar', lambda c: c.get('/buscar?campo=autor&q=garcia')),
+        caso('GET /autocompletar/libros', 'consultas.autocompletar', lambda c: c.get(f'/autocompletar/libros?q={c.palabra()[:3]}')),
+        caso('GET /autocompletar/autores', 'consultas.autocompletar', lambda c: c.get('/autocompletar/autores?q=mar')),
+        caso('GET /autocompletar/usuarios', 'consultas.autocompletar', lambda c: c.get('/autocompletar/usuarios?q=ana')),
+        caso('GET /api/v1/libros', 'api.libros', lambda c: c.get('/api/v1/libros')),
+        caso('GET /api/v1/libros?fields=id,titulo', 'api.libros', lambda c: c.get('/api/v1/libros?fields=id,titulo')),
+        caso('GET /api/v1/libros?ids (100)', 'api.libros', lambda c: c.get(
+            '/api/v1/libros?ids=' + ','.join(str(c.id('libro')) for _ in range(100)),
+        )),
+        caso('GET /api/v1/autores', 'api.autores', lambda c: c.get('/api/v1/autores')),
+        caso('GET /api/v1/usuarios', 'api.usuarios', lambda c: c.get('/api/v1/usuarios')),
+        caso('GET /api/v1/prestamos?estado=pendientes', 'api.prestamos',
+             lambda c: c.get('/api/v1/prestamos?estado=pendientes')),
+        caso('GET /api/v1/libros/<id>', 'api.obtener', lambda c: c.get(f"/api/v1/libros/{c.id('libro')}")),
+        caso('GET /cache/estadisticas', 'sistema.estadisticas_cache', lambda c: c.get('/cache/estadisticas')),
+        caso('GET /metrics', 'sistema.exponer_metricas', lambda c: c.get('/metrics')),
+        caso('GET /export/prestamos (30 días)', 'sistema.exportar', lambda c: c.get(
+            f'/export/prestamos?desde={c.ultima_fecha - timedelta(days=30)}&hasta={c.ultima_fecha}',
+        )),
+        # Un mes de hace más de un año: con el histórico archivado, sale de prestamo_historico
+        caso('GET /export/prestamos?historico=1 (30 días)', 'sistema.exportar', lambda c: c.get(
+            f'/export/prestamos?historico=1&desde={c.ultima_fecha - timedelta(days=400)}'
+            f'&hasta={c.ultima_fecha - timedelta(days=370)}',
+        )),
+        caso('GET /export/libros', 'sistema.exportar', lambda c: c.get('/export/libros'), pesado=True),
+    ]
+
+
+# ---------------------------
+# CASOS: FUNCIONES.PY
+# ---------------------------
+def _servicio(funcion, *argumentos):
+    """Ejecuta una función del servicio con la sesión de la app; las escrituras se descartan."""
+    def ejecutar(ctx):
+        valores = [a(ctx) if callable(a) else a for a in argumentos]
+        with ctx.sesion() as session:
+            funcion(session, *valores)
+    return ejecutar
+
+
+def casos_funciones():
+    import funciones
+
+    hoy = date.today()
+
+    def ids(tabla, n):
+        return lambda c: [c.id(tabla) for _ in range(n)]
+
+    return [
+        caso('funciones.listar_autores', None, _servicio(funciones.listar_autores), pesado=True),
+        caso('funciones.listar_libros', None, _servicio(funciones.listar_libros), pesado=True),
+        caso('funciones.listar_usuarios', None, _servicio(funciones.listar_usuarios), pesado=True),
+        caso('funciones.listar_prestamos_activos', None, _servicio(funciones.listar_prestamos_activos), pesado=True),
+        caso('funciones.buscar_por_titulo', None, _servicio(funciones.buscar_por_titulo, lambda c: c.palabra())),
+        caso('funciones.buscar_por_autor', None, _servicio(funciones.buscar_por_autor, 'garcia')),
+        caso('funciones.buscar_por_genero', None, _servicio(funciones.buscar_por_genero, 'novela')),
+        caso('funciones.buscar_por_anio', None, _servicio(funciones.buscar_por_anio, 1984)),
+        caso('funciones.autor_con_mas_libros', None, _servicio(funciones.autor_con_mas_libros)),
+        caso('funciones.libro_mas_prestado', None, _servicio(funciones.libro_mas_prestado)),
+        caso('funciones.usuarios_con_prestamos_vencidos', None,
+             _servicio(funciones.usuarios_con_prestamos_vencidos), pesado=True),
+        caso('funciones.login_usuario', None,
+             _servicio(funciones.login_usuario, lambda c: f"usuario{c.id('usuario')}@example.org")),
+        caso('funciones.crear_autores (1000)', None, _servicio(
+            funciones.crear_autores, [{'nombre': f'Autor {i}'} for i in range(1000)],
+        )),
+        caso('funciones.crear_libros (1000)', None, _servicio(
+            funciones.crear_libros,
+            lambda c: [{'titulo': f'Libro {i}', 'autor_id': c.id('autor')} for i in range(1000)],
+        )),
+        caso('funciones.crear_usuarios (1000)', None, _servicio(
+            funciones.crear_usuarios,
+            lambda c: [{'nombre': 'Usuario', 'email': f'{c.unico()}@example.org'} for _ in range(1000)],
+        )),
+        caso('funciones.registrar_prestamos (1000)', None, _servicio(
+            funciones.registrar_prestamos,
+            lambda c: [{
+                'libro_id': c.id('libro'), 'usuario_id': c.id('usuario'),
+                'fecha_prestamo': hoy, 'fecha_devolucion': hoy + timedelta(days=14),
+            } for _ in range(1000)],
+        )),
+        caso('funciones.actualizar_libros (500)', None,
+             _servicio(funciones.actualizar_libros, ids('libro', 500), None, 'Novela')),
+        caso('funciones.marcar_devoluciones (500)', None,
+             _servicio(funciones.marcar_devoluciones, ids('prestamo', 500))),
+    ]
+
+
+# ---------------------------
+# MEDICIÓN
+# ---------------------------
+def percentiles(muestras):
+    if not muestras:
+        return {'p50': None, 'p95': None, 'p99': None}
+    if len(muestras) == 1:
+        valor = round(muestras[0] * 1000, 3)
+        return {'p50': valor, 'p95': valor, 'p99': valor}
+    cortes = statistics.quantiles(muestras, n=100, method='inclusive')
+    return {f'p{p}': round(cortes[p - 1] * 1000, 3) for p in (50, 95, 99)}
+
+
+def medir(ctx, caso_, iteraciones, con_cache, contador):
+    cache = ctx.app.extensions['cache_respuestas']
+    tiempos, consultas, estados, errores = [], [], {}, 0
+
+    def una_vez():
+        argumentos = caso_.preparar(ctx) if caso_.preparar else {}
+        if not con_cache:
+            cache.almacen.clear()
+        contador[0] = 0
+        inicio = time.perf_counter()
+        estado = caso_.ejecutar(ctx, **argumentos)
+        return time.perf_counter() - inicio, contador[0], estado
+
+    for i in range(CALENTAMIENTO + iteraciones):
+        try:
+            segundos, n, estado = una_vez()
+        except Exception as error:
+            errores += 1
+            estados[type(error).__name__] = estados.get(type(error).__name__, 0) + 1
+            continue
+        if estado is not None:
+            estados[str(estado)] = estados.get(str(estado), 0) + 1
+            if estado >= 500:
+                errores += 1
+        if i >= CALENTAMIENTO:
+            tiempos.append(segundos)
+            consultas.append(n)
+
+    # Memoria: una ejecución más con tracemalloc
+    pico = None
+    tracemalloc.start()
+    try:
+        una_vez()
+        pico = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    except Exception:
+        pass
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'endpoint': caso_.endpoint,
+        'iteraciones': len(tiempos),
+        'ms': percentiles(tiempos),
+        'consultas': statistics.median(consultas) if consultas else None,
+        'memoria_pico_kb': pico,
+        'errores': errores,
+        'respuestas': estados,
+    }
+
+
+def volumenes(session):
+    return {
+        tabla: session.execute(text(f'SELECT COUNT(*) FROM {tabla}')).scalar()
+        for tabla in ('autor', 'libro', 'usuario', 'prestamo')
+    }
+
+
+def version_codigo():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(iteraciones, con_cache, filtro, semilla):
+    from app import create_app
+    from database import db
+
+    app = create_app()
+
+    informe = {'casos': {}}
+    contador = [0]
+    # Los 5xx se cuentan en el informe; no hace falta el traceback de cada uno
+    app.logger.setLevel(logging.CRITICAL)
+
+    def contar(*_):
+        contador[0] += 1
+
+    with app.app_context():
+        db.create_all()
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', contar)
+        motor = db.engine.dialect.name
+    ctx = Contexto(app, db, semilla)
+    with ctx.sesion() as session:
+        informe.update({
+            'version': version_codigo(),
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'motor': motor,
+            'volumenes': volumenes(session),
+            'parametros': {'iteraciones': iteraciones, 'con_cache': con_cache, 'semilla': semilla},
+        })
+    casos = casos_rutas() + casos_funciones()
+    cubiertos = {c.endpoint for c in casos}
+    informe['sin_cubrir'] = sorted(
+        regla.endpoint for regla in app.url_map.iter_rules()
+        if regla.endpoint != 'static' and regla.endpoint not in cubiertos
+    )
+    for caso_ in casos:
+        if filtro and filtro not in caso_.nombre:
+            continue
+        n = min(iteraciones, ITERACIONES_PESADAS) if caso_.pesado else iteraciones
+        resultado = medir(ctx, caso_, n, con_cache, contador)
+        informe['casos'][caso_.nombre] = resultado
+        print(f"{caso_.nombre:55} p50 {resultado['ms']['p50']} ms  p95 {resultado['ms']['p95']} ms  "
+              f"{resultado['consultas']} consultas  {resultado['memoria_pico_kb']} KB"
+              + (f"  {resultado['errores']} errores" if resultado['errores'] else ''), file=sys.stderr)
+    if informe['sin_cubrir']:
+        print('Rutas sin caso de benchmark: ' + ', '.join(informe['sin_cubrir']), file=sys.stderr)
+    return informe
+
+
+# ---------------------------
+# COMPARACIÓN
+# ---------------------------
+def comparar(anterior, actual, tolerancia):
+    """Imprime la variación de p95 y consultas por caso; devuelve los casos que empeoraron."""
+    regresiones = []
+    for nombre, ahora in actual['casos'].items():
+        antes = anterior['casos'].get(nombre)
+        if not antes or not antes['ms']['p95'] or not ahora['ms']['p95']:
+            continue
+        razon = ahora['ms']['p95'] / antes['ms']['p95']
+        mas_consultas = (ahora['consultas'] or 0) > (antes['consultas'] or 0)
+        empeoro = razon > 1 + tolerancia or mas_consultas or ahora['errores'] > antes['errores']
+        marca = 'REGRESIÓN' if empeoro else ''
+        print(f"{nombre:55} p95 {antes['ms']['p95']:>10} -> {ahora['ms']['p95']:>10} ms ({razon:5.2f}x)  "
+              f"consultas {antes['consultas']} -> {ahora['consultas']}  {marca}")
+        if empeoro:
+            regresiones.append(nombre)
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iteraciones', type=int, default=ITERACIONES)
+    parser.add_argument('--con-cache', action='store_true', help='No vaciar la caché de páginas entre ejecuciones.')
+    parser.add_argument('--solo', help='Ejecutar sólo los casos cuyo nombre contenga este texto.')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help='Archivo JSON para el informe (por defecto, salida estándar).')
+    parser.add_argument('--comparar', help='Informe anterior contra el cual comparar.')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='Aumento de p95 tolerado (0.2 = 20%%).')
+    args = parser.parse_args()
+
+    informe = ejecutar(args.iteraciones, args.con_cache, args.solo, args.semilla)
+    contenido = json.dumps(informe, indent=2, ensure_ascii=False, sort_keys=True)
+    if args.salida:
+        Path(args.salida).write_text(contenido + '\n', encoding='utf-8')
+    else:
+        print(contenido)
+
+    if args.comparar:
+        anterior = json.loads(Path(args.comparar).read_text(encoding='utf-8'))
+        regresiones = comparar(anterior, informe, args.tolerancia)
+        if regresiones:
+            print(f'{len(regresiones)} caso(s) empeoraron', file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""Benchmark de respaldo: velocidad de `flask backup` y cuánto frena a un escritor.
+
+Crea una base temporal con el esquema de la aplicación y `--libros` libros,
+y mientras un hilo escribe sin parar (un INSERT por transacción, como un
+préstamo) hace un respaldo completo comprimido, otro incremental tras
+algunas escrituras, y al final verifica y reconstruye la cadena. Por fase:
+
+    escritor.commits        transacciones que completó el escritor
+    escritor.p50_ms/max_ms  latencia de cada commit; `max_ms` es la espera más
+                            larga del escritor (comparar con `sin_respaldo`)
+    respaldo.mb_s           MB de base copiados por segundo
+    respaldo.paso_max_ms    paso más largo de la API de backup
+    respaldo.reinicios      copias reiniciadas porque el escritor cambió la base
+    respaldo.archivo_kb     lo que ocupa el respaldo en disco
+
+Se comparan dos perfiles, como en concurrencia.py:
+
+    wal     el de la aplicación: la copia lee una instantánea fija y el
+            escritor no espera
+    delete  journal clásico: cada paso bloquea los commits mientras dura, y
+            las escrituras entre pasos reinician la copia
+
+Uso:
+    python benchmarks/respaldo.py --libros 100000 --paginas 256 --segundos 1
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+
+import respaldo  # noqa: E402
+
+
+def crear_base(ruta, libros, perfil):
+    """Esquema de la aplicación en `ruta` con `libros` libros."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta}'
+    from app import create_app
+    from database import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(text("INSERT INTO autor (nombre) VALUES ('Autor de prueba')"))
+        db.session.execute(
+            text("INSERT INTO libro (titulo, genero, autor_id) VALUES (:titulo, 'Novela', 1)"),
+            [{'titulo': f'Libro de prueba número {i} ' + 'x' * 80} for i in range(libros)],
+        )
+        db.session.commit()
+        db.session.close()
+        with db.engine.connect() as conexion:
+            conexion.exec_driver_sql(f"PRAGMA journal_mode = {'WAL' if perfil == 'wal' else 'DELETE'}")
+        db.engine.dispose()
+
+
+class Escritor(threading.Thread):
+    """Un commit tras otro desde su propia conexión; registra la latencia de cada uno."""
+
+    def __init__(self, ruta):
+        super().__init__(daemon=True)
+        self.ruta = ruta
+        self.latencias = []
+        self.activo = True
+
+    def run(self):
+        conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        conexion.execute('PRAGMA synchronous = NORMAL')
+        while self.activo:
+            inicio = time.perf_counter()
+            conexion.execute('BEGIN IMMEDIATE')
+            conexion.execute("INSERT INTO autor (nombre) VALUES ('Escritor concurrente')")
+            conexion.execute('COMMIT')
+            self.latencias.append(time.perf_counter() - inicio)
+            time.sleep(0.002)
+        conexion.close()
+
+    def tomar(self):
+        latencias, self.latencias = self.latencias, []
+        if not latencias:
+            return {'commits': 0}
+        return {
+            'commits': len(latencias),
+            'p50_ms': round(statistics.median(latencias) * 1000, 2),
+            'max_ms': round(max(latencias) * 1000, 2),
+        }
+
+
+def informe_respaldo(resumen):
+    return {
+        'mb': round(resumen.bytes / 1024 / 1024, 1),
+        'segundos': round(resumen.segundos, 3),
+        'mb_s': round(resumen.bytes / 1024 / 1024 / resumen.segundos, 1) if resumen.segundos else None,
+        'pasos': resumen.pasos,
+        'paso_max_ms': round(resumen.paso_max_ms, 2),
+        'reinicios': resumen.reinicios,
+        'paginas_guardadas': resumen.paginas_cambiadas,
+        'archivo_kb': round(resumen.archivo_bytes / 1024),
+    }
+
+
+def medir(perfil, libros, paginas, segundos):
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'biblioteca.db')
+        crear_base(ruta, libros, perfil)
+        respaldos = os.path.join(carpeta, 'respaldos')
+        escritor = Escritor(ruta)
+        escritor.start()
+
+        time.sleep(segundos)
+        resultado = {'sin_respaldo': {'escritor': escritor.tomar()}}
+
+        completo = respaldo.respaldar(ruta, respaldos, comprimir=True, paginas=paginas, progreso=lambda m: None)
+        resultado['completo'] = {'escritor': escritor.tomar(), 'respaldo': informe_respaldo(completo)}
+
+        time.sleep(max(segundos, 1.0))  # el nombre lleva los segundos: no repetirlo
+        escritor.tomar()
+        incremental = respaldo.respaldar(
+            ruta, respaldos, incremental=True, comprimir=True, paginas=paginas, progreso=lambda m: None,
+        )
+        resultado['incremental'] = {'escritor': escritor.tomar(), 'respaldo': informe_respaldo(incremental)}
+
+        escritor.activo = False
+        escritor.join()
+        inicio = time.perf_counter()
+        respaldo.restaurar(respaldos, ruta_destino=os.path.join(carpeta, 'restaurada.db'))
+        resultado['restaurar_verificado_s'] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--libros', type=int, default=100000)
+    parser.add_argument('--paginas', type=int, default=respaldo.PAGINAS, help='Páginas por paso de la API de backup.')
+    parser.add_argument('--segundos', type=float, default=1.0, help='Escrituras sin respaldo, como referencia.')
+    parser.add_argument('--perfiles', nargs='+', choices=['wal', 'delete'], default=['wal', 'delete'])
+    args = parser.parse_args()
+    informe = {perfil: medir(perfil, args.libros, args.paginas, args.segundos) for perfil in args.perfiles}
+    print(json.dumps(informe, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""Búsqueda de texto completo sobre el catálogo (SQLite FTS5).
+
+El índice `libro_busqueda` guarda título, autor y género de cada libro con el
+mismo rowid que `libro.id`. Se mantiene sincronizado con triggers sobre `libro`
+y `autor`, así que cualquier escritura (formularios, scripts o SQL directo)
+queda reflejada sin pasos extra.
+
+El tokenizador `unicode61 remove_diacritics 2` ignora mayúsculas y tildes
+("garcia" encuentra "García") y los índices de prefijo de 2 y 3 caracteres
+hacen que las búsquedas mientras se escribe no recorran todo el vocabulario.
+
+`autor_busqueda` y `usuario_busqueda` son índices equivalentes (nombre, y
+nombre y email) que usan los campos con autocompletado de los formularios.
+"""
+import re
+from collections import namedtuple
+
+from sqlalchemy import DDL, event, text
+
+TABLA = 'libro_busqueda'
+CAMPOS = ('titulo', 'autor', 'genero')
+# Peso de cada columna en bm25, en el orden de CAMPOS
+PESOS = (10.0, 5.0, 2.0)
+MIN_PREFIJO = 2
+
+DDL_SQLITE = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5(
+        titulo, autor, genero,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS libro_busqueda_ai AFTER INSERT ON libro BEGIN
+        INSERT INTO {TABLA} (rowid, titulo, autor, genero)
+        VALUES (new.id, new.titulo, (SELECT nombre FROM autor WHERE id = new.autor_id), new.genero);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS libro_busqueda_au AFTER UPDATE OF titulo, genero, autor_id ON libro BEGIN
+        DELETE FROM {TABLA} WHERE rowid = old.id;
+        INSERT INTO {TABLA} (rowid, titulo, autor, genero)
+        VALUES (new.id, new.titulo, (SELECT nombre FROM autor WHERE id = new.autor_id), new.genero);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS libro_busqueda_ad AFTER DELETE ON libro BEGIN
+        DELETE FROM {TABLA} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS autor_busqueda_au AFTER UPDATE OF nombre ON autor BEGIN
+        UPDATE {TABLA} SET autor = new.nombre
+        WHERE rowid IN (SELECT id FROM libro WHERE autor_id = new.id);
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS autor_busqueda USING fts5(
+        nombre,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS autor_indice_ai AFTER INSERT ON autor BEGIN
+        INSERT INTO autor_busqueda (rowid, nombre) VALUES (new.id, new.nombre);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS autor_indice_au AFTER UPDATE OF nombre ON autor BEGIN
+        DELETE FROM autor_busqueda WHERE rowid = old.id;
+        INSERT INTO autor_busqueda (rowid, nombre) VALUES (new.id, new.nombre);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS autor_indice_ad AFTER DELETE ON autor BEGIN
+        DELETE FROM autor_busqueda WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS usuario_busqueda USING fts5(
+        nombre, email,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS usuario_indice_ai AFTER INSERT ON usuario BEGIN
+        INSERT INTO usuario_busqueda (rowid, nombre, email) VALUES (new.id, new.nombre, new.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS usuario_indice_au AFTER UPDATE OF nombre, email ON usuario BEGIN
+        DELETE FROM usuario_busqueda WHERE rowid = old.id;
+        INSERT INTO usuario_busqueda (rowid, nombre, email) VALUES (new.id, new.nombre, new.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS usuario_indice_ad AFTER DELETE ON usuario BEGIN
+        DELETE FROM usuario_busqueda WHERE rowid = old.id;
+    END
+    """,
+]
+
+# Consultas de autocompletado: (id, texto) de las N mejores coincidencias por prefijo
+AUTOCOMPLETAR = {
+    'libros': f"""
+        SELECT b.rowid AS id, b.titulo || ' — ' || b.autor AS texto
+        FROM {TABLA} b
+        WHERE {TABLA} MATCH :expresion
+        ORDER BY rank
+        LIMIT :n
+    """,
+    'autores': """
+        SELECT rowid AS id, nombre AS texto
+        FROM autor_busqueda
+        WHERE autor_busqueda MATCH :expresion
+        ORDER BY rank
+        LIMIT :n
+    """,
+    # Los usuarios dados de baja siguen en el índice (no cambia su nombre ni su email)
+    'usuarios': """
+        SELECT b.rowid AS id, b.nombre || ' (' || b.email || ')' AS texto
+        FROM usuario_busqueda b JOIN usuario u ON u.id = b.rowid
+        WHERE usuario_busqueda MATCH :expresion AND u.baja IS NULL
+        ORDER BY rank
+        LIMIT :n
+    """,
+}
+# Columna a la que se restringe el autocompletado de libros
+CAMPO_AUTOCOMPLETAR = {'libros': 'titulo'}
+
+Resultados = namedtuple('Resultados', ['filas', 'pagina', 'hay_mas', 'por_pagina'])
+
+
+def registrar(metadata):
+    """Crea el índice y sus triggers junto con las tablas en `db.create_all()`."""
+    for sentencia in DDL_SQLITE:
+        event.listen(metadata, 'after_create', DDL(sentencia).execute_if(dialect='sqlite'))
+
+
+def excluir_de_migraciones(name, type_, parent_names):
+    """Filtro `include_name` para que autogenerate no proponga borrar los índices FTS."""
+    return not (type_ == 'table' and name.startswith((TABLA, 'autor_busqueda', 'usuario_busqueda')))
+
+
+def reconstruir(conexion):
+    """Vuelve a generar los índices a partir de `libro`, `autor` y `usuario`."""
+    for sentencia in DDL_SQLITE:
+        conexion.execute(text(sentencia))
+    conexion.execute(text(f'DELETE FROM {TABLA}'))
+    resultado = conexion.execute(text(f"""
+        INSERT INTO {TABLA} (rowid, titulo, autor, genero)
+        SELECT l.id, l.titulo, a.nombre, l.genero
+        FROM libro l JOIN autor a ON a.id = l.autor_id
+    """))
+    conexion.execute(text('DELETE FROM autor_busqueda'))
+    conexion.execute(text('INSERT INTO autor_busqueda (rowid, nombre) SELECT id, nombre FROM autor'))
+    conexion.execute(text('DELETE FROM usuario_busqueda'))
+    conexion.execute(text(
+        'INSERT INTO usuario_busqueda (rowid, nombre, email) SELECT id, nombre, email FROM usuario'
+    ))
+    for tabla in (TABLA, 'autor_busqueda', 'usuario_busqueda'):
+        conexion.execute(text(f"INSERT INTO {tabla} ({tabla}) VALUES ('optimize')"))
+    return resultado.rowcount
+
+
+def expresion_fts(termino, campo=None):
+    """Convierte lo que escribe el usuario en una consulta FTS5 segura.
+
+    Cada palabra se cita (para que no se interprete como operador) y las de
+    al menos MIN_PREFIJO caracteres se buscan por prefijo. Todas deben aparecer.
+    """
+    palabras = re.findall(r'\w+', termino or '')
+    if not palabras:
+        return None
+    partes = [f'"{p}"*' if len(p) >= MIN_PREFIJO else f'"{p}"' for p in palabras]
+    expresion = ' '.join(partes)
+    if campo in CAMPOS:
+        expresion = f'{{{campo}}} : ({expresion})'
+    return expresion
+
+
+def buscar(session, termino, campo=None, pagina=1, por_pagina=20):
+    """Devuelve una página de libros que coinciden con `termino`, los más relevantes primero."""
+    expresion = expresion_fts(termino, campo)
+    pagina = max(1, pagina)
+    if expresion is None:
+        return Resultados([], pagina, False, por_pagina)
+    pesos = ', '.join(str(p) for p in PESOS)
+    filas = session.execute(
+        text(f"""
+            SELECT l.id, l.titulo, l.genero, l.anio_publicacion, b.autor
+            FROM {TABLA} b JOIN libro l ON l.id = b.rowid
+            WHERE {TABLA} MATCH :expresion
+            ORDER BY bm25({TABLA}, {pesos}), l.id
+            LIMIT :limite OFFSET :desplazamiento
+        """),
+        {
+            'expresion': expresion,
+            'limite': por_pagina + 1,
+            'desplazamiento': (pagina - 1) * por_pagina,
+        },
+    ).all()
+    return Resultados(filas[:por_pagina], pagina, len(filas) > por_pagina, por_pagina)
+
+
+def autocompletar(session, tipo, termino, n=10):
+    """Devuelve las `n` mejores coincidencias por prefijo como filas (id, texto)."""
+    expresion = expresion_fts(termino, CAMPO_AUTOCOMPLETAR.get(tipo))
+    if expresion is None:
+        return []
+    return session.execute(text(AUTOCOMPLETAR[tipo]), {'expresion': expresion, 'n': n}).all()
@@ -0,0 +1,221 @@
+"""Caché de respuestas HTTP invalidada por versiones de tabla.
+
+Cada tabla de datos (`autor`, `libro`, `usuario`, `prestamo`) tiene una fila
+en `version_tabla` con un contador y la fecha de la última escritura. Cualquier
+flush del ORM que toque una de esas tablas incrementa su contador en la misma
+transacción, así que todos los procesos ven la misma versión sin coordinarse.
+
+Una vista decorada con `@cacheada('libro', 'autor')` lee esas versiones (una
+consulta por clave primaria), arma un ETag con la ruta, la query string y las
+versiones, y:
+
+  * responde 304 si el cliente ya tiene esa versión (If-None-Match),
+  * devuelve el cuerpo guardado si la caché tiene una entrada con ese ETag,
+  * o ejecuta la vista y guarda el resultado.
+
+Sólo el ETag decide el 304. Last-Modified se envía como dato, pero
+If-Modified-Since no alcanza: las fechas HTTP tienen resolución de un segundo
+y dos escrituras en el mismo segundo dejarían una página vieja por vigente.
+
+El almacenamiento por defecto es un LRU en memoria por proceso; con
+CACHE_REDIS_URL se comparte entre procesos (requiere el paquete `redis`).
+"""
+import functools
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+from flask import current_app, make_response, request
+from sqlalchemy import bindparam, event, text
+from werkzeug.http import is_resource_modified
+
+TABLAS = ('autor', 'libro', 'usuario', 'prestamo')
+MAX_ENTRADAS = 1000
+
+Entrada = namedtuple('Entrada', ['etag', 'cuerpo', 'mimetype'])
+
+
+# ---------------------------
+# ALMACENAMIENTO
+# ---------------------------
+class CacheMemoria:
+    """LRU acotado por cantidad de entradas, seguro entre hilos."""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                self._datos.move_to_end(clave)
+            return entrada
+
+    def set(self, clave, entrada):
+        with self._lock:
+            self._datos[clave] = entrada
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class CacheRedis:
+    """Almacenamiento compartido entre procesos; las entradas caducan solas con `ttl`."""
+
+    def __init__(self, url, prefijo='biblioteca:respuesta:', ttl=3600):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_REDIS_URL requiere el paquete redis (pip install redis)')
+        self._redis = redis.Redis.from_url(url)
+        self.prefijo = prefijo
+        self.ttl = ttl
+        self.max_entradas = None
+
+    def get(self, clave):
+        datos = self._redis.get(self.prefijo + clave)
+        return pickle.loads(datos) if datos is not None else None
+
+    def set(self, clave, entrada):
+        self._redis.set(self.prefijo + clave, pickle.dumps(entrada), ex=self.ttl)
+
+    def clear(self):
+        for clave in self._redis.scan_iter(self.prefijo + '*'):
+            self._redis.delete(clave)
+
+    def __len__(self):
+        return sum(1 for _ in self._redis.scan_iter(self.prefijo + '*'))
+
+
+class CacheRespuestas:
+    def __init__(self, db, almacen):
+        self.db = db
+        self.almacen = almacen
+        self.aciertos = 0
+        self.fallos = 0
+        self.no_modificados = 0
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos + self.no_modificados
+        return {
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'no_modificados': self.no_modificados,
+            'ratio_aciertos': round((self.aciertos + self.no_modificados) / consultas, 4) if consultas else None,
+            'entradas': len(self.almacen),
+            'max_entradas': self.almacen.max_entradas,
+        }
+
+
+def configurar(app, db):
+    url = os.environ.get('CACHE_REDIS_URL')
+    if url:
+        almacen = CacheRedis(url)
+    else:
+        almacen = CacheMemoria(int(os.environ.get('CACHE_MAX_ENTRADAS', MAX_ENTRADAS)))
+    app.extensions['cache_respuestas'] = CacheRespuestas(db, almacen)
+
+
+# ---------------------------
+# VERSIONES DE TABLA
+# ---------------------------
+INCREMENTAR = text("""
+    INSERT INTO version_tabla (tabla, version, modificado) VALUES (:tabla, 1, :ahora)
+    ON CONFLICT (tabla) DO UPDATE SET version = version_tabla.version + 1, modificado = :ahora
+""")
+LEER = text('SELECT tabla, version, modificado FROM version_tabla WHERE tabla IN :tablas').bindparams(
+    bindparam('tablas', expanding=True),
+)
+
+
+def _ahora():
+    return datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+
+
+def incrementar(conexion, tablas):
+    """Marca `tablas` como modificadas. Usar también tras escrituras masivas fuera del ORM."""
+    ahora = _ahora()
+    conexion.execute(INCREMENTAR, [{'tabla': t, 'ahora': ahora} for t in sorted(set(tablas))])
+
+
+def leer_versiones(session, tablas):
+    """Devuelve (texto con las versiones, fecha de la última modificación en UTC)."""
+    filas = {f.tabla: f for f in session.execute(LEER, {'tablas': list(tablas)})}
+    partes, modificado = [], None
+    for tabla in tablas:
+        fila = filas.get(tabla)
+        partes.append(f'{tabla}={fila.version if fila else 0}')
+        if fila and fila.modificado:
+            fecha = fila.modificado
+            if isinstance(fecha, str):
+                fecha = datetime.fromisoformat(fecha)
+            fecha = fecha.replace(tzinfo=timezone.utc)
+            modificado = max(modificado, fecha) if modificado else fecha
+    return ','.join(partes), modificado
+
+
+def registrar(clase_sesion):
+    """Incrementa la versión de cada tabla tocada por un flush del ORM, en la misma transacción."""
+
+    @event.listens_for(clase_sesion, 'after_flush')
+    def _al_escribir(session, contexto):
+        tablas = {
+            getattr(objeto, '__tablename__', None)
+            for objeto in (*session.new, *session.dirty, *session.deleted)
+        }
+        tablas &= set(TABLAS)
+        if tablas:
+            incrementar(session.connection(), tablas)
+
+
+# ---------------------------
+# DECORADOR
+# ---------------------------
+def cacheada(*tablas):
+    """Cachea una vista GET mientras no cambie ninguna de `tablas`."""
+
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            cache = current_app.extensions['cache_respuestas']
+            versiones, modificado = leer_versiones(cache.db.session, tablas)
+            argumentos = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+            clave = f'{request.path}?{argumentos}'
+            etag = hashlib.sha1(f'{clave}|{versiones}'.encode()).hexdigest()
+
+            if not is_resource_modified(request.environ, etag=etag):
+                cache.no_modificados += 1
+                respuesta = make_response('', 304)
+            else:
+                entrada = cache.almacen.get(clave)
+                if entrada is not None and entrada.etag == etag:
+                    cache.aciertos += 1
+                    respuesta = current_app.response_class(entrada.cuerpo, mimetype=entrada.mimetype)
+                else:
+                    cache.fallos += 1
+                    respuesta = make_response(vista(*args, **kwargs))
+                    if respuesta.status_code != 200 or respuesta.is_streamed:
+                        return respuesta
+                    cache.almacen.set(clave, Entrada(etag, respuesta.get_data(), respuesta.mimetype))
+            respuesta.set_etag(etag)
+            if modificado:
+                respuesta.last_modified = modificado
+            # El navegador puede guardar la página pero debe revalidarla siempre
+            respuesta.cache_control.no_cache = True
+            return respuesta
+
+        return envoltura
+
+    return decorador
@@ -0,0 +1,234 @@
+"""Agregados diarios de circulación: préstamos y devoluciones por día.
+
+Cuatro tablas, una por dimensión, con una fila por día y valor:
+
+    circulacion_dia     totales del día (de acá salen los meses)
+    circulacion_genero  por género del libro
+    circulacion_autor   por autor del libro
+    circulacion_rol     por rol del usuario
+
+Los triggers sobre `prestamo` suman en la misma transacción: un préstamo
+cuenta el día de `fecha_prestamo` y una devolución el día en que se marca
+(`date('now')`); los préstamos que se cargan ya devueltos (importaciones)
+cuentan la devolución en `fecha_devolucion`, o hoy si esa fecha todavía no
+llegó. Los agregados son un registro
+de lo que pasó: archivar o borrar préstamos no los descuenta, y el género,
+autor o rol es el que tenía el libro o el usuario en ese momento.
+
+`reconstruir` los recalcula desde `prestamo` y `prestamo_historico` por
+tramos de días, cada tramo en su propia transacción. Como no se guarda el
+día real de cada devolución, el recálculo las cuenta igual que una
+importación: en `fecha_devolucion`, o hoy si es posterior.
+"""
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy import DDL, Date, bindparam, event, text
+
+import cache_respuestas
+
+TRAMO = 31
+
+Dimension = namedtuple('Dimension', ['tabla', 'clave', 'expresion'])
+
+# `expresion` se evalúa sobre el libro `l` y el usuario `u` del préstamo
+DIMENSIONES = {
+    'dia': Dimension('circulacion_dia', None, None),
+    'genero': Dimension('circulacion_genero', 'genero', "COALESCE(l.genero, '')"),
+    'autor': Dimension('circulacion_autor', 'autor_id', 'l.autor_id'),
+    'rol': Dimension('circulacion_rol', 'rol', "COALESCE(u.rol, '')"),
+}
+
+
+def _columnas(dimension):
+    return ('dia', dimension.clave) if dimension.clave else ('dia',)
+
+
+def _sumar(dimension, dia, prestamos, devoluciones, origen):
+    """INSERT ... ON CONFLICT que suma a la fila (dia, clave) de `dimension`."""
+    columnas = _columnas(dimension)
+    valores = (dia, dimension.expresion) if dimension.clave else (dia,)
+    return f"""
+        INSERT INTO {dimension.tabla} ({', '.join(columnas)}, prestamos, devoluciones)
+        SELECT {', '.join(valores)}, {prestamos}, {devoluciones}
+        {origen}
+        ON CONFLICT ({', '.join(columnas)}) DO UPDATE SET
+            prestamos = {dimension.tabla}.prestamos + excluded.prestamos,
+            devoluciones = {dimension.tabla}.devoluciones + excluded.devoluciones"""
+
+
+def _trigger(nombre, evento, condicion, dia, prestamos, devoluciones):
+    origen = 'FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id'
+    cuerpo = ';'.join(_sumar(d, dia, prestamos, devoluciones, origen) for d in DIMENSIONES.values())
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS {nombre} {evento}
+    WHEN {condicion} BEGIN{cuerpo};
+    END
+    """
+
+
+DDL_SQLITE = [
+    _trigger(
+        'prestamo_circulacion_ai', 'AFTER INSERT ON prestamo',
+        'new.fecha_prestamo IS NOT NULL', 'new.fecha_prestamo', 1, 0,
+    ),
+    _trigger(
+        'prestamo_circulacion_devuelto_ai', 'AFTER INSERT ON prestamo',
+        'new.devuelto AND COALESCE(new.fecha_devolucion, new.fecha_prestamo) IS NOT NULL',
+        "MIN(COALESCE(new.fecha_devolucion, new.fecha_prestamo), date('now', 'localtime'))", 0, 1,
+    ),
+    _trigger(
+        'prestamo_circulacion_au', 'AFTER UPDATE OF devuelto ON prestamo',
+        'new.devuelto AND NOT COALESCE(old.devuelto, 0)', "date('now', 'localtime')", 0, 1,
+    ),
+]
+
+
+def registrar(metadata):
+    """Crea los triggers junto con las tablas en `db.create_all()`."""
+    for sentencia in DDL_SQLITE:
+        event.listen(metadata, 'after_create', DDL(sentencia).execute_if(dialect='sqlite'))
+
+
+# ---------------------------
+# RECONSTRUCCIÓN POR TRAMOS
+# ---------------------------
+# Préstamos del tramo en la tabla caliente y en el histórico; cada rama usa su
+# índice por fecha. `dia` es el día en que cuenta el evento.
+PRESTADOS = """
+    SELECT libro_id, usuario_id, fecha_prestamo AS dia FROM prestamo
+    WHERE fecha_prestamo >= :desde AND fecha_prestamo < :hasta
+    UNION ALL
+    SELECT libro_id, usuario_id, fecha_prestamo FROM prestamo_historico
+    WHERE fecha_prestamo >= :desde AND fecha_prestamo < :hasta
+"""
+# Los devueltos sin fecha de devolución cuentan el día del préstamo y los que
+# vencen después de hoy cuentan hoy, como en el trigger; por eso el tramo que
+# contiene hoy no tiene límite superior (:hasta_devueltos). El OR deja que
+# SQLite use un índice para cada mitad.
+DIA_DEVOLUCION = """CASE WHEN COALESCE(fecha_devolucion, fecha_prestamo) > :hoy THEN :hoy
+        ELSE COALESCE(fecha_devolucion, fecha_prestamo) END"""
+EN_TRAMO = """(fecha_devolucion >= :desde AND fecha_devolucion < :hasta_devueltos
+        OR fecha_devolucion IS NULL AND fecha_prestamo >= :desde AND fecha_prestamo < :hasta_devueltos)"""
+DEVUELTOS = f"""
+    SELECT libro_id, usuario_id, {DIA_DEVOLUCION} AS dia FROM prestamo
+    WHERE devuelto = true AND {EN_TRAMO}
+    UNION ALL
+    SELECT libro_id, usuario_id, {DIA_DEVOLUCION} FROM prestamo_historico
+    WHERE {EN_TRAMO}
+"""
+LIMITES = text("""
+    SELECT MIN(dia) AS dia FROM (
+        SELECT MIN(fecha_prestamo) AS dia FROM prestamo
+        UNION ALL
+        SELECT MIN(fecha_prestamo) FROM prestamo_historico
+    ) AS p
+""").columns(dia=Date)
+
+
+def _parametros(consulta):
+    nombres = {'desde', 'hasta', 'hasta_devueltos', 'hoy'} & set(re.findall(r':(\w+)', consulta))
+    return text(consulta).bindparams(*(bindparam(nombre, type_=Date) for nombre in sorted(nombres)))
+
+
+def _recalcular(dimension):
+    columnas = _columnas(dimension)
+    valores = ('p.dia', dimension.expresion) if dimension.clave else ('p.dia',)
+    agrupar = f"GROUP BY {', '.join(valores)}"
+    return [
+        _parametros(f'DELETE FROM {dimension.tabla} WHERE dia >= :desde AND dia < :hasta'),
+        _parametros(f"""
+            INSERT INTO {dimension.tabla} ({', '.join(columnas)}, prestamos, devoluciones)
+            SELECT {', '.join(valores)}, COUNT(*), 0
+            FROM ({PRESTADOS}) AS p
+            JOIN libro l ON l.id = p.libro_id JOIN usuario u ON u.id = p.usuario_id
+            {agrupar}
+        """),
+        _parametros(_sumar(
+            dimension, 'p.dia', 0, 'COUNT(*)',
+            f"""FROM ({DEVUELTOS}) AS p
+            JOIN libro l ON l.id = p.libro_id JOIN usuario u ON u.id = p.usuario_id
+            WHERE true {agrupar}""",
+        )),
+    ]
+
+
+RECALCULAR = [sentencia for d in DIMENSIONES.values() for sentencia in _recalcular(d)]
+
+
+def reconstruir_tramo(conexion, desde, hasta, hoy=None):
+    """Recalcula los días [desde, hasta) de todas las tablas en la transacción de `conexion`."""
+    hoy = hoy or date.today()
+    parametros = {
+        'desde': desde, 'hasta': hasta, 'hoy': hoy,
+        'hasta_devueltos': date.max if hasta > hoy else hasta,
+    }
+    for sentencia in RECALCULAR:
+        conexion.execute(sentencia, parametros)
+    cache_respuestas.incrementar(conexion, ['prestamo'])
+
+
+def reconstruir(engine, desde=None, hasta=None, dias=TRAMO, progreso=print):
+    """Recalcula los agregados de [desde, hasta] de a `dias` días por transacción.
+
+    Por defecto, desde el primer préstamo registrado hasta hoy; nunca pasa de
+    hoy. Devuelve cuántos tramos procesó.
+    """
+    hoy = date.today()
+    if desde is None:
+        with engine.connect() as conexion:
+            desde = conexion.execute(LIMITES).scalar()
+        if desde is None:
+            return 0
+    fin = min(hasta or hoy, hoy) + timedelta(days=1)
+    tramos = 0
+    while desde < fin:
+        siguiente = min(desde + timedelta(days=dias), fin)
+        with engine.begin() as conexion:
+            reconstruir_tramo(conexion, desde, siguiente, hoy)
+        tramos += 1
+        progreso(f'{desde} a {siguiente - timedelta(days=1)}')
+        desde = siguiente
+    return tramos
+
+
+# ---------------------------
+# CONSULTAS
+# ---------------------------
+def por_mes(session, desde, hasta):
+    """[(mes 'AAAA-MM', prestamos, devoluciones)] sumando las filas diarias."""
+    filas = session.execute(
+        text("""
+            SELECT dia, prestamos, devoluciones FROM circulacion_dia
+            WHERE dia >= :desde AND dia <= :hasta ORDER BY dia
+        """).bindparams(bindparam('desde', type_=Date), bindparam('hasta', type_=Date)).columns(dia=Date),
+        {'desde': desde, 'hasta': hasta},
+    )
+    meses = {}
+    for fila in filas:
+        mes = meses.setdefault(fila.dia.strftime('%Y-%m'), [0, 0])
+        mes[0] += fila.prestamos
+        mes[1] += fila.devoluciones
+    return [(mes, prestamos, devoluciones) for mes, (prestamos, devoluciones) in meses.items()]
+
+
+def por_dimension(session, nombre, desde, hasta, n=10):
+    """Los `n` valores de la dimensión con más préstamos en [desde, hasta]."""
+    dimension = DIMENSIONES[nombre]
+    consulta = f"""
+        SELECT {dimension.clave} AS valor, SUM(prestamos) AS prestamos, SUM(devoluciones) AS devoluciones
+        FROM {dimension.tabla} WHERE dia >= :desde AND dia <= :hasta
+        GROUP BY {dimension.clave} ORDER BY prestamos DESC, valor LIMIT :n
+    """
+    if nombre == 'autor':
+        # Se agrega primero: sólo las n filas del resultado buscan el nombre
+        consulta = f"""
+            SELECT c.valor AS id, a.nombre AS valor, c.prestamos, c.devoluciones
+            FROM ({consulta}) AS c JOIN autor a ON a.id = c.valor
+            ORDER BY c.prestamos DESC, c.valor
+        """
+    return session.execute(
+        text(consulta).bindparams(bindparam('desde', type_=Date), bindparam('hasta', type_=Date)),
+        {'desde': desde, 'hasta': hasta, 'n': n},
+    ).all()
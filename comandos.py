@@ -0,0 +1,316 @@
+"""Comandos de `flask` para mantenimiento, importación, exportación y respaldo."""
+import time
+from collections import Counter
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import busqueda
+import cache_respuestas
+import circulacion
+import disponibilidad
+import eliminacion
+import estadisticas
+import exportacion
+import funciones
+import historico
+import importacion
+import plantillas
+import recomendaciones
+import recordatorios
+import respaldo
+import vencidos
+from database import db
+
+
+# ---------------------------
+# RECONSTRUCCIÓN DE TABLAS DERIVADAS
+# ---------------------------
+@click.command('reconstruir-disponibilidad')
+@with_appcontext
+def reconstruir_disponibilidad():
+    """Recalcula los ejemplares disponibles de cada libro a partir de los préstamos pendientes."""
+    with db.engine.begin() as conexion:
+        total = disponibilidad.reconstruir(conexion)
+    print(f"Disponibilidad reconstruida: {total} libros.")
+
+@click.command('actualizar-vencidos')
+@click.option('--reconstruir', is_flag=True, help='Recalcula la tabla entera en vez de sólo los días nuevos.')
+@with_appcontext
+def actualizar_vencidos(reconstruir):
+    """Agrega los préstamos que vencieron desde la última corrida (pensado para cron, tras medianoche)."""
+    with db.engine.begin() as conexion:
+        if reconstruir:
+            agregados = vencidos.reconstruir(conexion)
+        else:
+            agregados = vencidos.actualizar(conexion)
+    print(f"Préstamos vencidos actualizados: {agregados} agregados.")
+
+@click.command('reconstruir-estadisticas')
+@with_appcontext
+def reconstruir_estadisticas():
+    """Recalcula los contadores de libros por autor y préstamos por libro."""
+    with db.engine.begin() as conexion:
+        autores, libros = estadisticas.reconstruir(conexion)
+    print(f"Estadísticas reconstruidas: {autores} autores, {libros} libros.")
+
+@click.command('reconstruir-circulacion')
+@click.option('--desde', type=click.DateTime(['%Y-%m-%d']), help='Primer día (por defecto, el primer préstamo).')
+@click.option('--hasta', type=click.DateTime(['%Y-%m-%d']), help='Último día (por defecto, hoy).')
+@click.option('--dias', default=circulacion.TRAMO, show_default=True, help='Días por transacción.')
+@with_appcontext
+def reconstruir_circulacion(desde, hasta, dias):
+    """Recalcula los agregados diarios de circulación desde los préstamos y el histórico."""
+    tramos = circulacion.reconstruir(
+        db.engine, desde=desde.date() if desde else None, hasta=hasta.date() if hasta else None,
+        dias=dias, progreso=click.echo,
+    )
+    print(f"Circulación reconstruida: {tramos} tramos.")
+
+@click.command('archivar-prestamos')
+@click.option('--dias', type=int, help=f'Antigüedad mínima en días (por defecto HISTORICO_DIAS o {historico.DIAS}).')
+@click.option('--lote', default=historico.LOTE, show_default=True, help='Préstamos por transacción.')
+@with_appcontext
+def archivar_prestamos(dias, lote):
+    """Mueve los préstamos devueltos antiguos a prestamo_historico, por lotes (pensado para cron)."""
+    total = historico.archivar(db.engine, dias=dias, lote=lote, progreso=click.echo)
+    print(f"Préstamos archivados: {total}.")
+
+@click.command('recomendaciones')
+@click.option('--completo', is_flag=True, help='Recalcula todos los libros y no sólo los de los préstamos nuevos.')
+@click.option('--vecinos', 'k', default=recomendaciones.K, show_default=True, help='Libros similares por libro.')
+@with_appcontext
+def calcular_recomendaciones(completo, k):
+    """Actualiza los libros similares a partir de los préstamos (pensado para cron; requiere numpy y scipy)."""
+    calcular = recomendaciones.calcular if completo else recomendaciones.actualizar
+    try:
+        total = calcular(db.engine, recomendaciones.ruta_por_defecto(current_app), k=k, progreso=click.echo)
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+    print(f"Recomendaciones actualizadas: {total} libros.")
+
+@click.command('reindexar-busqueda')
+@with_appcontext
+def reindexar_busqueda():
+    """Reconstruye los índices de búsqueda y autocompletado."""
+    with db.engine.begin() as conexion:
+        total = busqueda.reconstruir(conexion)
+    print(f"Índice de búsqueda reconstruido: {total} libros.")
+
+@click.command('compilar-plantillas')
+@with_appcontext
+def compilar_plantillas():
+    """Deja compiladas todas las plantillas en la caché de bytecode (JINJA_CACHE_DIR)."""
+    if current_app.jinja_env.bytecode_cache is None:
+        raise click.ClickException('La caché de bytecode está desactivada (JINJA_CACHE_DIR vacío).')
+    print(f"Plantillas compiladas: {plantillas.compilar(current_app)}.")
+
+
+# ---------------------------
+# OPERACIONES POR LOTE
+# ---------------------------
+def operacion_lote_cli(operacion, ids, archivo):
+    texto = ' '.join(ids) + (' ' + archivo.read() if archivo else '')
+    ids, invalidos = funciones.leer_ids(texto)
+    resultados = operacion(db.session, ids)
+    db.session.commit()
+    for i, resultado in resultados.items():
+        click.echo(f'{i}\t{resultado}')
+    for fragmento in invalidos:
+        click.echo(f'{fragmento}\tinvalido')
+    resumen = ', '.join(f'{n} {r}' for r, n in Counter(resultados.values()).most_common())
+    click.echo(f"Procesados {len(resultados)} ids: {resumen or 'ninguno'}"
+               + (f'; {len(invalidos)} inválidos' if invalidos else '') + '.', err=True)
+
+@click.command('devolver')
+@click.argument('ids', nargs=-1)
+@click.option('--archivo', type=click.File('r'), help='Archivo con ids (uno por línea); "-" lee la entrada estándar.')
+@with_appcontext
+def devolver(ids, archivo):
+    """Marca como devueltos muchos préstamos en una transacción."""
+    operacion_lote_cli(funciones.devolver_lote, ids, archivo)
+
+@click.command('retirar-libros')
+@click.argument('ids', nargs=-1)
+@click.option('--archivo', type=click.File('r'), help='Archivo con ids (uno por línea); "-" lee la entrada estándar.')
+@with_appcontext
+def retirar(ids, archivo):
+    """Elimina muchos libros sin préstamos en una transacción."""
+    operacion_lote_cli(funciones.retirar_libros, ids, archivo)
+
+@click.command('eliminar')
+@click.argument('entidad', type=click.Choice(list(eliminacion.PLANES)))
+@click.argument('ids', nargs=-1)
+@click.option('--archivo', type=click.File('r'), help='Archivo con ids (uno por línea); "-" lee la entrada estándar.')
+@click.option('--simular', is_flag=True, help='Sólo informa cuántas filas se borrarían.')
+@click.option('--baja', is_flag=True, help='Da de baja a los usuarios con préstamos en vez de borrarlos.')
+@with_appcontext
+def eliminar(entidad, ids, archivo, simular, baja):
+    """Elimina autores, libros o usuarios con todo lo que depende de ellos, en una transacción."""
+    texto = ' '.join(ids) + (' ' + archivo.read() if archivo else '')
+    ids, invalidos = funciones.leer_ids(texto)
+    if simular:
+        filas = eliminacion.contar(db.session, entidad, ids, baja=baja)
+        db.session.rollback()
+    else:
+        filas = eliminacion.eliminar(db.session, entidad, ids, baja=baja)
+        db.session.commit()
+    for tabla, n in filas.items():
+        click.echo(f'{tabla}\t{n}')
+    for fragmento in invalidos:
+        click.echo(f'{fragmento}\tinvalido', err=True)
+    borradas = sum(n for tabla, n in filas.items() if tabla != 'baja')
+    click.echo(f"{'Se borrarían' if simular else 'Se borraron'} {borradas} filas"
+               + (f"; {filas['baja']} usuarios dados de baja" if filas.get('baja') else '') + '.', err=True)
+
+
+# ---------------------------
+# RECORDATORIOS
+# ---------------------------
+@click.command('enviar-recordatorios')
+@click.option('--lote', default=recordatorios.LOTE, show_default=True, help='Usuarios leídos por vez.')
+@click.option('--conexiones', type=int, help='Conexiones SMTP simultáneas (por defecto SMTP_CONEXIONES o 4).')
+@click.option('--simular', is_flag=True, help='Sólo informa a cuántos usuarios se les escribiría.')
+@with_appcontext
+def enviar_recordatorios(lote, conexiones, simular):
+    """Manda un correo a cada usuario con préstamos vencidos (pensado para cron, una vez por día)."""
+    if simular:
+        print(f"Recordatorios pendientes: {recordatorios.contar(db.engine)} usuarios.")
+        return
+    smtp = {'conexiones': conexiones} if conexiones else {}
+    resumen = recordatorios.enviar(db.engine, lote=lote, progreso=click.echo, **smtp)
+    velocidad = resumen.enviados / resumen.segundos * 60 if resumen.segundos else 0
+    click.echo(
+        f"Recordatorios: {resumen.enviados} enviados, {resumen.fallidos} fallidos "
+        f"en {resumen.segundos:.1f} s ({velocidad:.0f} por minuto)."
+    )
+    if resumen.fallidos:
+        raise SystemExit(1)
+
+
+# ---------------------------
+# IMPORTACIÓN Y EXPORTACIÓN
+# ---------------------------
+@click.command('import')
+@click.argument('tipo', type=click.Choice(list(importacion.ENTIDADES)))
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), help='Por defecto se deduce de la extensión.')
+@click.option('--lote', default=importacion.LOTE, show_default=True, help='Registros por transacción.')
+@click.option('--rechazos', type=click.Path(dir_okay=False), help='Archivo JSONL donde guardar los registros rechazados.')
+@click.option('--reanudar', is_flag=True, help='Continúa desde el último checkpoint del archivo.')
+@with_appcontext
+def importar(tipo, archivo, formato, lote, rechazos, reanudar):
+    """Importa autores, libros, usuarios o préstamos desde un CSV o JSONL."""
+    resumen = importacion.importar(
+        db.engine, tipo, archivo, formato=formato, lote=lote,
+        reanudar=reanudar, rechazos=rechazos, progreso=click.echo,
+    )
+    with db.engine.begin() as conexion:
+        cache_respuestas.incrementar(conexion, importacion.TABLAS[tipo])
+    velocidad = resumen.leidos / resumen.segundos if resumen.segundos else 0
+    click.echo(
+        f"Importación terminada: {resumen.insertados} insertados, {resumen.rechazados} rechazados, "
+        f"{resumen.leidos} leídos en {resumen.segundos:.1f} s ({velocidad:.0f} registros/s)."
+    )
+
+@click.command('export')
+@click.argument('tipo', type=click.Choice(list(exportacion.CONSULTAS)))
+@click.option('--formato', type=click.Choice(list(exportacion.FORMATOS)), default='csv', show_default=True)
+@click.option('--desde', type=click.DateTime(['%Y-%m-%d']), help='Fecha de préstamo mínima (AAAA-MM-DD).')
+@click.option('--hasta', type=click.DateTime(['%Y-%m-%d']), help='Fecha de préstamo máxima (AAAA-MM-DD).')
+@click.option('--gzip', 'comprimir', is_flag=True, help='Comprime la salida con gzip.')
+@click.option('--historico', is_flag=True, help='Incluye los préstamos archivados.')
+@click.option('--salida', type=click.File('wb'), default='-', help='Archivo de salida (por defecto, stdout).')
+@with_appcontext
+def exportar_cli(tipo, formato, desde, hasta, comprimir, historico, salida):
+    """Exporta préstamos o libros en CSV o NDJSON sin cargarlos en memoria."""
+    cuerpo = exportacion.exportar(
+        db.engine, tipo, formato=formato,
+        desde=desde.date() if desde else None,
+        hasta=hasta.date() if hasta else None,
+        gzip=comprimir,
+        historico=historico,
+    )
+    for bloque in cuerpo:
+        salida.write(bloque)
+
+
+# ---------------------------
+# RESPALDO Y RESTAURACIÓN
+# ---------------------------
+def _ruta_sqlite():
+    if not db.engine.url.database or db.engine.url.database == ':memory:':
+        raise click.ClickException('Sólo se respaldan bases SQLite en archivo.')
+    return db.engine.url.database
+
+@click.command('backup')
+@click.option('--incremental', is_flag=True, help='Sólo las páginas que cambiaron desde el último respaldo.')
+@click.option('--gzip', 'comprimir', is_flag=True, help='Comprime el respaldo con gzip.')
+@click.option('--directorio', type=click.Path(file_okay=False), help='Por defecto RESPALDO_DIR o instance/respaldos.')
+@click.option('--paginas', default=respaldo.PAGINAS, show_default=True, help='Páginas copiadas por paso.')
+@click.option('--pausa', default=0.0, show_default=True, help='Milisegundos de espera entre pasos.')
+@with_appcontext
+def respaldar(incremental, comprimir, directorio, paginas, pausa):
+    """Respalda la base en caliente, sin detener la aplicación."""
+    try:
+        resumen = respaldo.respaldar(
+            _ruta_sqlite(), directorio or respaldo.carpeta_por_defecto(current_app),
+            incremental=incremental, comprimir=comprimir, paginas=paginas, pausa=pausa / 1000,
+            progreso=click.echo,
+        )
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+    velocidad = resumen.bytes / resumen.segundos / 1024 / 1024 if resumen.segundos else 0
+    click.echo(
+        f"Respaldo {resumen.tipo} {resumen.nombre}: {resumen.bytes / 1024 / 1024:.1f} MB en "
+        f"{resumen.segundos:.2f} s ({velocidad:.0f} MB/s), {resumen.paginas_cambiadas} páginas guardadas "
+        f"en {resumen.archivo_bytes / 1024 / 1024:.1f} MB; paso más largo {resumen.paso_max_ms:.1f} ms "
+        f"(la espera máxima de un escritor fuera de WAL), {resumen.reinicios} reinicios."
+    )
+
+@click.command('restore')
+@click.argument('nombre', required=False)
+@click.option('--directorio', type=click.Path(file_okay=False), help='Por defecto RESPALDO_DIR o instance/respaldos.')
+@click.option('--destino', type=click.Path(dir_okay=False), help='Restaura en este archivo nuevo y no sobre la base.')
+@click.option('--verificar', is_flag=True, help='Sólo reconstruye y verifica el respaldo.')
+@click.option('--listar', is_flag=True, help='Lista los respaldos disponibles.')
+@click.option('--yes', 'confirmado', is_flag=True, help='No pide confirmación para reemplazar la base.')
+@with_appcontext
+def restaurar(nombre, directorio, destino, verificar, listar, confirmado):
+    """Restaura el respaldo NOMBRE (por defecto, el último) después de verificarlo."""
+    carpeta = directorio or respaldo.carpeta_por_defecto(current_app)
+    if listar:
+        for manifiesto in respaldo.listar(carpeta):
+            click.echo(f"{manifiesto['nombre']}  {manifiesto['tipo']}  {manifiesto['paginas_cambiadas']} páginas")
+        return
+    ruta_base = None
+    if not (verificar or destino):
+        ruta_base = _ruta_sqlite()
+        if not confirmado:
+            click.confirm(f'Se reemplazará {ruta_base} con el respaldo. ¿Continuar?', abort=True)
+    inicio = time.perf_counter()
+    try:
+        manifiesto = respaldo.restaurar(carpeta, nombre, ruta_destino=destino, ruta_base=ruta_base)
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+    if ruta_base:
+        # Las conexiones del pool no deben seguir con páginas de la base anterior en caché
+        db.engine.dispose()
+    accion = 'verificado' if verificar else f"restaurado en {destino or ruta_base}"
+    click.echo(
+        f"Respaldo {manifiesto['nombre']} {accion} en {time.perf_counter() - inicio:.2f} s "
+        f"(integridad, sha256 y filas de {len(manifiesto['conteos'])} tablas correctos)."
+    )
+
+
+COMANDOS = (
+    reconstruir_disponibilidad, actualizar_vencidos, reconstruir_estadisticas, reconstruir_circulacion,
+    archivar_prestamos, calcular_recomendaciones, reindexar_busqueda, compilar_plantillas,
+    devolver, retirar, eliminar, enviar_recordatorios, importar, exportar_cli, respaldar, restaurar,
+)
+
+
+def registrar(app):
+    for comando in COMANDOS:
+        app.cli.add_command(comando)
@@ -0,0 +1,141 @@
+"""Perfil del motor de base de datos.
+
+La URI y los parámetros de SQLite se leen del entorno:
+
+    DATABASE_URL           URI principal (por defecto sqlite:///biblioteca.db)
+    DATABASE_REPLICA_URL   réplica opcional para las rutas de sólo lectura
+    SQLITE_BUSY_TIMEOUT, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE
+
+Sólo se admite SQLite: los contadores (estadistica_*), los vencidos, la
+circulación diaria, la disponibilidad de los libros nuevos y los índices de
+búsqueda se mantienen con triggers de SQLite, y en otro motor quedarían
+vacíos o desactualizados sin que nada fallara. `comprobar_uri` rechaza
+cualquier otra URI al arrancar.
+
+En SQLite cada conexión nueva se configura con WAL (lectores y un escritor en
+paralelo en vez de bloquearse por el journal), `synchronous=NORMAL` (seguro
+con WAL y mucho más barato que FULL), `busy_timeout` para que un escritor
+espere al otro en lugar de fallar con "database is locked", y caché/mmap más
+grandes que los valores por defecto.
+
+Los motores se crean sin conectar; la primera conexión se abre en la primera
+consulta. Con `gunicorn --preload` la aplicación se construye en el proceso
+maestro y los workers heredan los motores: `descartar_al_bifurcar` hace que
+cada hijo tire el pool heredado (sin cerrar los sockets del padre) y abra
+conexiones propias.
+"""
+import functools
+import os
+import weakref
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+URI_POR_DEFECTO = 'sqlite:///biblioteca.db'
+
+
+def _entero(nombre, defecto):
+    return int(os.environ.get(nombre, defecto))
+
+
+def pragmas_sqlite():
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': _entero('SQLITE_BUSY_TIMEOUT', 5000),
+        # Negativo = KiB: 64 MB de caché de páginas por conexión
+        'cache_size': _entero('SQLITE_CACHE_SIZE', -64000),
+        'mmap_size': _entero('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'temp_store': 'MEMORY',
+    }
+
+
+def comprobar_uri(uri):
+    """Devuelve `uri` si es de SQLite; si no, falla en vez de arrancar con tablas derivadas sin mantener."""
+    if not uri.startswith('sqlite'):
+        raise RuntimeError(
+            f'Motor no soportado: {uri.split(":", 1)[0]}. Las tablas derivadas se mantienen con '
+            'triggers de SQLite; DATABASE_URL y DATABASE_REPLICA_URL tienen que ser sqlite://'
+        )
+    return uri
+
+
+def configurar(app):
+    """Completa la configuración de Flask-SQLAlchemy a partir del entorno."""
+    uri = os.environ.get('DATABASE_URL', URI_POR_DEFECTO)
+    app.config['SQLALCHEMY_DATABASE_URI'] = comprobar_uri(uri)
+    replica = os.environ.get('DATABASE_REPLICA_URL')
+    if replica:
+        app.config['SQLALCHEMY_BINDS'] = {'replica': comprobar_uri(replica)}
+
+
+def aplicar_pragmas(engine, pragmas=None):
+    """Ejecuta los PRAGMA en cada conexión nueva del motor."""
+    pragmas = pragmas_sqlite() if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def _al_conectar(conexion_dbapi, registro):
+        cursor = conexion_dbapi.cursor()
+        for nombre, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+        cursor.close()
+
+
+def preparar_motores(app, db):
+    with app.app_context():
+        for engine in db.engines.values():
+            aplicar_pragmas(engine)
+            descartar_al_bifurcar(engine)
+
+
+# ---------------------------
+# PROCESOS HIJOS (PREFORK)
+# ---------------------------
+_motores_heredables = weakref.WeakSet()
+
+
+def descartar_al_bifurcar(engine):
+    """Registra un motor para que los procesos hijos no reutilicen sus conexiones."""
+    _motores_heredables.add(engine)
+
+
+def _tras_bifurcar():
+    for engine in list(_motores_heredables):
+        # close=False: las conexiones siguen siendo del padre, el hijo sólo las olvida
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_tras_bifurcar)
+
+
+# ---------------------------
+# RÉPLICA DE LECTURA
+# ---------------------------
+class SesionEnrutada(Session):
+    """Sesión que manda las consultas de las vistas `@solo_lectura` a la réplica.
+
+    Los flush (INSERT/UPDATE/DELETE) siempre van al motor principal.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('solo_lectura'):
+            replica = self._db.engines.get('replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def solo_lectura(vista):
+    """Marca una vista como de sólo lectura para que pueda servirse desde la réplica."""
+    @functools.wraps(vista)
+    def envoltura(*args, **kwargs):
+        g.solo_lectura = True
+        return vista(*args, **kwargs)
+    return envoltura
+
+
+def motor_lectura(db):
+    """Motor para lecturas largas fuera del ORM (exportaciones): la réplica si existe."""
+    return db.engines.get('replica', db.engine)
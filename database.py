@@ -1,5 +1,18 @@
+"""Extensiones compartidas, creadas sin aplicación y enlazadas en `create_app()`.
+
+Importar este módulo (o `models`) no abre conexiones: los motores se crean en
+`db.init_app(app)` y se conectan recién con la primera consulta.
+"""
+from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
+import cache_respuestas
+import configuracion
+
 # Instancia global de SQLAlchemy
-db = SQLAlchemy()
-# Configuración de la base de datos 
+db = SQLAlchemy(session_options={'class_': configuracion.SesionEnrutada})
+migrate = Migrate()
+
+# Cada flush que toca una tabla incrementa su versión. El evento es de la clase
+# de sesión, así que se registra una vez por proceso y no en cada create_app()
+cache_respuestas.registrar(configuracion.SesionEnrutada)
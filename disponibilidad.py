@@ -0,0 +1,322 @@
+"""Ejemplares por título, préstamo atómico y cola de reservas.
+
+`disponibilidad` tiene una fila por libro con los ejemplares que posee la
+biblioteca y cuántos están libres. Prestar es un UPDATE condicional
+
+    UPDATE disponibilidad SET disponibles = disponibles - 1
+    WHERE libro_id = :libro_id AND disponibles > 0
+
+que la base aplica de forma atómica: si dos mostradores piden el último
+ejemplar a la vez, uno modifica la fila y el otro ve 0 filas afectadas, sin
+leer antes y sin bloquear nada más que esa fila (en SQLite, la transacción
+de escritura empieza directamente con ese UPDATE, así que no hay lectura que
+tenga que promoverse a escritura). Devolver hace lo inverso, y la
+disponibilidad de un título se consulta con una lectura por clave primaria.
+
+Cuando no quedan ejemplares el usuario puede reservar. Al devolverse un
+ejemplar de un título con reservas pendientes, en vez de volver a
+`disponibles` queda apartado para la reserva más antigua (estado 'lista')
+y se entrega cuando ese usuario lo pide prestado.
+
+La fila de cada libro nuevo la crean `crear` (funciones.crear_libros) y
+`crear_desde` (la importación); el trigger de SQLite sólo cubre los INSERT
+hechos a mano. Los préstamos importados no pasan por `prestar`: la
+importación recalcula sus libros con `recalcular_desde`. Lo que quede desfasado se corrige con
+`flask reconstruir-disponibilidad`.
+"""
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+
+from sqlalchemy import DDL, Date, bindparam, event, text
+
+PENDIENTE = 'pendiente'
+LISTA = 'lista'
+CUMPLIDA = 'cumplida'
+CANCELADA = 'cancelada'
+ACTIVAS = (PENDIENTE, LISTA)
+
+Disponibilidad = namedtuple('Disponibilidad', ['libro_id', 'ejemplares', 'disponibles'])
+
+
+class SinEjemplares(Exception):
+    """No hay ejemplares libres del título."""
+
+    def __init__(self, libro_id):
+        super().__init__(f'No quedan ejemplares disponibles del libro {libro_id}')
+        self.libro_id = libro_id
+
+
+class ReservaInvalida(Exception):
+    pass
+
+
+class UsuarioDeBaja(Exception):
+    """El usuario fue dado de baja: conserva su historial pero no puede pedir préstamos."""
+
+    def __init__(self, usuario_id):
+        super().__init__(f'El usuario {usuario_id} está dado de baja')
+        self.usuario_id = usuario_id
+
+
+DDL_SQLITE = [
+    """
+    CREATE TRIGGER IF NOT EXISTS libro_disponibilidad_ai AFTER INSERT ON libro BEGIN
+        INSERT INTO disponibilidad (libro_id, ejemplares, disponibles) VALUES (new.id, 1, 1)
+        ON CONFLICT (libro_id) DO NOTHING;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS libro_disponibilidad_ad AFTER DELETE ON libro BEGIN
+        DELETE FROM disponibilidad WHERE libro_id = old.id;
+        DELETE FROM reserva WHERE libro_id = old.id;
+    END
+    """,
+]
+
+
+def registrar(metadata):
+    """Crea los triggers junto con las tablas en `db.create_all()`."""
+    for sentencia in DDL_SQLITE:
+        event.listen(metadata, 'after_create', DDL(sentencia).execute_if(dialect='sqlite'))
+
+
+def _ahora():
+    return datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+
+
+# ---------------------------
+# CONSULTA
+# ---------------------------
+def consultar(session, libro_id):
+    """Ejemplares y disponibles de un libro (una lectura por clave primaria), o None."""
+    fila = session.execute(
+        text('SELECT libro_id, ejemplares, disponibles FROM disponibilidad WHERE libro_id = :libro_id'),
+        {'libro_id': libro_id},
+    ).first()
+    return Disponibilidad(*fila) if fila else None
+
+
+# ---------------------------
+# LIBROS NUEVOS
+# ---------------------------
+CREAR = text("""
+    INSERT INTO disponibilidad (libro_id, ejemplares, disponibles) VALUES (:libro_id, :ejemplares, :ejemplares)
+    ON CONFLICT (libro_id) DO UPDATE SET ejemplares = excluded.ejemplares, disponibles = excluded.disponibles
+""")
+CREAR_DESDE = text("""
+    INSERT INTO disponibilidad (libro_id, ejemplares, disponibles)
+    SELECT id, 1, 1 FROM libro WHERE id > :desde
+    ON CONFLICT (libro_id) DO NOTHING
+""")
+
+
+def crear(session, ejemplares):
+    """Crea la disponibilidad de libros recién insertados ({libro_id: ejemplares})."""
+    if ejemplares:
+        session.execute(CREAR, [{'libro_id': l, 'ejemplares': n} for l, n in ejemplares.items()])
+
+
+def crear_desde(conexion, desde):
+    """Un ejemplar para cada libro con id mayor que `desde` que todavía no tenga fila."""
+    conexion.execute(CREAR_DESDE, {'desde': desde})
+
+
+# ---------------------------
+# PRÉSTAMO Y DEVOLUCIÓN
+# ---------------------------
+TOMAR_APARTADO = text("""
+    UPDATE reserva SET estado = 'cumplida'
+    WHERE id = (
+        SELECT id FROM reserva
+        WHERE libro_id = :libro_id AND usuario_id = :usuario_id AND estado = 'lista'
+        ORDER BY id LIMIT 1
+    )
+""")
+TOMAR_EJEMPLAR = text("""
+    UPDATE disponibilidad SET disponibles = disponibles - 1
+    WHERE libro_id = :libro_id AND disponibles > 0
+""")
+DE_BAJA = text('SELECT 1 FROM usuario WHERE id = :usuario_id AND baja IS NOT NULL')
+INSERTAR_PRESTAMO = text("""
+    INSERT INTO prestamo (libro_id, usuario_id, fecha_prestamo, fecha_devolucion, devuelto)
+    VALUES (:libro_id, :usuario_id, :fecha_prestamo, :fecha_devolucion, false)
+    RETURNING id
+""").bindparams(bindparam('fecha_prestamo', type_=Date), bindparam('fecha_devolucion', type_=Date))
+
+
+def prestar(session, libro_id, usuario_id, fecha_prestamo, fecha_devolucion):
+    """Registra el préstamo si hay un ejemplar (o uno apartado para el usuario). Devuelve su id.
+
+    Lanza SinEjemplares si no queda ninguno y UsuarioDeBaja si el usuario fue
+    dado de baja; en esos casos no se escribe nada.
+    """
+    parametros = {'libro_id': libro_id, 'usuario_id': usuario_id}
+    if session.execute(DE_BAJA, parametros).first():
+        raise UsuarioDeBaja(usuario_id)
+    if not session.execute(TOMAR_APARTADO, parametros).rowcount:
+        if not session.execute(TOMAR_EJEMPLAR, parametros).rowcount:
+            raise SinEjemplares(libro_id)
+    return session.execute(INSERTAR_PRESTAMO, {
+        **parametros, 'fecha_prestamo': fecha_prestamo, 'fecha_devolucion': fecha_devolucion,
+    }).scalar_one()
+
+
+def devolver(session, ids):
+    """Marca como devueltos los préstamos pendientes de `ids` y libera sus ejemplares.
+
+    Los préstamos ya devueltos no se cuentan dos veces. Devuelve los ids que se marcaron.
+    """
+    ids = list(ids)
+    devueltos = []
+    for i in range(0, len(ids), 500):
+        devueltos += session.execute(
+            text('UPDATE prestamo SET devuelto = true WHERE id IN :ids AND devuelto = false '
+                 'RETURNING id, libro_id')
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(ids[i:i + 500])},
+        ).all()
+    liberar(session, Counter(libro_id for _, libro_id in devueltos))
+    return [prestamo_id for prestamo_id, _ in devueltos]
+
+
+def liberar(session, por_libro):
+    """Devuelve ejemplares ({libro_id: cantidad}), apartándolos primero para las reservas pendientes."""
+    if not por_libro:
+        return
+    con_reservas = session.execute(
+        text("SELECT DISTINCT libro_id FROM reserva WHERE libro_id IN :libros AND estado = 'pendiente'")
+        .bindparams(bindparam('libros', expanding=True)),
+        {'libros': list(por_libro)},
+    ).scalars().all()
+    libres = dict(por_libro)
+    ahora = _ahora()
+    for libro_id in con_reservas:
+        libres[libro_id] -= session.execute(text("""
+            UPDATE reserva SET estado = 'lista', lista_desde = :ahora
+            WHERE id IN (
+                SELECT id FROM reserva WHERE libro_id = :libro_id AND estado = 'pendiente'
+                ORDER BY id LIMIT :n
+            )
+        """), {'libro_id': libro_id, 'n': libres[libro_id], 'ahora': ahora}).rowcount
+    incrementos = [{'libro_id': l, 'n': n} for l, n in libres.items() if n]
+    if incrementos:
+        session.execute(
+            text('UPDATE disponibilidad SET disponibles = disponibles + :n WHERE libro_id = :libro_id'),
+            incrementos,
+        )
+
+
+def fijar_ejemplares(session, libro_id, ejemplares):
+    """Cambia la cantidad de ejemplares; falla si quedarían menos que los prestados o apartados.
+
+    Los ejemplares nuevos pasan por `liberar`, así que atienden primero la cola de reservas.
+    """
+    if ejemplares < 0:
+        raise ValueError('La cantidad de ejemplares no puede ser negativa')
+    actual = consultar(session, libro_id)
+    if actual is None:
+        return False
+    if ejemplares > actual.ejemplares:
+        agregados = session.execute(text("""
+            UPDATE disponibilidad SET ejemplares = :ejemplares
+            WHERE libro_id = :libro_id AND ejemplares = :anteriores
+        """), {'libro_id': libro_id, 'ejemplares': ejemplares, 'anteriores': actual.ejemplares}).rowcount
+        if agregados:
+            liberar(session, {libro_id: ejemplares - actual.ejemplares})
+        return agregados > 0
+    return session.execute(text("""
+        UPDATE disponibilidad
+        SET disponibles = disponibles + :ejemplares - ejemplares, ejemplares = :ejemplares
+        WHERE libro_id = :libro_id AND ejemplares - disponibles <= :ejemplares
+    """), {'libro_id': libro_id, 'ejemplares': ejemplares}).rowcount > 0
+
+
+# ---------------------------
+# RESERVAS
+# ---------------------------
+def reservar(session, libro_id, usuario_id):
+    """Pone al usuario en la cola del libro. Devuelve el id de la reserva.
+
+    Sólo se puede reservar un título sin ejemplares libres y una vez por usuario.
+    """
+    if session.execute(DE_BAJA, {'usuario_id': usuario_id}).first():
+        raise ReservaInvalida('El usuario está dado de baja')
+    reserva_id = session.execute(text("""
+        INSERT INTO reserva (libro_id, usuario_id, creada, estado)
+        SELECT :libro_id, :usuario_id, :ahora, 'pendiente'
+        WHERE NOT EXISTS (
+            SELECT 1 FROM disponibilidad WHERE libro_id = :libro_id AND disponibles > 0
+        ) AND NOT EXISTS (
+            SELECT 1 FROM reserva
+            WHERE libro_id = :libro_id AND usuario_id = :usuario_id AND estado IN ('pendiente', 'lista')
+        )
+        RETURNING id
+    """), {'libro_id': libro_id, 'usuario_id': usuario_id, 'ahora': _ahora()}).scalar()
+    if reserva_id is None:
+        disponible = consultar(session, libro_id)
+        if disponible and disponible.disponibles > 0:
+            raise ReservaInvalida('Hay ejemplares disponibles: se puede prestar directamente')
+        raise ReservaInvalida('El usuario ya tiene una reserva activa de este libro')
+    return reserva_id
+
+
+def cancelar_reserva(session, reserva_id):
+    """Cancela una reserva activa; si tenía un ejemplar apartado, pasa al siguiente de la cola."""
+    fila = session.execute(
+        text('SELECT libro_id, estado FROM reserva WHERE id = :id'), {'id': reserva_id},
+    ).first()
+    if fila is None or fila.estado not in ACTIVAS:
+        return False
+    cancelada = session.execute(
+        text("UPDATE reserva SET estado = 'cancelada' WHERE id = :id AND estado = :estado"),
+        {'id': reserva_id, 'estado': fila.estado},
+    ).rowcount
+    if cancelada and fila.estado == LISTA:
+        liberar(session, {fila.libro_id: 1})
+    return bool(cancelada)
+
+
+# ---------------------------
+# RECONSTRUCCIÓN
+# ---------------------------
+# `o.n` son los ejemplares ocupados (prestados o apartados) de cada libro. Las
+# expresiones del SET ven los valores anteriores de la fila, así que ambas
+# columnas se calculan con el mismo `ejemplares` y nunca se viola
+# ck_disponibilidad_rango a mitad de la sentencia. CASE en vez de MAX(a, b),
+# que sólo existe en SQLite.
+RECALCULAR = """
+    UPDATE disponibilidad SET
+        ejemplares = CASE WHEN o.n > disponibilidad.ejemplares THEN o.n ELSE disponibilidad.ejemplares END,
+        disponibles = CASE WHEN o.n > disponibilidad.ejemplares THEN 0 ELSE disponibilidad.ejemplares - o.n END
+    FROM (
+        SELECT d.libro_id,
+               (SELECT COUNT(*) FROM prestamo p WHERE p.libro_id = d.libro_id AND p.devuelto = false)
+             + (SELECT COUNT(*) FROM reserva r WHERE r.libro_id = d.libro_id AND r.estado = 'lista') AS n
+        FROM disponibilidad d
+        {filtro}
+    ) AS o
+    WHERE o.libro_id = disponibilidad.libro_id
+"""
+RECALCULAR_DESDE = text(RECALCULAR.format(
+    filtro='WHERE d.libro_id IN (SELECT libro_id FROM prestamo WHERE id > :desde)',
+))
+
+
+def reconstruir(conexion):
+    """Recalcula los disponibles a partir de los préstamos pendientes y los ejemplares apartados.
+
+    Si algún título tiene más préstamos pendientes que ejemplares, se asume que
+    la biblioteca tiene al menos esos ejemplares. Devuelve la cantidad de libros.
+    """
+    conexion.execute(text('DELETE FROM disponibilidad WHERE libro_id NOT IN (SELECT id FROM libro)'))
+    conexion.execute(text("""
+        INSERT INTO disponibilidad (libro_id, ejemplares, disponibles)
+        SELECT id, 1, 1 FROM libro WHERE id NOT IN (SELECT libro_id FROM disponibilidad)
+    """))
+    conexion.execute(text(RECALCULAR.format(filtro='')))
+    return conexion.execute(text('SELECT COUNT(*) FROM disponibilidad')).scalar()
+
+
+def recalcular_desde(conexion, desde):
+    """Como `reconstruir`, pero sólo para los libros de los préstamos con id mayor que `desde`."""
+    conexion.execute(RECALCULAR_DESDE, {'desde': desde})
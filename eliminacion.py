@@ -0,0 +1,172 @@
+"""Borrado en cascada por conjuntos de autores, libros y usuarios.
+
+Borrar un autor borra sus libros; borrar un libro, sus préstamos (también
+los archivados), reservas, disponibilidad y recomendaciones; borrar un
+usuario, sus préstamos y reservas. Cada tabla se vacía con un DELETE sobre
+una subconsulta, de las dependientes a la raíz (ver PLANES), por trozos de
+ids: ninguna fila pasa por la sesión del ORM y la memoria no depende de
+cuántos libros o préstamos arrastre el borrado. No se usa ON DELETE
+CASCADE porque SQLite no aplica las claves foráneas sin `PRAGMA
+foreign_keys`; las relaciones del ORM llevan `passive_deletes='all'` para
+que un `session.delete()` suelto tampoco cargue a los hijos.
+
+Los contadores, los vencidos y los índices de búsqueda siguen a cargo de
+sus triggers. Los agregados de circulación no se descuentan (son un
+registro de lo que pasó, ver circulacion.py).
+
+`contar` recorre el mismo plan con SELECT COUNT(*): es la simulación, y
+devuelve lo mismo que `eliminar` sin tocar nada. Con `baja=True` los
+usuarios con historial de préstamos no se borran sino que se dan de baja:
+conservan sus préstamos, se cancelan sus reservas y dejan de aparecer en el
+listado y en el login.
+"""
+from collections import Counter, namedtuple
+from datetime import date
+
+from sqlalchemy import Date, bindparam, text
+
+import cache_respuestas
+import disponibilidad
+
+TROZO = 500
+
+Paso = namedtuple('Paso', ['tabla', 'condicion'])
+
+_LIBROS = 'libro_id IN ({})'
+_DE_LIBROS = _LIBROS.format(':ids')
+_DE_AUTORES = _LIBROS.format('SELECT id FROM libro WHERE autor_id IN :ids')
+_DE_USUARIOS = 'usuario_id IN :ids'
+
+# De las tablas dependientes a la raíz; cada condición se evalúa con los ids del trozo
+PLANES = {
+    'autor': [
+        Paso('reserva', _DE_AUTORES),
+        Paso('prestamo', _DE_AUTORES),
+        Paso('prestamo_historico', _DE_AUTORES),
+        Paso('disponibilidad', _DE_AUTORES),
+        Paso('libro_similar', _DE_AUTORES),
+        Paso('libro', 'autor_id IN :ids'),
+        Paso('autor', 'id IN :ids'),
+    ],
+    'libro': [
+        Paso('reserva', _DE_LIBROS),
+        Paso('prestamo', _DE_LIBROS),
+        Paso('prestamo_historico', _DE_LIBROS),
+        Paso('disponibilidad', _DE_LIBROS),
+        Paso('libro_similar', _DE_LIBROS),
+        Paso('libro', 'id IN :ids'),
+    ],
+    'usuario': [
+        Paso('reserva', _DE_USUARIOS),
+        Paso('prestamo', _DE_USUARIOS),
+        Paso('prestamo_historico', _DE_USUARIOS),
+        Paso('usuario_vencidos', _DE_USUARIOS),
+        Paso('recordatorio', _DE_USUARIOS),
+        Paso('usuario', 'id IN :ids'),
+    ],
+}
+
+# Ejemplares que tienen tomados los usuarios: préstamos pendientes y reservas apartadas
+OCUPADOS = text("""
+    SELECT libro_id, COUNT(*) AS n FROM (
+        SELECT libro_id FROM prestamo WHERE usuario_id IN :ids AND devuelto = false
+        UNION ALL
+        SELECT libro_id FROM reserva WHERE usuario_id IN :ids AND estado = 'lista'
+    ) AS o
+    GROUP BY libro_id
+""").bindparams(bindparam('ids', expanding=True))
+# El trigger de `prestamo` descuenta los préstamos borrados del ranking; los
+# archivados se descuentan aparte
+DESCONTAR_HISTORICO = text("""
+    UPDATE estadistica_libro SET total_prestamos = total_prestamos - h.n
+    FROM (
+        SELECT libro_id, COUNT(*) AS n FROM prestamo_historico
+        WHERE usuario_id IN :ids GROUP BY libro_id
+    ) AS h
+    WHERE estadistica_libro.libro_id = h.libro_id
+""").bindparams(bindparam('ids', expanding=True))
+CON_HISTORIAL = text("""
+    SELECT id FROM usuario
+    WHERE id IN :ids AND (
+        EXISTS (SELECT 1 FROM prestamo p WHERE p.usuario_id = usuario.id)
+        OR EXISTS (SELECT 1 FROM prestamo_historico h WHERE h.usuario_id = usuario.id)
+    )
+""").bindparams(bindparam('ids', expanding=True))
+DAR_DE_BAJA = text(
+    'UPDATE usuario SET baja = :hoy WHERE id IN :ids AND baja IS NULL'
+).bindparams(bindparam('ids', expanding=True), bindparam('hoy', type_=Date))
+CANCELAR_RESERVAS = text("""
+    UPDATE reserva SET estado = 'cancelada'
+    WHERE usuario_id IN :ids AND estado IN ('pendiente', 'lista')
+    RETURNING libro_id, estado
+""").bindparams(bindparam('ids', expanding=True))
+
+
+def _en_trozos(valores, tamanio=TROZO):
+    valores = list(dict.fromkeys(valores))
+    for i in range(0, len(valores), tamanio):
+        yield valores[i:i + tamanio]
+
+
+def _sentencia(verbo, paso):
+    return text(f'{verbo} {paso.tabla} WHERE {paso.condicion}').bindparams(bindparam('ids', expanding=True))
+
+
+def _separar(session, entidad, ids, baja):
+    """(ids a borrar, ids a dar de baja): con `baja`, los usuarios con historial no se borran."""
+    ids = list(dict.fromkeys(ids))
+    if not (baja and entidad == 'usuario'):
+        return ids, []
+    con_historial = set()
+    for trozo in _en_trozos(ids):
+        con_historial.update(session.execute(CON_HISTORIAL, {'ids': trozo}).scalars())
+    return [i for i in ids if i not in con_historial], [i for i in ids if i in con_historial]
+
+
+def contar(session, entidad, ids, baja=False):
+    """Simulación: {tabla: filas} que borraría `eliminar` con los mismos argumentos.
+
+    Los usuarios que se darían de baja se cuentan en 'baja'.
+    """
+    borrar, dar_de_baja = _separar(session, entidad, ids, baja)
+    filas = Counter()
+    for trozo in _en_trozos(borrar):
+        for paso in PLANES[entidad]:
+            filas[paso.tabla] += session.execute(_sentencia('SELECT COUNT(*) FROM', paso), {'ids': trozo}).scalar()
+    for trozo in _en_trozos(dar_de_baja):
+        filas['baja'] += session.execute(
+            text('SELECT COUNT(*) FROM usuario WHERE id IN :ids AND baja IS NULL')
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': trozo},
+        ).scalar()
+    return {tabla: n for tabla, n in filas.items() if n}
+
+
+def eliminar(session, entidad, ids, baja=False, hoy=None):
+    """Borra `ids` de `entidad` ('autor', 'libro' o 'usuario') y todo lo que depende de ellos.
+
+    No hace commit. Devuelve {tabla: filas borradas}, con 'baja' para los
+    usuarios dados de baja en vez de borrados.
+    """
+    borrar, dar_de_baja = _separar(session, entidad, ids, baja)
+    filas = Counter()
+    liberados = Counter()
+    for trozo in _en_trozos(borrar):
+        if entidad == 'usuario':
+            # Los ejemplares que tenían vuelven a la cola de reservas o a los disponibles
+            liberados.update({f.libro_id: f.n for f in session.execute(OCUPADOS, {'ids': trozo})})
+            session.execute(DESCONTAR_HISTORICO, {'ids': trozo})
+        for paso in PLANES[entidad]:
+            filas[paso.tabla] += session.execute(_sentencia('DELETE FROM', paso), {'ids': trozo}).rowcount
+    for trozo in _en_trozos(dar_de_baja):
+        filas['baja'] += session.execute(DAR_DE_BAJA, {'ids': trozo, 'hoy': hoy or date.today()}).rowcount
+        canceladas = session.execute(CANCELAR_RESERVAS, {'ids': trozo}).all()
+        liberados.update(libro_id for libro_id, estado in canceladas if estado == disponibilidad.LISTA)
+    disponibilidad.liberar(session, liberados)
+    # Las bajas cambian el listado de usuarios y el histórico sale en las exportaciones de préstamos
+    tablas = {t for t in cache_respuestas.TABLAS if filas[t]}
+    tablas |= {'usuario'} if filas['baja'] else set()
+    tablas |= {'prestamo'} if filas['prestamo_historico'] else set()
+    if tablas:
+        cache_respuestas.incrementar(session.connection(), tablas)
+    return {tabla: n for tabla, n in filas.items() if n}
@@ -0,0 +1,109 @@
+"""Contadores precalculados para los rankings de autores y libros.
+
+`estadistica_autor` guarda cuántos libros tiene cada autor y
+`estadistica_libro` cuántas veces se prestó cada libro, incluidos los
+préstamos ya archivados en `prestamo_historico`. Los triggers de abajo
+los actualizan en la misma transacción que cada INSERT/UPDATE/DELETE sobre
+`libro` y `prestamo`, así que leer un ranking es recorrer un índice en vez de
+agrupar tablas enteras. Si alguna vez se desajustan (por ejemplo tras cargar
+datos con los triggers desactivados) `reconstruir` los recalcula desde cero.
+"""
+from sqlalchemy import DDL, event, text
+
+DDL_SQLITE = [
+    """
+    CREATE TRIGGER IF NOT EXISTS libro_estadistica_ai AFTER INSERT ON libro BEGIN
+        INSERT INTO estadistica_autor (autor_id, total_libros) VALUES (new.autor_id, 1)
+        ON CONFLICT (autor_id) DO UPDATE SET total_libros = total_libros + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS libro_estadistica_ad AFTER DELETE ON libro BEGIN
+        UPDATE estadistica_autor SET total_libros = total_libros - 1 WHERE autor_id = old.autor_id;
+        DELETE FROM estadistica_libro WHERE libro_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS libro_estadistica_au AFTER UPDATE OF autor_id ON libro
+    WHEN old.autor_id IS NOT new.autor_id BEGIN
+        UPDATE estadistica_autor SET total_libros = total_libros - 1 WHERE autor_id = old.autor_id;
+        INSERT INTO estadistica_autor (autor_id, total_libros) VALUES (new.autor_id, 1)
+        ON CONFLICT (autor_id) DO UPDATE SET total_libros = total_libros + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS autor_estadistica_ad AFTER DELETE ON autor BEGIN
+        DELETE FROM estadistica_autor WHERE autor_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prestamo_estadistica_ai AFTER INSERT ON prestamo BEGIN
+        INSERT INTO estadistica_libro (libro_id, total_prestamos) VALUES (new.libro_id, 1)
+        ON CONFLICT (libro_id) DO UPDATE SET total_prestamos = total_prestamos + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prestamo_estadistica_ad AFTER DELETE ON prestamo BEGIN
+        UPDATE estadistica_libro SET total_prestamos = total_prestamos - 1 WHERE libro_id = old.libro_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prestamo_estadistica_au AFTER UPDATE OF libro_id ON prestamo
+    WHEN old.libro_id IS NOT new.libro_id BEGIN
+        UPDATE estadistica_libro SET total_prestamos = total_prestamos - 1 WHERE libro_id = old.libro_id;
+        INSERT INTO estadistica_libro (libro_id, total_prestamos) VALUES (new.libro_id, 1)
+        ON CONFLICT (libro_id) DO UPDATE SET total_prestamos = total_prestamos + 1;
+    END
+    """,
+]
+
+
+def registrar(metadata):
+    """Crea los triggers junto con las tablas en `db.create_all()`."""
+    for sentencia in DDL_SQLITE:
+        event.listen(metadata, 'after_create', DDL(sentencia).execute_if(dialect='sqlite'))
+
+
+def reconstruir(conexion):
+    """Recalcula ambas tablas de estadísticas a partir de `libro`, `prestamo` y el histórico."""
+    conexion.execute(text('DELETE FROM estadistica_autor'))
+    autores = conexion.execute(text("""
+        INSERT INTO estadistica_autor (autor_id, total_libros)
+        SELECT autor_id, COUNT(*) FROM libro GROUP BY autor_id
+    """)).rowcount
+    conexion.execute(text('DELETE FROM estadistica_libro'))
+    libros = conexion.execute(text("""
+        INSERT INTO estadistica_libro (libro_id, total_prestamos)
+        SELECT libro_id, COUNT(*) FROM (
+            SELECT libro_id FROM prestamo
+            UNION ALL
+            SELECT libro_id FROM prestamo_historico
+        ) AS p GROUP BY libro_id
+    """)).rowcount
+    return autores, libros
+
+
+def top_autores(session, n=10):
+    return session.execute(
+        text("""
+            SELECT a.id, a.nombre, e.total_libros
+            FROM estadistica_autor e JOIN autor a ON a.id = e.autor_id
+            WHERE e.total_libros > 0
+            ORDER BY e.total_libros DESC, e.autor_id DESC
+            LIMIT :n
+        """),
+        {'n': n},
+    ).all()
+
+
+def top_libros(session, n=10):
+    return session.execute(
+        text("""
+            SELECT l.id, l.titulo, e.total_prestamos
+            FROM estadistica_libro e JOIN libro l ON l.id = e.libro_id
+            WHERE e.total_prestamos > 0
+            ORDER BY e.total_prestamos DESC, e.libro_id DESC
+            LIMIT :n
+        """),
+        {'n': n},
+    ).all()
@@ -0,0 +1,124 @@
+"""Exportación en streaming del catálogo y del historial de préstamos.
+
+Las filas se leen con un cursor que va entregando de a `POR_LOTE` filas
+(`stream_results`/`yield_per`), se serializan a CSV o NDJSON en bloques y,
+si se pide, se comprimen con gzip sobre la marcha. Los préstamos archivados
+(`prestamo_historico`) sólo se incluyen con `historico=True`. Ningún paso acumula el
+resultado completo, así que la memoria no depende de cuántas filas haya.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date
+
+from sqlalchemy import text
+
+POR_LOTE = 1000
+TAMANIO_BLOQUE = 64 * 1024
+
+PRESTAMOS = """
+        SELECT p.id, p.fecha_prestamo, p.fecha_devolucion, {devuelto} AS devuelto,
+               p.libro_id, l.titulo, p.usuario_id, u.nombre AS usuario, u.email
+        FROM {tabla} p
+        JOIN libro l ON l.id = p.libro_id
+        JOIN usuario u ON u.id = p.usuario_id
+        {{filtro}}
+"""
+
+CONSULTAS = {
+    # {filtro} se completa con el rango de fechas pedido; el orden coincide con
+    # ix_prestamo_fecha_prestamo_id para que SQLite recorra el índice sin ordenar
+    'prestamos': PRESTAMOS.format(tabla='prestamo', devuelto='p.devuelto') + """
+        ORDER BY p.fecha_prestamo, p.id
+    """,
+    'libros': """
+        SELECT l.id, l.titulo, l.genero, l.anio_publicacion, l.autor_id, a.nombre AS autor
+        FROM libro l JOIN autor a ON a.id = l.autor_id
+        ORDER BY l.id
+    """,
+}
+
+# Préstamos con el histórico: cada rama recorre su índice por (fecha_prestamo, id)
+# y SQLite las intercala en orden, sin ordenar el resultado completo
+PRESTAMOS_CON_HISTORICO = (
+    PRESTAMOS.format(tabla='prestamo_historico', devuelto='true')
+    + '        UNION ALL'
+    + PRESTAMOS.format(tabla='prestamo', devuelto='p.devuelto')
+    + """
+        ORDER BY 2, 1
+    """
+)
+
+FORMATOS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def filas(conexion, tipo, desde=None, hasta=None, historico=False):
+    """Devuelve (columnas, iterador de filas) leyendo con un cursor en streaming.
+
+    El rango de fechas y `historico` sólo aplican a los préstamos.
+    """
+    condiciones, parametros = [], {}
+    if desde:
+        condiciones.append('p.fecha_prestamo >= :desde')
+        parametros['desde'] = desde
+    if hasta:
+        condiciones.append('p.fecha_prestamo <= :hasta')
+        parametros['hasta'] = hasta
+    filtro = 'WHERE ' + ' AND '.join(condiciones) if condiciones else ''
+    plantilla = PRESTAMOS_CON_HISTORICO if historico and tipo == 'prestamos' else CONSULTAS[tipo]
+    consulta = text(plantilla.format(filtro=filtro))
+    resultado = conexion.execution_options(stream_results=True, yield_per=POR_LOTE).execute(
+        consulta, parametros,
+    )
+    return list(resultado.keys()), resultado
+
+
+def _valor(valor):
+    return valor.isoformat() if isinstance(valor, date) else valor
+
+
+def serializar(columnas, filas, formato='csv'):
+    """Convierte las filas en bloques de texto de ~TAMANIO_BLOQUE."""
+    bufer = io.StringIO()
+    if formato == 'csv':
+        escritor = csv.writer(bufer)
+        escritor.writerow(columnas)
+        escribir = escritor.writerow
+    else:
+        def escribir(fila):
+            registro = dict(zip(columnas, map(_valor, fila)))
+            bufer.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    for fila in filas:
+        escribir(fila)
+        if bufer.tell() >= TAMANIO_BLOQUE:
+            yield bufer.getvalue()
+            bufer.seek(0)
+            bufer.truncate()
+    if bufer.tell():
+        yield bufer.getvalue()
+
+
+def comprimir(bloques):
+    """Comprime con gzip un flujo de bloques de texto."""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        datos = compresor.compress(bloque.encode('utf-8'))
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def exportar(engine, tipo, formato='csv', desde=None, hasta=None, gzip=False, historico=False):
+    """Genera el export completo; abre y cierra su propia conexión."""
+    with engine.connect() as conexion:
+        columnas, resultado = filas(conexion, tipo, desde, hasta, historico)
+        bloques = serializar(columnas, resultado, formato)
+        if gzip:
+            yield from comprimir(bloques)
+        else:
+            for bloque in bloques:
+                yield bloque.encode('utf-8')
@@ -1,266 +1,402 @@
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+"""Capa de servicio compartida por las vistas y los scripts.
+
+Todas las funciones reciben la sesión de la unidad de trabajo y no hacen
+commit: quien llama decide cuándo confirmar. Desde un script:
+
+    with funciones.unidad_de_trabajo() as session:
+        ids = funciones.crear_autores(session, [{'nombre': 'Borges'}, ...])
+        funciones.marcar_devoluciones(session, [10, 11, 12])
+
+y en las vistas se pasa `db.session`. Las variantes por lote (`crear_*`,
+`actualizar_*`, `eliminar_*`, `marcar_devoluciones`) envían una sentencia por
+lote (por trozos de 500 ids o filas) en vez de una por elemento; las versiones
+de a uno son atajos sobre ellas. `registrar_prestamos` toma cada ejemplar con
+su propio UPDATE condicional (ver disponibilidad.py), pero todos en la misma
+transacción. `eliminar_*` borran en cascada, una sentencia por tabla
+dependiente (ver eliminacion.py). Nada se imprime: se devuelven ids, filas o
+la cantidad de filas afectadas.
+
+`devolver_lote` y `retirar_libros` son para el mostrador (un carrito de
+devoluciones, el descarte de ejemplares): devuelven además qué pasó con cada
+id, p. ej. {10: 'devuelto', 11: 'ya_devuelto', 99: 'no_existe'}.
+"""
+import os
+import re
+from contextlib import contextmanager
 from datetime import date
-from models import Libro, Autor, Usuario, Prestamo
-from database import Session as DBSession
 
-# Crear sesión
-def get_session():
-    return DBSession()
+from sqlalchemy import Integer, bindparam, column, create_engine, insert, table, text, update
+from sqlalchemy.orm import sessionmaker
+
+import busqueda
+import cache_respuestas
+import configuracion
+import disponibilidad
+import eliminacion
+import estadisticas
+import vencidos
+
+TROZO = 500
+
+# Resultados por id de las operaciones de mostrador
+DEVUELTO = 'devuelto'
+YA_DEVUELTO = 'ya_devuelto'
+ELIMINADO = 'eliminado'
+CON_PRESTAMOS = 'con_prestamos'
+NO_EXISTE = 'no_existe'
+
+# Tablas livianas (sin el modelo ORM) para armar los INSERT/UPDATE por lote; los
+# préstamos pasan por disponibilidad.py
+AUTOR = table('autor', column('id', Integer), column('nombre'), column('nacionalidad'))
+LIBRO = table(
+    'libro', column('id', Integer), column('titulo'), column('genero'),
+    column('anio_publicacion', Integer), column('autor_id', Integer),
+)
+USUARIO = table(
+    'usuario', column('id', Integer), column('nombre'), column('email'),
+    column('telefono'), column('rol'),
+)
+
+
+# ---------------------------
+# UNIDAD DE TRABAJO
+# ---------------------------
+_fabricas = {}
+
+def _uri(url=None):
+    url = url or os.environ.get('DATABASE_URL', configuracion.URI_POR_DEFECTO)
+    # Igual que Flask-SQLAlchemy: una ruta SQLite relativa se ubica en instance/
+    if url.startswith('sqlite:///') and not url.startswith('sqlite:////') and url != 'sqlite:///:memory:':
+        carpeta = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+        url = 'sqlite:///' + os.path.join(carpeta, url[len('sqlite:///'):])
+    return url
+
+def fabrica_sesiones(url=None):
+    """Fábrica de sesiones para scripts; el motor se crea una vez por URI."""
+    url = _uri(url)
+    if url not in _fabricas:
+        engine = create_engine(configuracion.comprobar_uri(url))
+        configuracion.aplicar_pragmas(engine)
+        configuracion.descartar_al_bifurcar(engine)
+        _fabricas[url] = sessionmaker(engine)
+    return _fabricas[url]
+
+@contextmanager
+def unidad_de_trabajo(url=None):
+    """Una sesión y una transacción: commit al salir, rollback si hay una excepción."""
+    with fabrica_sesiones(url).begin() as session:
+        yield session
+
+
+# ---------------------------
+# OPERACIONES POR LOTE
+# ---------------------------
+def _en_trozos(valores, tamanio=TROZO):
+    valores = list(valores)
+    for i in range(0, len(valores), tamanio):
+        yield valores[i:i + tamanio]
+
+def _insertar(session, tabla, filas):
+    """Inserta `filas` con un INSERT de varias filas por trozo y devuelve sus ids en el mismo orden."""
+    ids = []
+    for trozo in _en_trozos(filas):
+        resultado = session.execute(insert(tabla).values(trozo).returning(tabla.c.id))
+        # RETURNING no garantiza el orden, pero SQLite asigna los rowid de un mismo
+        # INSERT en el orden de las filas (max(rowid) + 1 cada vez, con la base
+        # bloqueada para escritura), así que ordenados corresponden a `trozo`.
+        ids.extend(sorted(resultado.scalars()))
+    if ids:
+        cache_respuestas.incrementar(session.connection(), [tabla.name])
+    return ids
+
+def _actualizar(session, tabla, ids, cambios):
+    cambios = {campo: valor for campo, valor in cambios.items() if valor is not None}
+    if not cambios:
+        return 0
+    afectadas = 0
+    for trozo in _en_trozos(ids):
+        afectadas += session.execute(update(tabla).where(tabla.c.id.in_(trozo)).values(**cambios)).rowcount
+    if afectadas:
+        cache_respuestas.incrementar(session.connection(), [tabla.name])
+    return afectadas
+
+def _fecha(valor):
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+def _existentes(session, tabla, ids):
+    existentes = set()
+    for trozo in _en_trozos(ids):
+        existentes.update(session.execute(
+            text(f'SELECT id FROM {tabla} WHERE id IN :ids').bindparams(bindparam('ids', expanding=True)),
+            {'ids': trozo},
+        ).scalars())
+    return existentes
+
+def leer_ids(texto):
+    """Ids de un texto libre (una lectura de código de barras por línea, comas, espacios...).
+
+    Devuelve (ids sin repetir en el orden en que aparecen, fragmentos que no son ids).
+    """
+    ids, invalidos = {}, []
+    for fragmento in re.split(r'[\s,;]+', texto):
+        if not fragmento:
+            continue
+        if fragmento.isdigit():
+            ids.setdefault(int(fragmento), None)
+        else:
+            invalidos.append(fragmento)
+    return list(ids), invalidos
+
 
 # ---------------------------
 # CRUD: AUTOR
 # ---------------------------
-def crear_autor(nombre, nacionalidad):
-    session = get_session()
-    autor = Autor(nombre=nombre, nacionalidad=nacionalidad)
-    session.add(autor)
-    session.commit()
-    session.close()
-    print("Autor creado.")
-
-def listar_autores():
-    session = get_session()
-    autores = session.query(Autor).all()
-    for a in autores:
-        print(f"{a.id}: {a.nombre} - {a.nacionalidad}")
-    session.close()
-
-def actualizar_autor(autor_id, nombre=None, nacionalidad=None):
-    session = get_session()
-    autor = session.query(Autor).get(autor_id)
-    if autor:
-        if nombre:
-            autor.nombre = nombre
-        if nacionalidad:
-            autor.nacionalidad = nacionalidad
-        session.commit()
-        print("Autor actualizado.")
-    else:
-        print("Autor no encontrado.")
-    session.close()
-def eliminar_autor(autor_id):
-    session = get_session()
-    autor = session.query(Autor).get(autor_id)
-    if autor:
-        session.delete(autor)
-        session.commit()
-        print("Autor eliminado.")
-    else:
-        print("Autor no encontrado.")
-    session.close()
+def crear_autores(session, filas):
+    """`filas`: dicts con nombre y nacionalidad (opcional). Devuelve los ids."""
+    return _insertar(session, AUTOR, [
+        {'nombre': f['nombre'], 'nacionalidad': f.get('nacionalidad')} for f in filas
+    ])
+
+def crear_autor(session, nombre, nacionalidad=None):
+    return crear_autores(session, [{'nombre': nombre, 'nacionalidad': nacionalidad}])[0]
+
+def listar_autores(session):
+    return session.execute(text('SELECT id, nombre, nacionalidad FROM autor ORDER BY id')).all()
+
+def actualizar_autores(session, ids, nombre=None, nacionalidad=None):
+    return _actualizar(session, AUTOR, ids, {'nombre': nombre, 'nacionalidad': nacionalidad})
+
+def actualizar_autor(session, autor_id, nombre=None, nacionalidad=None):
+    return actualizar_autores(session, [autor_id], nombre, nacionalidad) > 0
+
+def eliminar_autores(session, ids):
+    """Elimina los autores con sus libros y todo lo que cuelga de ellos (ver eliminacion.py).
+
+    Devuelve cuántos autores se eliminaron.
+    """
+    return eliminacion.eliminar(session, 'autor', ids).get('autor', 0)
+
+def eliminar_autor(session, autor_id):
+    return eliminar_autores(session, [autor_id]) > 0
+
+
 # ---------------------------
 # CRUD: LIBRO
 # ---------------------------
-def crear_libro(titulo, genero, año, autor_id):
-    session = get_session()
-    libro = Libro(titulo=titulo, genero=genero, año_publicacion=año, autor_id=autor_id)
-    session.add(libro)
-    session.commit()
-    session.close()
-    print("Libro creado.")
-
-def listar_libros():
-    session = get_session()
-    libros = session.query(Libro).all()
-    for l in libros:
-        print(f"{l.id}: {l.titulo} - {l.genero} - {l.año_publicacion}")
-    session.close()
-def actualizar_libro(libro_id, titulo=None, genero=None, año=None):
-    session = get_session()
-    libro = session.query(Libro).get(libro_id)
-    if libro:
-        if titulo:
-            libro.titulo = titulo
-        if genero:
-            libro.genero = genero
-        if año:
-            libro.año_publicacion = año
-        session.commit()
-        print("Libro actualizado.")
-    else:
-        print("Libro no encontrado.")
-    session.close()
-
-def eliminar_libro(libro_id):
-    session = get_session()
-    libro = session.query(Libro).get(libro_id)
-    if libro:
-        session.delete(libro)
-        session.commit()
-        print("Libro eliminado.")
-    else:
-        print("Libro no encontrado.")
-    session.close()
+def crear_libros(session, filas):
+    """`filas`: dicts con titulo, autor_id, genero, anio_publicacion y ejemplares (1 por defecto).
+
+    Devuelve los ids.
+    """
+    filas = list(filas)
+    ids = _insertar(session, LIBRO, [
+        {
+            'titulo': f['titulo'],
+            'genero': f.get('genero'),
+            'anio_publicacion': f.get('anio_publicacion'),
+            'autor_id': f['autor_id'],
+        }
+        for f in filas
+    ])
+    disponibilidad.crear(session, {i: f.get('ejemplares', 1) for i, f in zip(ids, filas)})
+    return ids
+
+def crear_libro(session, titulo, genero, anio, autor_id, ejemplares=1):
+    return crear_libros(session, [{
+        'titulo': titulo, 'genero': genero, 'anio_publicacion': anio,
+        'autor_id': autor_id, 'ejemplares': ejemplares,
+    }])[0]
+
+def listar_libros(session):
+    return session.execute(text(
+        'SELECT id, titulo, genero, anio_publicacion, autor_id FROM libro ORDER BY id'
+    )).all()
+
+def actualizar_libros(session, ids, titulo=None, genero=None, anio=None, autor_id=None):
+    return _actualizar(session, LIBRO, ids, {
+        'titulo': titulo, 'genero': genero, 'anio_publicacion': anio, 'autor_id': autor_id,
+    })
+
+def actualizar_libro(session, libro_id, titulo=None, genero=None, anio=None, autor_id=None):
+    return actualizar_libros(session, [libro_id], titulo, genero, anio, autor_id) > 0
+
+def eliminar_libros(session, ids):
+    """Elimina los libros con sus préstamos, reservas y disponibilidad. Devuelve cuántos se eliminaron."""
+    return eliminacion.eliminar(session, 'libro', ids).get('libro', 0)
+
+def eliminar_libro(session, libro_id):
+    return eliminar_libros(session, [libro_id]) > 0
+
+def retirar_libros(session, ids):
+    """Elimina los libros de `ids` que no tienen préstamos, con un DELETE por trozo.
+
+    Los que tienen préstamos (pendientes o históricos) se dejan como están.
+    Devuelve {id: 'eliminado' | 'con_prestamos' | 'no_existe'}.
+    """
+    ids = list(dict.fromkeys(ids))
+    eliminados = set()
+    for trozo in _en_trozos(ids):
+        eliminados.update(session.execute(text("""
+            DELETE FROM libro
+            WHERE id IN :ids
+              AND NOT EXISTS (SELECT 1 FROM prestamo p WHERE p.libro_id = libro.id)
+              AND NOT EXISTS (SELECT 1 FROM prestamo_historico h WHERE h.libro_id = libro.id)
+            RETURNING id
+        """).bindparams(bindparam('ids', expanding=True)), {'ids': trozo}).scalars())
+    if eliminados:
+        cache_respuestas.incrementar(session.connection(), ['libro'])
+    restantes = _existentes(session, 'libro', [i for i in ids if i not in eliminados])
+    return {
+        i: ELIMINADO if i in eliminados else CON_PRESTAMOS if i in restantes else NO_EXISTE
+        for i in ids
+    }
+
+
 # ---------------------------
 # CRUD: USUARIO
 # ---------------------------
-def crear_usuario(nombre, email, telefono):
-    session = get_session()
-    usuario = Usuario(nombre=nombre, email=email, telefono=telefono)
-    session.add(usuario)
-    session.commit()
-    session.close()
-    print("Usuario creado.")
-
-def listar_usuarios():
-    session = get_session()
-    usuarios = session.query(Usuario).all()
-    for u in usuarios:
-        print(f"{u.id}: {u.nombre} - {u.email} - {u.telefono}")
-    session.close()
-def actualizar_usuario(usuario_id, nombre=None, email=None, telefono=None):
-    session = get_session()
-    usuario = session.query(Usuario).get(usuario_id)
-    if usuario:
-        if nombre:
-            usuario.nombre = nombre
-        if email:
-            usuario.email = email
-        if telefono:
-            usuario.telefono = telefono
-        session.commit()
-        print("Usuario actualizado.")
-    else:
-        print("Usuario no encontrado.")
-    session.close()
-def eliminar_usuario(usuario_id):
-    session = get_session()
-    usuario = session.query(Usuario).get(usuario_id)
-    if usuario:
-        session.delete(usuario)
-        session.commit()
-        print("Usuario eliminado.")
-    else:
-        print("Usuario no encontrado.")
-    session.close()
+def crear_usuarios(session, filas):
+    """`filas`: dicts con nombre, email, telefono y rol (por defecto 'lector'). Devuelve los ids."""
+    return _insertar(session, USUARIO, [
+        {
+            'nombre': f['nombre'],
+            'email': f['email'],
+            'telefono': f.get('telefono'),
+            'rol': f.get('rol') or 'lector',
+        }
+        for f in filas
+    ])
+
+def crear_usuario(session, nombre, email, telefono=None, rol='lector'):
+    return crear_usuarios(session, [{'nombre': nombre, 'email': email, 'telefono': telefono, 'rol': rol}])[0]
+
+def listar_usuarios(session):
+    return session.execute(text('SELECT id, nombre, email, telefono, rol FROM usuario ORDER BY id')).all()
+
+def actualizar_usuarios(session, ids, nombre=None, email=None, telefono=None, rol=None):
+    return _actualizar(session, USUARIO, ids, {
+        'nombre': nombre, 'email': email, 'telefono': telefono, 'rol': rol,
+    })
+
+def actualizar_usuario(session, usuario_id, nombre=None, email=None, telefono=None, rol=None):
+    return actualizar_usuarios(session, [usuario_id], nombre, email, telefono, rol) > 0
+
+def eliminar_usuarios(session, ids, baja=False):
+    """Elimina los usuarios con sus préstamos y reservas; los ejemplares que tenían se liberan.
+
+    Con `baja`, los que tienen historial de préstamos se dan de baja en vez de
+    eliminarse. Devuelve cuántos usuarios se eliminaron o dieron de baja.
+    """
+    filas = eliminacion.eliminar(session, 'usuario', ids, baja=baja)
+    return filas.get('usuario', 0) + filas.get('baja', 0)
+
+def eliminar_usuario(session, usuario_id, baja=False):
+    return eliminar_usuarios(session, [usuario_id], baja) > 0
+
+def login_usuario(session, email):
+    return session.execute(
+        text('SELECT id, nombre, email, rol FROM usuario WHERE email = :email AND baja IS NULL'), {'email': email},
+    ).first()
+
 
 # ---------------------------
 # BÚSQUEDAS
 # ---------------------------
-def buscar_por_titulo(titulo):
-    session = get_session()
-    resultados = session.query(Libro).filter(Libro.titulo.ilike(f"%{titulo}%")).all()
-    for libro in resultados:
-        print(f"{libro.id}: {libro.titulo}")
-    session.close()
-
-def buscar_por_autor(nombre_autor):
-    session = get_session()
-    resultados = session.query(Libro).join(Autor).filter(Autor.nombre.ilike(f"%{nombre_autor}%")).all()
-    for libro in resultados:
-        print(f"{libro.id}: {libro.titulo} - Autor: {libro.autor.nombre}")
-    session.close()
-
-def buscar_por_genero(genero):
-    session = get_session()
-    resultados = session.query(Libro).filter(Libro.genero.ilike(f"%{genero}%")).all()
-    for libro in resultados:
-        print(f"{libro.id}: {libro.titulo} - Género: {libro.genero}")
-    session.close()
-
-def buscar_por_año(año):
-    session = get_session()
-    resultados = session.query(Libro).filter(Libro.año_publicacion == año).all()
-    for libro in resultados:
-        print(f"{libro.id}: {libro.titulo} - Año: {libro.año_publicacion}")
-    session.close()
-
-def autor_con_mas_libros():
-    session = get_session()
-    resultado = session.query(
-        Autor.nombre,
-        func.count(Libro.id).label('total_libros')
-    ).join(Libro).group_by(Autor.id).order_by(func.count(Libro.id).desc()).first()
-    
-    session.close()
-
-    if resultado:
-        print(f"Autor con más libros: {resultado.nombre} ({resultado.total_libros} libros)")
-    else:
-        print("No hay autores con libros registrados.")
-
-def libro_mas_prestado():
-    session = get_session()
-    resultado = session.query(
-        Libro.titulo,
-        func.count(Prestamo.id).label('total_prestamos')
-    ).join(Prestamo).group_by(Libro.id).order_by(func.count(Prestamo.id).desc()).first()
-    
-    session.close()
-
-    if resultado:
-        print(f"Libro más prestado: {resultado.titulo} ({resultado.total_prestamos} préstamos)")
-    else:
-        print("No hay libros prestados registrados.")
-
-def usuarios_con_prestamos_vencidos():
-    session = get_session()
-    hoy = date.today()
-
-    prestamos_vencidos = session.query(
-        Usuario.nombre,
-        Usuario.email,
-        Prestamo.fecha_devolucion
-    ).join(Prestamo).filter(Prestamo.fecha_devolucion < hoy).all()
-
-    session.close()
-
-    if prestamos_vencidos:
-        print("Usuarios con préstamos vencidos:")
-        for nombre, email, fecha in prestamos_vencidos:
-            print(f"- {nombre} ({email}) - Fecha de devolución: {fecha}")
-    else:
-        print("No hay préstamos vencidos.")        
+def buscar_por_titulo(session, titulo, pagina=1, por_pagina=20):
+    return busqueda.buscar(session, titulo, campo='titulo', pagina=pagina, por_pagina=por_pagina).filas
+
+def buscar_por_autor(session, nombre_autor, pagina=1, por_pagina=20):
+    return busqueda.buscar(session, nombre_autor, campo='autor', pagina=pagina, por_pagina=por_pagina).filas
+
+def buscar_por_genero(session, genero, pagina=1, por_pagina=20):
+    return busqueda.buscar(session, genero, campo='genero', pagina=pagina, por_pagina=por_pagina).filas
+
+def buscar_por_anio(session, anio):
+    return session.execute(
+        text('SELECT id, titulo, anio_publicacion FROM libro WHERE anio_publicacion = :anio ORDER BY id'),
+        {'anio': anio},
+    ).all()
+
+def autor_con_mas_libros(session):
+    """(id, nombre, total_libros) o None si no hay autores con libros."""
+    return next(iter(estadisticas.top_autores(session, 1)), None)
+
+def libro_mas_prestado(session):
+    """(id, titulo, total_prestamos) o None si no hay préstamos."""
+    return next(iter(estadisticas.top_libros(session, 1)), None)
+
+def usuarios_con_prestamos_vencidos(session):
+    return vencidos.listar(session)
+
+
 # ---------------------------
 # GESTIÓN DE PRÉSTAMOS
 # ---------------------------
-def registrar_prestamo(libro_id, usuario_id, fecha_prestamo, fecha_devolucion):
-    session = get_session()
-    prestamo = Prestamo(
-        libro_id=libro_id,
-        usuario_id=usuario_id,
-        fecha_prestamo=fecha_prestamo,
-        fecha_devolucion=fecha_devolucion
+def registrar_prestamos(session, filas):
+    """`filas`: dicts con libro_id, usuario_id, fecha_prestamo y fecha_devolucion.
+
+    Cada préstamo toma un ejemplar con un UPDATE condicional (ver disponibilidad.py),
+    todos en la misma transacción. Devuelve los ids, con None donde no quedaban ejemplares
+    o el usuario estaba dado de baja.
+    """
+    ids = []
+    for f in filas:
+        try:
+            ids.append(disponibilidad.prestar(
+                session, f['libro_id'], f['usuario_id'],
+                _fecha(f['fecha_prestamo']), _fecha(f.get('fecha_devolucion')),
+            ))
+        except (disponibilidad.SinEjemplares, disponibilidad.UsuarioDeBaja):
+            ids.append(None)
+    if any(ids):
+        cache_respuestas.incrementar(session.connection(), ['prestamo'])
+    return ids
+
+def registrar_prestamo(session, libro_id, usuario_id, fecha_prestamo, fecha_devolucion):
+    """Devuelve el id del préstamo; lanza disponibilidad.SinEjemplares si no hay ejemplares
+    y disponibilidad.UsuarioDeBaja si el usuario fue dado de baja."""
+    prestamo_id = disponibilidad.prestar(
+        session, libro_id, usuario_id, _fecha(fecha_prestamo), _fecha(fecha_devolucion),
     )
-    session.add(prestamo)
-    session.commit()
-    session.close()
-    print("Préstamo registrado.")
-
-def marcar_devolucion(prestamo_id):
-    session = get_session()
-    prestamo = session.query(Prestamo).get(prestamo_id)
-    if prestamo:
-        prestamo.fecha_devolucion = date.today()
-        session.commit()
-        print("Devolución registrada.")
-    else:
-        print("Préstamo no encontrado.")
-    session.close()
-
-def listar_prestamos_activos():
-    session = get_session()
-    hoy = date.today()
-    prestamos = session.query(Prestamo).filter(Prestamo.fecha_devolucion > hoy).all()
-    for p in prestamos:
-        print(f"{p.id}: Libro: {p.libro.titulo}, Usuario: {p.usuario.nombre}, Devuelve: {p.fecha_devolucion}")
-    session.close()
-
-def crear_usuario(nombre, email, telefono, rol='lector'):
-    session = get_session()
-    usuario = Usuario(nombre=nombre, email=email, telefono=telefono, rol=rol)
-    session.add(usuario)
-    session.commit()
-    session.close()
-    print(f"Usuario '{nombre}' creado con rol '{rol}'.")
-
-def login_usuario(email):
-    session = get_session()
-    usuario = session.query(Usuario).filter_by(email=email).first()
-    if usuario:
-        print(f"Bienvenido, {usuario.nombre} (Rol: {usuario.rol})")
-        return usuario
-    else:
-        print("Usuario no encontrado.")
-        return None
+    cache_respuestas.incrementar(session.connection(), ['prestamo'])
+    return prestamo_id
+
+def marcar_devoluciones(session, ids):
+    """Marca como devueltos los préstamos pendientes de `ids` y libera sus ejemplares.
+
+    Devuelve cuántos estaban pendientes.
+    """
+    devueltos = disponibilidad.devolver(session, ids)
+    if devueltos:
+        cache_respuestas.incrementar(session.connection(), ['prestamo'])
+    return len(devueltos)
+
+def marcar_devolucion(session, prestamo_id):
+    return marcar_devoluciones(session, [prestamo_id]) > 0
+
+def devolver_lote(session, ids):
+    """Como `marcar_devoluciones`, pero informa qué pasó con cada id.
+
+    Devuelve {id: 'devuelto' | 'ya_devuelto' | 'no_existe'}.
+    """
+    ids = list(dict.fromkeys(ids))
+    devueltos = set(disponibilidad.devolver(session, ids))
+    if devueltos:
+        cache_respuestas.incrementar(session.connection(), ['prestamo'])
+    restantes = _existentes(session, 'prestamo', [i for i in ids if i not in devueltos])
+    # Los archivados (historico.py) conservan su id y ya estaban devueltos
+    restantes |= _existentes(session, 'prestamo_historico', [i for i in ids if i not in devueltos | restantes])
+    return {
+        i: DEVUELTO if i in devueltos else YA_DEVUELTO if i in restantes else NO_EXISTE
+        for i in ids
+    }
+
+def listar_prestamos_activos(session):
+    return session.execute(text("""
+        SELECT p.id, l.titulo AS libro, u.nombre AS usuario, p.fecha_devolucion
+        FROM prestamo p
+        JOIN libro l ON l.id = p.libro_id
+        JOIN usuario u ON u.id = p.usuario_id
+        WHERE p.devuelto = false
+        ORDER BY p.fecha_devolucion, p.id
+    """)).all()
@@ -0,0 +1,75 @@
+"""Archivo de préstamos devueltos.
+
+`prestamo` es la tabla caliente: los préstamos pendientes y los devueltos
+recientes. `archivar` mueve a `prestamo_historico` los devueltos cuya fecha
+de préstamo tiene más de `HISTORICO_DIAS` días (365 por defecto), de a
+`LOTE` préstamos, cada lote en su propia transacción: un escritor nunca
+espera más de lo que tarda un lote. Se puede cortar y volver a correr en
+cualquier momento; pensado para cron (`flask archivar-prestamos`).
+
+Archivar no cambia los rankings: los préstamos movidos siguen contando en
+`estadistica_libro` y `estadisticas.reconstruir` cuenta ambas tablas. Las
+exportaciones incluyen el histórico cuando se les pide (`historico=True`).
+"""
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import Date, bindparam, text
+
+import cache_respuestas
+
+DIAS = 365
+LOTE = 2000
+
+# Recorre ix_prestamo_devuelto_fecha_prestamo_id. `prestamo.id` es
+# AUTOINCREMENT, así que borrar un préstamo (archivado o no) nunca libera su
+# id para uno nuevo que después chocaría con el del histórico.
+SELECCIONAR = text("""
+    SELECT id FROM prestamo
+    WHERE devuelto = true AND fecha_prestamo < :limite
+    ORDER BY fecha_prestamo, id
+    LIMIT :lote
+""").bindparams(bindparam('limite', type_=Date))
+COPIAR = text("""
+    INSERT INTO prestamo_historico (id, libro_id, usuario_id, fecha_prestamo, fecha_devolucion, archivado)
+    SELECT id, libro_id, usuario_id, fecha_prestamo, fecha_devolucion, :hoy
+    FROM prestamo WHERE id IN :ids
+""").bindparams(bindparam('ids', expanding=True), bindparam('hoy', type_=Date))
+# El trigger prestamo_estadistica_ad descuenta cada préstamo borrado; los
+# archivados se vuelven a sumar para que el ranking siga contándolos
+CONSERVAR_CONTADORES = text("""
+    INSERT INTO estadistica_libro (libro_id, total_prestamos)
+    SELECT libro_id, COUNT(*) FROM prestamo WHERE id IN :ids GROUP BY libro_id
+    ON CONFLICT (libro_id) DO UPDATE SET total_prestamos = total_prestamos + excluded.total_prestamos
+""").bindparams(bindparam('ids', expanding=True))
+BORRAR = text('DELETE FROM prestamo WHERE id IN :ids').bindparams(bindparam('ids', expanding=True))
+
+
+def dias_por_defecto():
+    return int(os.environ.get('HISTORICO_DIAS', DIAS))
+
+
+def archivar_lote(conexion, limite, lote=LOTE, hoy=None):
+    """Mueve un lote al histórico dentro de la transacción de `conexion`. Devuelve cuántos movió."""
+    ids = conexion.execute(SELECCIONAR, {'limite': limite, 'lote': lote}).scalars().all()
+    if not ids:
+        return 0
+    conexion.execute(COPIAR, {'ids': ids, 'hoy': hoy or date.today()})
+    conexion.execute(CONSERVAR_CONTADORES, {'ids': ids})
+    conexion.execute(BORRAR, {'ids': ids})
+    cache_respuestas.incrementar(conexion, ['prestamo'])
+    return len(ids)
+
+
+def archivar(engine, dias=None, lote=LOTE, hoy=None, progreso=print):
+    """Archiva todos los préstamos devueltos con más de `dias` días, un lote por transacción."""
+    hoy = hoy or date.today()
+    limite = hoy - timedelta(days=dias_por_defecto() if dias is None else dias)
+    total = 0
+    while True:
+        with engine.begin() as conexion:
+            movidos = archivar_lote(conexion, limite, lote, hoy)
+        if not movidos:
+            return total
+        total += movidos
+        progreso(f'{total} préstamos archivados')
@@ -0,0 +1,370 @@
+"""Importación masiva de autores, libros, usuarios y préstamos desde CSV o JSONL.
+
+El archivo se lee registro a registro (nunca se carga entero en memoria), cada
+registro se valida y los válidos se insertan en lotes con un único
+`executemany` por lote y una transacción por lote. En esa misma transacción
+se guarda el checkpoint (tabla `importacion_checkpoint`) con el número de
+registros ya procesados: el lote y su checkpoint se confirman juntos o
+ninguno, de modo que si el proceso se corta se puede reanudar sin duplicar
+filas.
+
+Los registros rechazados se escriben (con su número de registro y el motivo)
+en un archivo JSONL aparte para poder corregirlos y volver a importarlos.
+"""
+import csv
+import json
+import os
+import time
+from collections import namedtuple
+from datetime import date
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import IntegrityError
+
+import disponibilidad
+
+LOTE = 1000
+
+Resumen = namedtuple('Resumen', ['leidos', 'insertados', 'rechazados', 'segundos'])
+
+
+class RegistroInvalido(ValueError):
+    pass
+
+
+# ---------------------------
+# LECTURA
+# ---------------------------
+def leer_registros(ruta, formato=None):
+    formato = formato or ('jsonl' if ruta.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(ruta, newline='', encoding='utf-8') as archivo:
+        if formato == 'csv':
+            yield from csv.DictReader(archivo)
+        else:
+            for linea in archivo:
+                if linea.strip():
+                    yield json.loads(linea)
+
+
+# ---------------------------
+# VALIDACIÓN
+# ---------------------------
+def _texto(registro, campo, obligatorio=False, largo=None):
+    valor = registro.get(campo)
+    valor = str(valor).strip() if valor is not None else ''
+    if obligatorio and not valor:
+        raise RegistroInvalido(f'falta {campo}')
+    if largo and len(valor) > largo:
+        raise RegistroInvalido(f'{campo} supera {largo} caracteres')
+    return valor or None
+
+def _entero(registro, campo, obligatorio=False):
+    valor = registro.get(campo)
+    if valor in (None, ''):
+        if obligatorio:
+            raise RegistroInvalido(f'falta {campo}')
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise RegistroInvalido(f'{campo} no es un número: {valor!r}')
+
+def _fecha(registro, campo, obligatorio=False):
+    valor = _texto(registro, campo, obligatorio)
+    if valor is None:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise RegistroInvalido(f'{campo} no es una fecha AAAA-MM-DD: {valor!r}')
+
+def _booleano(registro, campo):
+    valor = registro.get(campo)
+    if isinstance(valor, bool):
+        return valor
+    return str(valor or '').strip().lower() in ('1', 'true', 'si', 'sí', 's', 'x')
+
+def validar_autor(registro):
+    return {
+        'nombre': _texto(registro, 'nombre', obligatorio=True, largo=100),
+        'nacionalidad': _texto(registro, 'nacionalidad', largo=50),
+    }
+
+def validar_libro(registro):
+    return {
+        'titulo': _texto(registro, 'titulo', obligatorio=True, largo=100),
+        'genero': _texto(registro, 'genero', largo=50),
+        'anio_publicacion': _entero(registro, 'anio_publicacion'),
+        'autor': _texto(registro, 'autor', obligatorio=True, largo=100),
+    }
+
+def validar_usuario(registro):
+    email = _texto(registro, 'email', obligatorio=True, largo=100)
+    if '@' not in email:
+        raise RegistroInvalido(f'email inválido: {email!r}')
+    return {
+        'nombre': _texto(registro, 'nombre', obligatorio=True, largo=100),
+        'email': email.lower(),
+        'telefono': _texto(registro, 'telefono', largo=20),
+        'rol': _texto(registro, 'rol', largo=20) or 'lector',
+    }
+
+def validar_prestamo(registro):
+    email = _texto(registro, 'email')
+    fila = {
+        'libro_id': _entero(registro, 'libro_id', obligatorio=True),
+        'usuario_id': _entero(registro, 'usuario_id'),
+        'email': email.lower() if email else None,
+        'fecha_prestamo': _fecha(registro, 'fecha_prestamo', obligatorio=True),
+        'fecha_devolucion': _fecha(registro, 'fecha_devolucion'),
+        'devuelto': _booleano(registro, 'devuelto'),
+    }
+    if fila['usuario_id'] is None and fila['email'] is None:
+        raise RegistroInvalido('falta usuario_id o email')
+    return fila
+
+
+# ---------------------------
+# RESOLUCIÓN DE REFERENCIAS
+# ---------------------------
+def _en_trozos(valores, tamanio=500):
+    valores = list(valores)
+    for i in range(0, len(valores), tamanio):
+        yield valores[i:i + tamanio]
+
+def resolver_autores(conexion, filas, cache):
+    """Reemplaza el nombre del autor por su id, creando los autores que falten."""
+    faltan = {f['autor'] for f in filas} - cache.keys()
+    buscar = text('SELECT nombre, MIN(id) FROM autor WHERE nombre IN :nombres GROUP BY nombre')
+    buscar = buscar.bindparams(bindparam('nombres', expanding=True))
+    for trozo in _en_trozos(faltan):
+        cache.update(conexion.execute(buscar, {'nombres': trozo}).all())
+    nuevos = faltan - cache.keys()
+    if nuevos:
+        conexion.execute(
+            text('INSERT INTO autor (nombre) VALUES (:nombre)'),
+            [{'nombre': nombre} for nombre in nuevos],
+        )
+        for trozo in _en_trozos(nuevos):
+            cache.update(conexion.execute(buscar, {'nombres': trozo}).all())
+    for fila in filas:
+        fila['autor_id'] = cache[fila.pop('autor')]
+    return filas
+
+def resolver_usuarios(conexion, filas, cache):
+    """Completa usuario_id a partir del email (sin distinguir mayúsculas); devuelve los emails desconocidos."""
+    faltan = {f['email'] for f in filas if f['usuario_id'] is None} - cache.keys()
+    buscar = text('SELECT lower(email), MIN(id) FROM usuario WHERE lower(email) IN :emails GROUP BY lower(email)')
+    buscar = buscar.bindparams(bindparam('emails', expanding=True))
+    for trozo in _en_trozos(faltan):
+        cache.update(conexion.execute(buscar, {'emails': trozo}).all())
+    desconocidos = set()
+    for fila in filas:
+        if fila['usuario_id'] is None:
+            fila['usuario_id'] = cache.get(fila['email'])
+            if fila['usuario_id'] is None:
+                desconocidos.add(fila['email'])
+        fila.pop('email')
+    return desconocidos
+
+
+# ---------------------------
+# ENTIDADES
+# ---------------------------
+# completar(conexion, desde): mantiene lo que depende de las filas nuevas (id mayor que `desde`)
+Entidad = namedtuple('Entidad', ['validar', 'tabla', 'insert', 'preparar', 'completar'])
+
+def _preparar_libros(conexion, filas, cache):
+    return resolver_autores(conexion, filas, cache), {}
+
+def _preparar_prestamos(conexion, filas, cache):
+    resolver_usuarios(conexion, filas, cache)
+    rechazos = {id(f): 'usuario desconocido' for f in filas if f['usuario_id'] is None}
+    return [f for f in filas if f['usuario_id'] is not None], rechazos
+
+ENTIDADES = {
+    'autores': Entidad(
+        validar_autor,
+        'autor',
+        text('INSERT INTO autor (nombre, nacionalidad) VALUES (:nombre, :nacionalidad)'),
+        None,
+        None,
+    ),
+    'libros': Entidad(
+        validar_libro,
+        'libro',
+        text('INSERT INTO libro (titulo, genero, anio_publicacion, autor_id) '
+             'VALUES (:titulo, :genero, :anio_publicacion, :autor_id)'),
+        _preparar_libros,
+        disponibilidad.crear_desde,
+    ),
+    'usuarios': Entidad(
+        validar_usuario,
+        'usuario',
+        text('INSERT INTO usuario (nombre, email, telefono, rol) VALUES (:nombre, :email, :telefono, :rol)'),
+        None,
+        None,
+    ),
+    'prestamos': Entidad(
+        validar_prestamo,
+        'prestamo',
+        text('INSERT INTO prestamo (libro_id, usuario_id, fecha_prestamo, fecha_devolucion, devuelto) '
+             'VALUES (:libro_id, :usuario_id, :fecha_prestamo, :fecha_devolucion, :devuelto)'),
+        _preparar_prestamos,
+        disponibilidad.recalcular_desde,
+    ),
+}
+
+
+# Tablas que modifica cada tipo de importación
+TABLAS = {
+    'autores': ['autor'],
+    'libros': ['libro', 'autor'],
+    'usuarios': ['usuario'],
+    'prestamos': ['prestamo'],
+}
+
+
+# ---------------------------
+# CHECKPOINT
+# ---------------------------
+# Un checkpoint por archivo, identificado por su ruta absoluta
+GUARDAR_CHECKPOINT = text("""
+    INSERT INTO importacion_checkpoint (archivo, procesados, insertados, rechazados)
+    VALUES (:archivo, :procesados, :insertados, :rechazados)
+    ON CONFLICT (archivo) DO UPDATE SET
+        procesados = excluded.procesados, insertados = excluded.insertados, rechazados = excluded.rechazados
+""")
+
+
+def clave_checkpoint(ruta):
+    return os.path.abspath(ruta)
+
+def leer_checkpoint(conexion, ruta):
+    fila = conexion.execute(
+        text('SELECT procesados, insertados, rechazados FROM importacion_checkpoint WHERE archivo = :archivo'),
+        {'archivo': clave_checkpoint(ruta)},
+    ).mappings().first()
+    return dict(fila) if fila else {'procesados': 0, 'insertados': 0, 'rechazados': 0}
+
+def guardar_checkpoint(conexion, ruta, estado):
+    conexion.execute(GUARDAR_CHECKPOINT, {'archivo': clave_checkpoint(ruta), **estado})
+
+def borrar_checkpoint(conexion, ruta):
+    conexion.execute(
+        text('DELETE FROM importacion_checkpoint WHERE archivo = :archivo'), {'archivo': clave_checkpoint(ruta)},
+    )
+
+
+# ---------------------------
+# IMPORTACIÓN
+# ---------------------------
+def _insertar_lote(engine, entidad, lote, cache, checkpoint):
+    """Inserta un lote en una transacción. Devuelve (insertados, [(numero, registro, motivo)]).
+
+    `checkpoint(conexion, insertados, rechazos)` se llama dentro de la misma
+    transacción, para que el checkpoint se confirme junto con el lote.
+    """
+    rechazos = []
+    insertados = 0
+    with engine.begin() as conexion:
+        # pysqlite no abre la transacción hasta el primer INSERT: sin este BEGIN un
+        # SAVEPOINT abriría la suya y su RELEASE confirmaría el lote por su cuenta
+        conexion.exec_driver_sql('BEGIN IMMEDIATE')
+        filas = [fila for _, _, fila in lote]
+        motivos = {}
+        if entidad.preparar:
+            filas, motivos = entidad.preparar(conexion, filas, cache)
+        rechazos.extend((n, r, motivos[id(f)]) for n, r, f in lote if id(f) in motivos)
+        if filas:
+            desde = conexion.execute(text(f'SELECT COALESCE(MAX(id), 0) FROM {entidad.tabla}')).scalar()
+            insertados = _insertar_filas(conexion, entidad, lote, filas, rechazos)
+            if entidad.completar and insertados:
+                entidad.completar(conexion, desde)
+        checkpoint(conexion, insertados, rechazos)
+    return insertados, rechazos
+
+
+def _insertar_filas(conexion, entidad, lote, filas, rechazos):
+    try:
+        with conexion.begin_nested():
+            conexion.execute(entidad.insert, filas)
+        return len(filas)
+    except IntegrityError:
+        pass
+    # Algún registro viola una restricción (p. ej. email repetido): se aísla fila a fila
+    insertados = 0
+    validas = {id(f) for f in filas}
+    for numero, registro, fila in lote:
+        if id(fila) not in validas:
+            continue
+        try:
+            with conexion.begin_nested():
+                conexion.execute(entidad.insert, fila)
+            insertados += 1
+        except IntegrityError as error:
+            rechazos.append((numero, registro, str(error.orig)))
+    return insertados
+
+def importar(engine, tipo, ruta, formato=None, lote=LOTE, reanudar=False, rechazos=None, progreso=print):
+    """Importa `ruta` en la tabla de `tipo` y devuelve un Resumen."""
+    entidad = ENTIDADES[tipo]
+    estado = {'procesados': 0, 'insertados': 0, 'rechazados': 0}
+    if reanudar:
+        with engine.connect() as conexion:
+            estado = leer_checkpoint(conexion, ruta)
+    saltar = estado['procesados']
+    archivo_rechazos = open(rechazos, 'a' if reanudar else 'w', encoding='utf-8') if rechazos else None
+    cache = {}
+    inicio = time.perf_counter()
+    leidos = 0
+    pendiente = []
+
+    def rechazar(numero, registro, motivo):
+        estado['rechazados'] += 1
+        if archivo_rechazos:
+            archivo_rechazos.write(json.dumps(
+                {'registro': numero, 'motivo': motivo, 'datos': registro}, ensure_ascii=False, default=str,
+            ) + '\n')
+
+    def checkpoint(conexion, insertados, fallidos):
+        guardar_checkpoint(conexion, ruta, {
+            'procesados': pendiente[-1][0],
+            'insertados': estado['insertados'] + insertados,
+            'rechazados': estado['rechazados'] + len(fallidos),
+        })
+
+    def volcar():
+        insertados, fallidos = _insertar_lote(engine, entidad, pendiente, cache, checkpoint)
+        for numero, registro, motivo in fallidos:
+            rechazar(numero, registro, motivo)
+        estado['insertados'] += insertados
+        estado['procesados'] = pendiente[-1][0]
+        if archivo_rechazos:
+            archivo_rechazos.flush()
+        segundos = time.perf_counter() - inicio
+        progreso(f"{estado['procesados']} registros, {estado['insertados']} insertados, "
+                 f"{estado['rechazados']} rechazados ({leidos / segundos:.0f} registros/s)")
+        pendiente.clear()
+
+    try:
+        for numero, registro in enumerate(leer_registros(ruta, formato), start=1):
+            if numero <= saltar:
+                continue
+            leidos += 1
+            try:
+                pendiente.append((numero, registro, entidad.validar(registro)))
+            except RegistroInvalido as error:
+                rechazar(numero, registro, str(error))
+                continue
+            if len(pendiente) >= lote:
+                volcar()
+        if pendiente:
+            volcar()
+    finally:
+        if archivo_rechazos:
+            archivo_rechazos.close()
+
+    with engine.begin() as conexion:
+        borrar_checkpoint(conexion, ruta)
+    return Resumen(leidos, estado['insertados'], estado['rechazados'], time.perf_counter() - inicio)
@@ -0,0 +1,201 @@
+"""Instrumentación por petición y métricas en formato Prometheus.
+
+Sobre cada motor de SQLAlchemy se cuentan y cronometran las sentencias; en
+cada petición se acumulan en `g` y, al terminar, se registran en histogramas
+junto con la duración total de la petición y el tiempo de renderizado de las
+plantillas (señales `before_render_template`/`template_rendered` de Flask).
+Así se puede distinguir si `/prestamos` está lento por la cantidad de
+consultas, por lo que tarda cada una o por Jinja.
+
+Las consultas que superan METRICAS_CONSULTA_LENTA_MS (por defecto 200 ms) se
+registran en el logger `metricas` con sus parámetros y la ruta que las emitió.
+
+El costo por consulta son dos `perf_counter()` y una suma; los histogramas se
+actualizan una vez por petición. Las métricas son por proceso: con varios
+workers, Prometheus debe raspar cada uno (o agregarse en el balanceador).
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+LARGO_PARAMETROS = 500
+
+
+# ---------------------------
+# HISTOGRAMAS Y CONTADORES
+# ---------------------------
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(nombres, valores, extra=''):
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.limites = tuple(limites)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        with self._lock:
+            series = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for etiquetas, cubetas, suma, cuenta in sorted(series):
+            acumulado = 0
+            for limite, n in zip((*self.limites, '+Inf'), cubetas):
+                acumulado += n
+                le = _etiquetas(self.etiquetas, etiquetas, f'le="{limite}"')
+                lineas.append(f'{self.nombre}_bucket{le} {acumulado}')
+            base = _etiquetas(self.etiquetas, etiquetas)
+            lineas.append(f'{self.nombre}_sum{base} {suma}')
+            lineas.append(f'{self.nombre}_count{base} {cuenta}')
+        return lineas
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *etiquetas, cantidad=1):
+        with self._lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + cantidad
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} counter']
+        with self._lock:
+            valores = sorted(self._valores.items())
+        for etiquetas, valor in valores:
+            lineas.append(f'{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {valor}')
+        return lineas
+
+
+class Metricas:
+    def __init__(self, umbral_lenta):
+        self.umbral_lenta = umbral_lenta
+        self.peticion = Histograma(
+            'biblioteca_peticion_segundos', 'Duración de las peticiones HTTP.',
+            ('ruta', 'metodo', 'estado'),
+        )
+        self.consultas = Histograma(
+            'biblioteca_peticion_consultas_sql', 'Sentencias SQL por petición.',
+            ('ruta',), LIMITES_CONSULTAS,
+        )
+        self.tiempo_sql = Histograma(
+            'biblioteca_peticion_sql_segundos', 'Tiempo total en SQL por petición.', ('ruta',),
+        )
+        self.plantillas = Histograma(
+            'biblioteca_plantilla_segundos', 'Tiempo de renderizado de cada plantilla Jinja.', ('plantilla',),
+        )
+        self.lentas = Contador(
+            'biblioteca_consultas_lentas_total', 'Consultas que superaron el umbral de consulta lenta.', ('ruta',),
+        )
+
+    def exponer(self):
+        lineas = []
+        for metrica in (self.peticion, self.consultas, self.tiempo_sql, self.plantillas, self.lentas):
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+# ---------------------------
+# GANCHOS
+# ---------------------------
+def ruta_actual():
+    """Patrón de la ruta (p. ej. /libros/editar/<int:libro_id>) para no multiplicar series por id."""
+    if not has_request_context():
+        return 'fuera de petición'
+    return request.url_rule.rule if request.url_rule else 'sin ruta'
+
+
+def instrumentar_motor(engine, metricas):
+    # El inicio va en el contexto de cada ejecución: si la consulta falla no
+    # llega after_cursor_execute y el valor se descarta con el contexto, en vez
+    # de quedar apilado en la conexión y descuadrar las mediciones siguientes
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes(conexion, cursor, sentencia, parametros, contexto, executemany):
+        contexto.metricas_inicio = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _despues(conexion, cursor, sentencia, parametros, contexto, executemany):
+        segundos = time.perf_counter() - contexto.metricas_inicio
+        actual = g.get('metricas') if has_request_context() else None
+        if actual is not None:
+            actual['consultas'] += 1
+            actual['sql'] += segundos
+        if segundos >= metricas.umbral_lenta:
+            ruta = ruta_actual()
+            metricas.lentas.incrementar(ruta)
+            logger.warning(
+                'Consulta lenta (%.1f ms) en %s %s: %s | parámetros: %.*s',
+                segundos * 1000, request.method if has_request_context() else '-', ruta,
+                ' '.join(sentencia.split()), LARGO_PARAMETROS, repr(parametros),
+            )
+
+
+def configurar(app, db):
+    metricas = Metricas(float(os.environ.get('METRICAS_CONSULTA_LENTA_MS', 200)) / 1000)
+    app.extensions['metricas'] = metricas
+    with app.app_context():
+        for engine in db.engines.values():
+            instrumentar_motor(engine, metricas)
+
+    @app.before_request
+    def _inicio_peticion():
+        g.metricas = {'inicio': time.perf_counter(), 'consultas': 0, 'sql': 0.0}
+
+    @app.after_request
+    def _fin_peticion(respuesta):
+        actual = g.pop('metricas', None)
+        if actual is not None:
+            ruta = ruta_actual()
+            metricas.peticion.observar(
+                time.perf_counter() - actual['inicio'], ruta, request.method, respuesta.status_code,
+            )
+            metricas.consultas.observar(actual['consultas'], ruta)
+            metricas.tiempo_sql.observar(actual['sql'], ruta)
+        return respuesta
+
+    def _antes_de_renderizar(emisor, template, context, **extra):
+        g.setdefault('metricas_plantillas', []).append(time.perf_counter())
+
+    def _renderizada(emisor, template, context, **extra):
+        inicios = g.get('metricas_plantillas')
+        if inicios:
+            metricas.plantillas.observar(time.perf_counter() - inicios.pop(), template.name or 'sin nombre')
+
+    # weak=False: las funciones locales no tienen otra referencia que las mantenga vivas
+    before_render_template.connect(_antes_de_renderizar, app, weak=False)
+    template_rendered.connect(_renderizada, app, weak=False)
+    return metricas
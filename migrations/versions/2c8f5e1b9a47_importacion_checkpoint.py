@@ -0,0 +1,30 @@
+"""Checkpoint de importación guardado con cada lote
+
+Revision ID: 2c8f5e1b9a47
+Revises: 7d4a2f9c6e13
+Create Date: 2026-10-19 02:41:09.337152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8f5e1b9a47'
+down_revision = '7d4a2f9c6e13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('importacion_checkpoint',
+    sa.Column('archivo', sa.String(length=500), nullable=False),
+    sa.Column('procesados', sa.Integer(), nullable=False),
+    sa.Column('insertados', sa.Integer(), nullable=False),
+    sa.Column('rechazados', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('archivo')
+    )
+
+
+def downgrade():
+    op.drop_table('importacion_checkpoint')
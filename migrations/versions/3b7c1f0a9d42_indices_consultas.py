@@ -0,0 +1,45 @@
+"""Índices para las consultas frecuentes
+
+Revision ID: 3b7c1f0a9d42
+Revises: ec893eb8dc46
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7c1f0a9d42'
+down_revision = 'ec893eb8dc46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_libro_autor_id', 'libro', ['autor_id'], unique=False)
+    op.create_index('ix_libro_titulo_id', 'libro', ['titulo', 'id'], unique=False)
+    op.create_index('ix_prestamo_libro_id', 'prestamo', ['libro_id'], unique=False)
+    op.create_index('ix_prestamo_usuario_id', 'prestamo', ['usuario_id'], unique=False)
+    op.create_index('ix_prestamo_fecha_prestamo_id', 'prestamo', ['fecha_prestamo', 'id'], unique=False)
+    op.create_index('ix_prestamo_devuelto_fecha_prestamo_id', 'prestamo', ['devuelto', 'fecha_prestamo', 'id'], unique=False)
+    op.create_index('ix_prestamo_devuelto_fecha_devolucion', 'prestamo', ['devuelto', 'fecha_devolucion'], unique=False)
+    op.create_index(
+        'ix_prestamo_pendientes', 'prestamo', ['fecha_devolucion'], unique=False,
+        sqlite_where=sa.text('devuelto = 0'),
+        postgresql_where=sa.text('devuelto = false'),
+    )
+    # Falla si ya hay emails repetidos: hay que depurarlos antes de aplicar la migración
+    op.create_index('ix_usuario_email', 'usuario', ['email'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_usuario_email', table_name='usuario')
+    op.drop_index('ix_prestamo_pendientes', table_name='prestamo')
+    op.drop_index('ix_prestamo_devuelto_fecha_devolucion', table_name='prestamo')
+    op.drop_index('ix_prestamo_devuelto_fecha_prestamo_id', table_name='prestamo')
+    op.drop_index('ix_prestamo_fecha_prestamo_id', table_name='prestamo')
+    op.drop_index('ix_prestamo_usuario_id', table_name='prestamo')
+    op.drop_index('ix_prestamo_libro_id', table_name='prestamo')
+    op.drop_index('ix_libro_titulo_id', table_name='libro')
+    op.drop_index('ix_libro_autor_id', table_name='libro')
@@ -0,0 +1,24 @@
+"""Índice sobre lower(email) para resolver usuarios en la importación
+
+Revision ID: 3f9a6c2d8e71
+Revises: 2c8f5e1b9a47
+Create Date: 2026-10-19 04:12:37.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a6c2d8e71'
+down_revision = '2c8f5e1b9a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_usuario_email_lower', 'usuario', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_usuario_email_lower', table_name='usuario')
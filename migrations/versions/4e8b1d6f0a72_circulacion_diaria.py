@@ -0,0 +1,151 @@
+"""Agregados diarios de circulación
+
+Revision ID: 4e8b1d6f0a72
+Revises: 9a4c2e7d1b63
+Create Date: 2026-10-18 22:41:05.318720
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8b1d6f0a72'
+down_revision = '9a4c2e7d1b63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('circulacion_dia',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('prestamos', sa.Integer(), nullable=False),
+    sa.Column('devoluciones', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dia')
+    )
+    op.create_table('circulacion_genero',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('genero', sa.String(length=50), nullable=False),
+    sa.Column('prestamos', sa.Integer(), nullable=False),
+    sa.Column('devoluciones', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dia', 'genero')
+    )
+    op.create_table('circulacion_autor',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('autor_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('prestamos', sa.Integer(), nullable=False),
+    sa.Column('devoluciones', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dia', 'autor_id')
+    )
+    op.create_table('circulacion_rol',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('rol', sa.String(length=20), nullable=False),
+    sa.Column('prestamos', sa.Integer(), nullable=False),
+    sa.Column('devoluciones', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dia', 'rol')
+    )
+    # Para recalcular las devoluciones archivadas por rango de fecha
+    op.create_index('ix_prestamo_historico_fecha_devolucion', 'prestamo_historico', ['fecha_devolucion'], unique=False)
+    # Las tablas nacen vacías: el historial se carga con `flask reconstruir-circulacion`,
+    # por tramos, sin bloquear la base durante toda la migración
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""
+        CREATE TRIGGER prestamo_circulacion_ai AFTER INSERT ON prestamo
+        WHEN new.fecha_prestamo IS NOT NULL BEGIN
+            INSERT INTO circulacion_dia (dia, prestamos, devoluciones)
+            SELECT new.fecha_prestamo, 1, 0
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia) DO UPDATE SET
+                prestamos = circulacion_dia.prestamos + excluded.prestamos,
+                devoluciones = circulacion_dia.devoluciones + excluded.devoluciones;
+            INSERT INTO circulacion_genero (dia, genero, prestamos, devoluciones)
+            SELECT new.fecha_prestamo, COALESCE(l.genero, ''), 1, 0
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia, genero) DO UPDATE SET
+                prestamos = circulacion_genero.prestamos + excluded.prestamos,
+                devoluciones = circulacion_genero.devoluciones + excluded.devoluciones;
+            INSERT INTO circulacion_autor (dia, autor_id, prestamos, devoluciones)
+            SELECT new.fecha_prestamo, l.autor_id, 1, 0
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia, autor_id) DO UPDATE SET
+                prestamos = circulacion_autor.prestamos + excluded.prestamos,
+                devoluciones = circulacion_autor.devoluciones + excluded.devoluciones;
+            INSERT INTO circulacion_rol (dia, rol, prestamos, devoluciones)
+            SELECT new.fecha_prestamo, COALESCE(u.rol, ''), 1, 0
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia, rol) DO UPDATE SET
+                prestamos = circulacion_rol.prestamos + excluded.prestamos,
+                devoluciones = circulacion_rol.devoluciones + excluded.devoluciones;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER prestamo_circulacion_devuelto_ai AFTER INSERT ON prestamo
+        WHEN new.devuelto AND COALESCE(new.fecha_devolucion, new.fecha_prestamo) IS NOT NULL BEGIN
+            INSERT INTO circulacion_dia (dia, prestamos, devoluciones)
+            SELECT MIN(COALESCE(new.fecha_devolucion, new.fecha_prestamo), date('now', 'localtime')), 0, 1
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia) DO UPDATE SET
+                prestamos = circulacion_dia.prestamos + excluded.prestamos,
+                devoluciones = circulacion_dia.devoluciones + excluded.devoluciones;
+            INSERT INTO circulacion_genero (dia, genero, prestamos, devoluciones)
+            SELECT MIN(COALESCE(new.fecha_devolucion, new.fecha_prestamo), date('now', 'localtime')), COALESCE(l.genero, ''), 0, 1
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia, genero) DO UPDATE SET
+                prestamos = circulacion_genero.prestamos + excluded.prestamos,
+                devoluciones = circulacion_genero.devoluciones + excluded.devoluciones;
+            INSERT INTO circulacion_autor (dia, autor_id, prestamos, devoluciones)
+            SELECT MIN(COALESCE(new.fecha_devolucion, new.fecha_prestamo), date('now', 'localtime')), l.autor_id, 0, 1
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia, autor_id) DO UPDATE SET
+                prestamos = circulacion_autor.prestamos + excluded.prestamos,
+                devoluciones = circulacion_autor.devoluciones + excluded.devoluciones;
+            INSERT INTO circulacion_rol (dia, rol, prestamos, devoluciones)
+            SELECT MIN(COALESCE(new.fecha_devolucion, new.fecha_prestamo), date('now', 'localtime')), COALESCE(u.rol, ''), 0, 1
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia, rol) DO UPDATE SET
+                prestamos = circulacion_rol.prestamos + excluded.prestamos,
+                devoluciones = circulacion_rol.devoluciones + excluded.devoluciones;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER prestamo_circulacion_au AFTER UPDATE OF devuelto ON prestamo
+        WHEN new.devuelto AND NOT COALESCE(old.devuelto, 0) BEGIN
+            INSERT INTO circulacion_dia (dia, prestamos, devoluciones)
+            SELECT date('now', 'localtime'), 0, 1
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia) DO UPDATE SET
+                prestamos = circulacion_dia.prestamos + excluded.prestamos,
+                devoluciones = circulacion_dia.devoluciones + excluded.devoluciones;
+            INSERT INTO circulacion_genero (dia, genero, prestamos, devoluciones)
+            SELECT date('now', 'localtime'), COALESCE(l.genero, ''), 0, 1
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia, genero) DO UPDATE SET
+                prestamos = circulacion_genero.prestamos + excluded.prestamos,
+                devoluciones = circulacion_genero.devoluciones + excluded.devoluciones;
+            INSERT INTO circulacion_autor (dia, autor_id, prestamos, devoluciones)
+            SELECT date('now', 'localtime'), l.autor_id, 0, 1
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia, autor_id) DO UPDATE SET
+                prestamos = circulacion_autor.prestamos + excluded.prestamos,
+                devoluciones = circulacion_autor.devoluciones + excluded.devoluciones;
+            INSERT INTO circulacion_rol (dia, rol, prestamos, devoluciones)
+            SELECT date('now', 'localtime'), COALESCE(u.rol, ''), 0, 1
+            FROM libro l, usuario u WHERE l.id = new.libro_id AND u.id = new.usuario_id
+            ON CONFLICT (dia, rol) DO UPDATE SET
+                prestamos = circulacion_rol.prestamos + excluded.prestamos,
+                devoluciones = circulacion_rol.devoluciones + excluded.devoluciones;
+        END
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('prestamo_circulacion_au', 'prestamo_circulacion_devuelto_ai', 'prestamo_circulacion_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.drop_index('ix_prestamo_historico_fecha_devolucion', table_name='prestamo_historico')
+    op.drop_table('circulacion_rol')
+    op.drop_table('circulacion_autor')
+    op.drop_table('circulacion_genero')
+    op.drop_table('circulacion_dia')
@@ -0,0 +1,80 @@
+"""Índices FTS5 de autores y usuarios para autocompletado
+
+Revision ID: 5e0b7d3c9a14
+Revises: c41a9e7b2f58
+Create Date: 2026-10-18 15:21:44.610385
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0b7d3c9a14'
+down_revision = 'c41a9e7b2f58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 sólo existe en SQLite
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""
+        CREATE VIRTUAL TABLE autor_busqueda USING fts5(
+            nombre,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER autor_indice_ai AFTER INSERT ON autor BEGIN
+            INSERT INTO autor_busqueda (rowid, nombre) VALUES (new.id, new.nombre);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER autor_indice_au AFTER UPDATE OF nombre ON autor BEGIN
+            DELETE FROM autor_busqueda WHERE rowid = old.id;
+            INSERT INTO autor_busqueda (rowid, nombre) VALUES (new.id, new.nombre);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER autor_indice_ad AFTER DELETE ON autor BEGIN
+            DELETE FROM autor_busqueda WHERE rowid = old.id;
+        END
+    """)
+    op.execute('INSERT INTO autor_busqueda (rowid, nombre) SELECT id, nombre FROM autor')
+
+    op.execute("""
+        CREATE VIRTUAL TABLE usuario_busqueda USING fts5(
+            nombre, email,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER usuario_indice_ai AFTER INSERT ON usuario BEGIN
+            INSERT INTO usuario_busqueda (rowid, nombre, email) VALUES (new.id, new.nombre, new.email);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER usuario_indice_au AFTER UPDATE OF nombre, email ON usuario BEGIN
+            DELETE FROM usuario_busqueda WHERE rowid = old.id;
+            INSERT INTO usuario_busqueda (rowid, nombre, email) VALUES (new.id, new.nombre, new.email);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER usuario_indice_ad AFTER DELETE ON usuario BEGIN
+            DELETE FROM usuario_busqueda WHERE rowid = old.id;
+        END
+    """)
+    op.execute('INSERT INTO usuario_busqueda (rowid, nombre, email) SELECT id, nombre, email FROM usuario')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for trigger in ('usuario_indice_ad', 'usuario_indice_au', 'usuario_indice_ai',
+                    'autor_indice_ad', 'autor_indice_au', 'autor_indice_ai'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS usuario_busqueda')
+    op.execute('DROP TABLE IF EXISTS autor_busqueda')
@@ -0,0 +1,76 @@
+"""Ejemplares disponibles por libro y cola de reservas
+
+Revision ID: 6c1e8b5f2d90
+Revises: d93f1b6e4a27
+Create Date: 2026-10-18 19:02:15.448120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c1e8b5f2d90'
+down_revision = 'd93f1b6e4a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('disponibilidad',
+    sa.Column('libro_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('ejemplares', sa.Integer(), nullable=False),
+    sa.Column('disponibles', sa.Integer(), nullable=False),
+    sa.CheckConstraint('disponibles >= 0 AND disponibles <= ejemplares', name='ck_disponibilidad_rango'),
+    sa.PrimaryKeyConstraint('libro_id')
+    )
+    op.create_table('reserva',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('libro_id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('creada', sa.DateTime(), nullable=False),
+    sa.Column('lista_desde', sa.DateTime(), nullable=True),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.ForeignKeyConstraint(['libro_id'], ['libro.id'], ),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_reserva_estado_id', 'reserva', ['estado', 'id'], unique=False)
+    op.create_index('ix_reserva_libro_estado_id', 'reserva', ['libro_id', 'estado', 'id'], unique=False)
+    op.create_index(op.f('ix_reserva_usuario_id'), 'reserva', ['usuario_id'], unique=False)
+
+    # Un ejemplar por libro, o tantos como préstamos pendientes tenga
+    op.execute("""
+        INSERT INTO disponibilidad (libro_id, ejemplares, disponibles)
+        SELECT l.id,
+               CASE WHEN COUNT(p.id) > 1 THEN COUNT(p.id) ELSE 1 END,
+               CASE WHEN COUNT(p.id) = 0 THEN 1 ELSE 0 END
+        FROM libro l LEFT JOIN prestamo p ON p.libro_id = l.id AND p.devuelto = false
+        GROUP BY l.id
+    """)
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""
+        CREATE TRIGGER libro_disponibilidad_ai AFTER INSERT ON libro BEGIN
+            INSERT INTO disponibilidad (libro_id, ejemplares, disponibles) VALUES (new.id, 1, 1)
+            ON CONFLICT (libro_id) DO NOTHING;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER libro_disponibilidad_ad AFTER DELETE ON libro BEGIN
+            DELETE FROM disponibilidad WHERE libro_id = old.id;
+            DELETE FROM reserva WHERE libro_id = old.id;
+        END
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('libro_disponibilidad_ad', 'libro_disponibilidad_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.drop_index(op.f('ix_reserva_usuario_id'), table_name='reserva')
+    op.drop_index('ix_reserva_libro_estado_id', table_name='reserva')
+    op.drop_index('ix_reserva_estado_id', table_name='reserva')
+    op.drop_table('reserva')
+    op.drop_table('disponibilidad')
@@ -0,0 +1,67 @@
+"""Ids de préstamo sin reutilizar (AUTOINCREMENT)
+
+Revision ID: 7d4a2f9c6e13
+Revises: f6a1d3b8c524
+Create Date: 2026-10-19 02:14:37.512890
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d4a2f9c6e13'
+down_revision = 'f6a1d3b8c524'
+branch_labels = None
+depends_on = None
+
+# SQLite no permite agregar AUTOINCREMENT a una tabla existente: se copia a una
+# tabla nueva y se vuelven a crear sus índices y triggers tal como estaban
+TABLA = """
+    CREATE TABLE prestamo_nueva (
+        id INTEGER NOT NULL PRIMARY KEY{autoincrement},
+        libro_id INTEGER NOT NULL,
+        usuario_id INTEGER NOT NULL,
+        fecha_prestamo DATE,
+        fecha_devolucion DATE,
+        devuelto BOOLEAN,
+        FOREIGN KEY(libro_id) REFERENCES libro (id),
+        FOREIGN KEY(usuario_id) REFERENCES usuario (id)
+    )
+"""
+
+
+def _reconstruir(autoincrement):
+    conexion = op.get_bind()
+    dependientes = conexion.execute(sa.text(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'prestamo' AND type IN ('index', 'trigger') "
+        "AND sql IS NOT NULL ORDER BY type"
+    )).scalars().all()
+    op.execute(TABLA.format(autoincrement=' AUTOINCREMENT' if autoincrement else ''))
+    op.execute("""
+        INSERT INTO prestamo_nueva (id, libro_id, usuario_id, fecha_prestamo, fecha_devolucion, devuelto)
+        SELECT id, libro_id, usuario_id, fecha_prestamo, fecha_devolucion, devuelto FROM prestamo
+    """)
+    op.execute('DROP TABLE prestamo')
+    op.execute('ALTER TABLE prestamo_nueva RENAME TO prestamo')
+    for sentencia in dependientes:
+        op.execute(sentencia)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _reconstruir(autoincrement=True)
+    # El próximo id tiene que quedar por encima de los vigentes y de los ya archivados
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'prestamo'")
+    op.execute("""
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'prestamo', MAX(id) FROM (SELECT id FROM prestamo UNION ALL SELECT id FROM prestamo_historico)
+        HAVING COUNT(*) > 0
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _reconstruir(autoincrement=False)
@@ -0,0 +1,35 @@
+"""Quitar de usuario_vencidos a los usuarios que se quedan sin vencidos
+
+Revision ID: 8b3e5d1f7a20
+Revises: 3f9a6c2d8e71
+Create Date: 2026-10-19 04:38:52.604117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3e5d1f7a20'
+down_revision = '3f9a6c2d8e71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('DROP TRIGGER IF EXISTS usuario_vencidos_ad')
+    op.execute("""
+        CREATE TRIGGER usuario_vencidos_ad AFTER DELETE ON prestamo_vencido BEGIN
+            UPDATE usuario_vencidos SET total = total - 1 WHERE usuario_id = old.usuario_id;
+            DELETE FROM usuario_vencidos WHERE usuario_id = old.usuario_id AND total <= 0;
+        END
+    """)
+    op.execute('DELETE FROM usuario_vencidos WHERE total <= 0')
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS usuario_vencidos_ad')
+    op.execute("""
+        CREATE TRIGGER usuario_vencidos_ad AFTER DELETE ON prestamo_vencido BEGIN
+            UPDATE usuario_vencidos SET total = total - 1 WHERE usuario_id = old.usuario_id;
+        END
+    """)
@@ -0,0 +1,67 @@
+"""Índice de búsqueda FTS5 de libros
+
+Revision ID: 8f2d4e6a1c35
+Revises: 3b7c1f0a9d42
+Create Date: 2026-10-18 11:40:07.918263
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2d4e6a1c35'
+down_revision = '3b7c1f0a9d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 sólo existe en SQLite
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""
+        CREATE VIRTUAL TABLE libro_busqueda USING fts5(
+            titulo, autor, genero,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER libro_busqueda_ai AFTER INSERT ON libro BEGIN
+            INSERT INTO libro_busqueda (rowid, titulo, autor, genero)
+            VALUES (new.id, new.titulo, (SELECT nombre FROM autor WHERE id = new.autor_id), new.genero);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER libro_busqueda_au AFTER UPDATE OF titulo, genero, autor_id ON libro BEGIN
+            DELETE FROM libro_busqueda WHERE rowid = old.id;
+            INSERT INTO libro_busqueda (rowid, titulo, autor, genero)
+            VALUES (new.id, new.titulo, (SELECT nombre FROM autor WHERE id = new.autor_id), new.genero);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER libro_busqueda_ad AFTER DELETE ON libro BEGIN
+            DELETE FROM libro_busqueda WHERE rowid = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER autor_busqueda_au AFTER UPDATE OF nombre ON autor BEGIN
+            UPDATE libro_busqueda SET autor = new.nombre
+            WHERE rowid IN (SELECT id FROM libro WHERE autor_id = new.id);
+        END
+    """)
+    op.execute("""
+        INSERT INTO libro_busqueda (rowid, titulo, autor, genero)
+        SELECT l.id, l.titulo, a.nombre, l.genero
+        FROM libro l JOIN autor a ON a.id = l.autor_id
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TRIGGER IF EXISTS autor_busqueda_au')
+    op.execute('DROP TRIGGER IF EXISTS libro_busqueda_ad')
+    op.execute('DROP TRIGGER IF EXISTS libro_busqueda_au')
+    op.execute('DROP TRIGGER IF EXISTS libro_busqueda_ai')
+    op.execute('DROP TABLE IF EXISTS libro_busqueda')
@@ -0,0 +1,54 @@
+"""Histórico de préstamos devueltos
+
+Revision ID: 9a4c2e7d1b63
+Revises: 6c1e8b5f2d90
+Create Date: 2026-10-18 21:07:12.480196
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c2e7d1b63'
+down_revision = '6c1e8b5f2d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('prestamo_historico',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('libro_id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('fecha_prestamo', sa.Date(), nullable=True),
+    sa.Column('fecha_devolucion', sa.Date(), nullable=True),
+    sa.Column('archivado', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['libro_id'], ['libro.id'], ),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_prestamo_historico_fecha_prestamo_id', 'prestamo_historico', ['fecha_prestamo', 'id'], unique=False)
+    op.create_index(op.f('ix_prestamo_historico_libro_id'), 'prestamo_historico', ['libro_id'], unique=False)
+    op.create_index(op.f('ix_prestamo_historico_usuario_id'), 'prestamo_historico', ['usuario_id'], unique=False)
+    # La tabla nace vacía: los préstamos se mueven con `flask archivar-prestamos`
+
+
+def downgrade():
+    # Devuelve los archivados a la tabla caliente antes de borrar el histórico.
+    # Ya están contados en estadistica_libro y el trigger de INSERT los volvería a sumar
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("""
+            UPDATE estadistica_libro SET total_prestamos = total_prestamos - (
+                SELECT COUNT(*) FROM prestamo_historico h WHERE h.libro_id = estadistica_libro.libro_id
+            )
+        """)
+    op.execute("""
+        INSERT INTO prestamo (id, libro_id, usuario_id, fecha_prestamo, fecha_devolucion, devuelto)
+        SELECT id, libro_id, usuario_id, fecha_prestamo, fecha_devolucion, true
+        FROM prestamo_historico
+    """)
+    op.drop_index(op.f('ix_prestamo_historico_usuario_id'), table_name='prestamo_historico')
+    op.drop_index(op.f('ix_prestamo_historico_libro_id'), table_name='prestamo_historico')
+    op.drop_index('ix_prestamo_historico_fecha_prestamo_id', table_name='prestamo_historico')
+    op.drop_table('prestamo_historico')
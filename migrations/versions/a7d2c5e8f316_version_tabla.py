@@ -0,0 +1,33 @@
+"""Versiones de tabla para invalidar la caché de respuestas
+
+Revision ID: a7d2c5e8f316
+Revises: 5e0b7d3c9a14
+Create Date: 2026-10-18 17:02:13.558902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2c5e8f316'
+down_revision = '5e0b7d3c9a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    version_tabla = op.create_table('version_tabla',
+    sa.Column('tabla', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('modificado', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('tabla')
+    )
+    op.bulk_insert(version_tabla, [
+        {'tabla': tabla, 'version': 0, 'modificado': None}
+        for tabla in ('autor', 'libro', 'usuario', 'prestamo')
+    ])
+
+
+def downgrade():
+    op.drop_table('version_tabla')
@@ -0,0 +1,26 @@
+"""Baja de usuarios
+
+Revision ID: b5f3a8c1e297
+Revises: 4e8b1d6f0a72
+Create Date: 2026-10-18 23:32:47.105338
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5f3a8c1e297'
+down_revision = '4e8b1d6f0a72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('usuario', sa.Column('baja', sa.Date(), nullable=True))
+
+
+def downgrade():
+    # ALTER TABLE directo y no batch: recrear `usuario` perdería sus triggers
+    # (SQLite 3.35+ ya sabe borrar columnas)
+    op.drop_column('usuario', 'baja')
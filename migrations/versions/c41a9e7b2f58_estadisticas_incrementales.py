@@ -0,0 +1,99 @@
+"""Tablas de estadísticas mantenidas por triggers
+
+Revision ID: c41a9e7b2f58
+Revises: 8f2d4e6a1c35
+Create Date: 2026-10-18 13:05:52.227610
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41a9e7b2f58'
+down_revision = '8f2d4e6a1c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('estadistica_autor',
+    sa.Column('autor_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total_libros', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('autor_id')
+    )
+    op.create_index('ix_estadistica_autor_total', 'estadistica_autor', ['total_libros', 'autor_id'], unique=False)
+    op.create_table('estadistica_libro',
+    sa.Column('libro_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total_prestamos', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('libro_id')
+    )
+    op.create_index('ix_estadistica_libro_total', 'estadistica_libro', ['total_prestamos', 'libro_id'], unique=False)
+
+    op.execute("""
+        INSERT INTO estadistica_autor (autor_id, total_libros)
+        SELECT autor_id, COUNT(*) FROM libro GROUP BY autor_id
+    """)
+    op.execute("""
+        INSERT INTO estadistica_libro (libro_id, total_prestamos)
+        SELECT libro_id, COUNT(*) FROM prestamo GROUP BY libro_id
+    """)
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""
+        CREATE TRIGGER libro_estadistica_ai AFTER INSERT ON libro BEGIN
+            INSERT INTO estadistica_autor (autor_id, total_libros) VALUES (new.autor_id, 1)
+            ON CONFLICT (autor_id) DO UPDATE SET total_libros = total_libros + 1;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER libro_estadistica_ad AFTER DELETE ON libro BEGIN
+            UPDATE estadistica_autor SET total_libros = total_libros - 1 WHERE autor_id = old.autor_id;
+            DELETE FROM estadistica_libro WHERE libro_id = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER libro_estadistica_au AFTER UPDATE OF autor_id ON libro
+        WHEN old.autor_id IS NOT new.autor_id BEGIN
+            UPDATE estadistica_autor SET total_libros = total_libros - 1 WHERE autor_id = old.autor_id;
+            INSERT INTO estadistica_autor (autor_id, total_libros) VALUES (new.autor_id, 1)
+            ON CONFLICT (autor_id) DO UPDATE SET total_libros = total_libros + 1;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER autor_estadistica_ad AFTER DELETE ON autor BEGIN
+            DELETE FROM estadistica_autor WHERE autor_id = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER prestamo_estadistica_ai AFTER INSERT ON prestamo BEGIN
+            INSERT INTO estadistica_libro (libro_id, total_prestamos) VALUES (new.libro_id, 1)
+            ON CONFLICT (libro_id) DO UPDATE SET total_prestamos = total_prestamos + 1;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER prestamo_estadistica_ad AFTER DELETE ON prestamo BEGIN
+            UPDATE estadistica_libro SET total_prestamos = total_prestamos - 1 WHERE libro_id = old.libro_id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER prestamo_estadistica_au AFTER UPDATE OF libro_id ON prestamo
+        WHEN old.libro_id IS NOT new.libro_id BEGIN
+            UPDATE estadistica_libro SET total_prestamos = total_prestamos - 1 WHERE libro_id = old.libro_id;
+            INSERT INTO estadistica_libro (libro_id, total_prestamos) VALUES (new.libro_id, 1)
+            ON CONFLICT (libro_id) DO UPDATE SET total_prestamos = total_prestamos + 1;
+        END
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('prestamo_estadistica_au', 'prestamo_estadistica_ad', 'prestamo_estadistica_ai',
+                        'autor_estadistica_ad', 'libro_estadistica_au', 'libro_estadistica_ad',
+                        'libro_estadistica_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.drop_index('ix_estadistica_libro_total', table_name='estadistica_libro')
+    op.drop_table('estadistica_libro')
+    op.drop_index('ix_estadistica_autor_total', table_name='estadistica_autor')
+    op.drop_table('estadistica_autor')
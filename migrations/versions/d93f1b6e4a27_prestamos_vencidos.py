@@ -0,0 +1,99 @@
+"""Préstamos vencidos precalculados y contadores por usuario
+
+Revision ID: d93f1b6e4a27
+Revises: a7d2c5e8f316
+Create Date: 2026-10-18 18:24:40.913275
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93f1b6e4a27'
+down_revision = 'a7d2c5e8f316'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('prestamo_vencido',
+    sa.Column('prestamo_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('fecha_devolucion', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('prestamo_id')
+    )
+    op.create_index('ix_prestamo_vencido_fecha', 'prestamo_vencido', ['fecha_devolucion', 'prestamo_id'], unique=False)
+    op.create_index(op.f('ix_prestamo_vencido_usuario_id'), 'prestamo_vencido', ['usuario_id'], unique=False)
+    op.create_table('usuario_vencidos',
+    sa.Column('usuario_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('usuario_id')
+    )
+    estado_tarea = op.create_table('estado_tarea',
+    sa.Column('tarea', sa.String(length=50), nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=True),
+    sa.PrimaryKeyConstraint('tarea')
+    )
+
+    hoy = date.today()
+    op.get_bind().execute(sa.text("""
+        INSERT INTO prestamo_vencido (prestamo_id, usuario_id, fecha_devolucion)
+        SELECT id, usuario_id, fecha_devolucion FROM prestamo
+        WHERE devuelto = false AND fecha_devolucion < :hoy
+    """).bindparams(sa.bindparam('hoy', type_=sa.Date())), {'hoy': hoy})
+    op.execute("""
+        INSERT INTO usuario_vencidos (usuario_id, total)
+        SELECT usuario_id, COUNT(*) FROM prestamo_vencido GROUP BY usuario_id
+    """)
+    op.bulk_insert(estado_tarea, [{'tarea': 'vencidos', 'fecha': hoy}])
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""
+        CREATE TRIGGER prestamo_vencido_ai AFTER INSERT ON prestamo
+        WHEN COALESCE(new.devuelto, 0) = 0 AND new.fecha_devolucion < date('now', 'localtime') BEGIN
+            INSERT INTO prestamo_vencido (prestamo_id, usuario_id, fecha_devolucion)
+            VALUES (new.id, new.usuario_id, new.fecha_devolucion)
+            ON CONFLICT (prestamo_id) DO NOTHING;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER prestamo_vencido_au
+        AFTER UPDATE OF devuelto, fecha_devolucion, usuario_id ON prestamo BEGIN
+            DELETE FROM prestamo_vencido WHERE prestamo_id = old.id;
+            INSERT INTO prestamo_vencido (prestamo_id, usuario_id, fecha_devolucion)
+            SELECT new.id, new.usuario_id, new.fecha_devolucion
+            WHERE COALESCE(new.devuelto, 0) = 0 AND new.fecha_devolucion < date('now', 'localtime');
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER prestamo_vencido_ad AFTER DELETE ON prestamo BEGIN
+            DELETE FROM prestamo_vencido WHERE prestamo_id = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER usuario_vencidos_ai AFTER INSERT ON prestamo_vencido BEGIN
+            INSERT INTO usuario_vencidos (usuario_id, total) VALUES (new.usuario_id, 1)
+            ON CONFLICT (usuario_id) DO UPDATE SET total = total + 1;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER usuario_vencidos_ad AFTER DELETE ON prestamo_vencido BEGIN
+            UPDATE usuario_vencidos SET total = total - 1 WHERE usuario_id = old.usuario_id;
+        END
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('usuario_vencidos_ad', 'usuario_vencidos_ai', 'prestamo_vencido_ad',
+                        'prestamo_vencido_au', 'prestamo_vencido_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.drop_table('estado_tarea')
+    op.drop_table('usuario_vencidos')
+    op.drop_index(op.f('ix_prestamo_vencido_usuario_id'), table_name='prestamo_vencido')
+    op.drop_index('ix_prestamo_vencido_fecha', table_name='prestamo_vencido')
+    op.drop_table('prestamo_vencido')
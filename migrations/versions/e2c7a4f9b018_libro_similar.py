@@ -0,0 +1,32 @@
+"""Recomendaciones por libro
+
+Revision ID: e2c7a4f9b018
+Revises: b5f3a8c1e297
+Create Date: 2026-10-19 00:18:36.552901
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2c7a4f9b018'
+down_revision = 'b5f3a8c1e297'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('libro_similar',
+    sa.Column('libro_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('posicion', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('similar_id', sa.Integer(), nullable=False),
+    sa.Column('puntaje', sa.Float(), nullable=False),
+    sa.Column('comunes', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('libro_id', 'posicion')
+    )
+    # La tabla nace vacía: se llena con `flask recomendaciones --completo`
+
+
+def downgrade():
+    op.drop_table('libro_similar')
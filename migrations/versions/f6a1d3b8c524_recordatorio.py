@@ -0,0 +1,30 @@
+"""Recordatorios de vencidos enviados
+
+Revision ID: f6a1d3b8c524
+Revises: e2c7a4f9b018
+Create Date: 2026-10-19 01:05:12.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6a1d3b8c524'
+down_revision = 'e2c7a4f9b018'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recordatorio',
+    sa.Column('usuario_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('enviado', sa.DateTime(), nullable=False),
+    sa.Column('prestamos', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('usuario_id', 'fecha')
+    )
+
+
+def downgrade():
+    op.drop_table('recordatorio')
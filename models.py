@@ -1,29 +1,207 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date
-from sqlalchemy.orm import relationship
-from database import Base
+"""Modelos de la biblioteca: la única definición del esquema.
 
+Además de las tablas, al importarse registra los triggers de SQLite que
+mantienen la búsqueda, las estadísticas, los vencidos, la disponibilidad y
+los agregados de circulación (se crean con `db.create_all()`; en producción, con las migraciones).
+
+Los hijos de cada relación se borran con SQL por conjuntos (ver
+eliminacion.py): `passive_deletes='all'` evita que el ORM los cargue.
+"""
+import busqueda
+import circulacion
+import disponibilidad
+import estadisticas
+import vencidos
 from database import db
 
+
+class Autor(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(100), nullable=False)
+    nacionalidad = db.Column(db.String(50))
+    libros = db.relationship('Libro', backref='autor', lazy=True, passive_deletes='all')
+
 class Libro(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     titulo = db.Column(db.String(100), nullable=False)
     genero = db.Column(db.String(50))
     anio_publicacion = db.Column(db.Integer)
-    autor_id = db.Column(db.Integer, db.ForeignKey('autor.id'))
+    autor_id = db.Column(db.Integer, db.ForeignKey('autor.id'), nullable=False, index=True)
+    prestamos = db.relationship('Prestamo', backref='libro', lazy=True, passive_deletes='all')
 
-class Autor(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    nombre = db.Column(db.String(100), nullable=False)
-    libros = db.relationship('Libro', backref='autor', lazy=True)
+    __table_args__ = (
+        db.Index('ix_libro_titulo_id', 'titulo', 'id'),
+    )
 
 class Usuario(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    email = db.Column(db.String(100), nullable=False, unique=True, index=True)
+    telefono = db.Column(db.String(20))
+    rol = db.Column(db.String(20))  # lector o bibliotecario
+    # Fecha de baja de un usuario que no se borró para conservar su historial (ver eliminacion.py)
+    baja = db.Column(db.Date)
+    prestamos = db.relationship('Prestamo', backref='usuario', lazy=True, passive_deletes='all')
+
+    __table_args__ = (
+        # La importación de préstamos busca a los usuarios por email sin distinguir mayúsculas
+        db.Index('ix_usuario_email_lower', db.func.lower(db.text('email'))),
+    )
 
 class Prestamo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'))
-    libro_id = db.Column(db.Integer, db.ForeignKey('libro.id'))
+    libro_id = db.Column(db.Integer, db.ForeignKey('libro.id'), nullable=False, index=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False, index=True)
     fecha_prestamo = db.Column(db.Date)
     fecha_devolucion = db.Column(db.Date)
+    devuelto = db.Column(db.Boolean, default=False)
+
+    __table_args__ = (
+        db.Index('ix_prestamo_fecha_prestamo_id', 'fecha_prestamo', 'id'),
+        db.Index('ix_prestamo_devuelto_fecha_prestamo_id', 'devuelto', 'fecha_prestamo', 'id'),
+        db.Index('ix_prestamo_devuelto_fecha_devolucion', 'devuelto', 'fecha_devolucion'),
+        # Índice parcial: sólo los préstamos sin devolver, que son los que consulta "vencidos"
+        db.Index(
+            'ix_prestamo_pendientes', 'fecha_devolucion',
+            sqlite_where=db.text('devuelto = 0'),
+        ),
+        # Un id borrado no se vuelve a usar: no choca con el del préstamo archivado (historico.py)
+        {'sqlite_autoincrement': True},
+    )
+
+# Contadores para los rankings, mantenidos por triggers (ver estadisticas.py)
+class EstadisticaAutor(db.Model):
+    autor_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total_libros = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_estadistica_autor_total', 'total_libros', 'autor_id'),
+    )
+
+class EstadisticaLibro(db.Model):
+    libro_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total_prestamos = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_estadistica_libro_total', 'total_prestamos', 'libro_id'),
+    )
+
+# Versión de cada tabla, para invalidar la caché de respuestas (ver cache_respuestas.py)
+class VersionTabla(db.Model):
+    tabla = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    modificado = db.Column(db.DateTime)
+
+# Préstamos vencidos precalculados, mantenidos por triggers y por la tarea diaria (ver vencidos.py)
+class PrestamoVencido(db.Model):
+    prestamo_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    usuario_id = db.Column(db.Integer, nullable=False, index=True)
+    fecha_devolucion = db.Column(db.Date, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_prestamo_vencido_fecha', 'fecha_devolucion', 'prestamo_id'),
+    )
+
+class UsuarioVencidos(db.Model):
+    usuario_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+# Última fecha procesada por cada tarea periódica
+class EstadoTarea(db.Model):
+    tarea = db.Column(db.String(50), primary_key=True)
+    fecha = db.Column(db.Date)
+
+# Registros ya procesados de cada importación en curso, guardados con su lote (ver importacion.py)
+class ImportacionCheckpoint(db.Model):
+    __tablename__ = 'importacion_checkpoint'
+    archivo = db.Column(db.String(500), primary_key=True)
+    procesados = db.Column(db.Integer, nullable=False)
+    insertados = db.Column(db.Integer, nullable=False)
+    rechazados = db.Column(db.Integer, nullable=False)
+
+# Ejemplares por libro y cola de reservas (ver disponibilidad.py)
+class Disponibilidad(db.Model):
+    libro_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    ejemplares = db.Column(db.Integer, nullable=False, default=1)
+    disponibles = db.Column(db.Integer, nullable=False, default=1)
+
+    __table_args__ = (
+        db.CheckConstraint('disponibles >= 0 AND disponibles <= ejemplares', name='ck_disponibilidad_rango'),
+    )
+
+class Reserva(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    libro_id = db.Column(db.Integer, db.ForeignKey('libro.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False, index=True)
+    creada = db.Column(db.DateTime, nullable=False)
+    lista_desde = db.Column(db.DateTime)
+    estado = db.Column(db.String(20), nullable=False, default=disponibilidad.PENDIENTE)
+
+    __table_args__ = (
+        # La cola de cada libro: reservas en un estado, por orden de llegada
+        db.Index('ix_reserva_libro_estado_id', 'libro_id', 'estado', 'id'),
+        db.Index('ix_reserva_estado_id', 'estado', 'id'),
+    )
+
+# Préstamos devueltos que ya salieron de la tabla caliente (ver historico.py)
+class PrestamoHistorico(db.Model):
+    __tablename__ = 'prestamo_historico'
+    # El mismo id que tenía en `prestamo`
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    libro_id = db.Column(db.Integer, db.ForeignKey('libro.id'), nullable=False, index=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False, index=True)
+    fecha_prestamo = db.Column(db.Date)
+    fecha_devolucion = db.Column(db.Date)
+    archivado = db.Column(db.Date, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_prestamo_historico_fecha_prestamo_id', 'fecha_prestamo', 'id'),
+        db.Index('ix_prestamo_historico_fecha_devolucion', 'fecha_devolucion'),
+    )
+
+# Préstamos y devoluciones por día, mantenidos por triggers (ver circulacion.py)
+class CirculacionDia(db.Model):
+    dia = db.Column(db.Date, primary_key=True)
+    prestamos = db.Column(db.Integer, nullable=False, default=0)
+    devoluciones = db.Column(db.Integer, nullable=False, default=0)
+
+class CirculacionGenero(db.Model):
+    dia = db.Column(db.Date, primary_key=True)
+    genero = db.Column(db.String(50), primary_key=True)
+    prestamos = db.Column(db.Integer, nullable=False, default=0)
+    devoluciones = db.Column(db.Integer, nullable=False, default=0)
+
+class CirculacionAutor(db.Model):
+    dia = db.Column(db.Date, primary_key=True)
+    autor_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    prestamos = db.Column(db.Integer, nullable=False, default=0)
+    devoluciones = db.Column(db.Integer, nullable=False, default=0)
+
+class CirculacionRol(db.Model):
+    dia = db.Column(db.Date, primary_key=True)
+    rol = db.Column(db.String(20), primary_key=True)
+    prestamos = db.Column(db.Integer, nullable=False, default=0)
+    devoluciones = db.Column(db.Integer, nullable=False, default=0)
+
+# Recordatorios de vencidos enviados: uno por usuario y día (ver recordatorios.py)
+class Recordatorio(db.Model):
+    usuario_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    fecha = db.Column(db.Date, primary_key=True)
+    enviado = db.Column(db.DateTime, nullable=False)
+    prestamos = db.Column(db.Integer, nullable=False)
+
+# Los K libros más parecidos a cada libro, precalculados (ver recomendaciones.py)
+class LibroSimilar(db.Model):
+    libro_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    posicion = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    similar_id = db.Column(db.Integer, nullable=False)
+    puntaje = db.Column(db.Float, nullable=False)
+    comunes = db.Column(db.Integer, nullable=False)
+
+# Triggers de SQLite: índice de texto completo (FTS5), contadores, vencidos,
+# disponibilidad y agregados de circulación
+busqueda.registrar(db.metadata)
+estadisticas.registrar(db.metadata)
+vencidos.registrar(db.metadata)
+disponibilidad.registrar(db.metadata)
+circulacion.registrar(db.metadata)
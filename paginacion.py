@@ -0,0 +1,81 @@
+"""Paginación por clave (keyset) para las vistas HTML y la API.
+
+En vez de OFFSET se filtra a partir de la última fila vista (el cursor
+`despues`/`antes`, las claves del orden codificadas en base64), así que una
+página cuesta lo mismo al principio que al final del listado.
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import date
+
+from flask import abort, request, url_for
+from sqlalchemy import Date, tuple_
+
+POR_PAGINA = 50
+MAX_POR_PAGINA = 500
+
+Pagina = namedtuple('Pagina', ['filas', 'anterior', 'siguiente', 'por_pagina'])
+
+def codificar_cursor(valores):
+    crudo = json.dumps(valores, default=str, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+def decodificar_cursor(cursor, claves):
+    if not cursor:
+        return None
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(crudo)
+    except ValueError:
+        abort(400, 'Cursor de paginación inválido')
+    if not isinstance(valores, list) or len(valores) != len(claves):
+        abort(400, 'Cursor de paginación inválido')
+    try:
+        return tuple(
+            date.fromisoformat(valor) if isinstance(clave.type, Date) and valor is not None else valor
+            for clave, valor in zip(claves, valores)
+        )
+    except (TypeError, ValueError):
+        abort(400, 'Cursor de paginación inválido')
+
+def leer_por_pagina():
+    por_pagina = request.args.get('por_pagina', POR_PAGINA, type=int)
+    return max(1, min(por_pagina, MAX_POR_PAGINA))
+
+def paginar_keyset(consulta, claves, descendente=False):
+    """Pagina `consulta` buscando a partir del cursor (`despues`/`antes`) en vez de usar OFFSET.
+
+    `claves` son las columnas del orden, la última debe ser única (normalmente el id).
+    Se pide una fila de más para saber si existe otra página sin hacer un COUNT.
+    """
+    por_pagina = leer_por_pagina()
+    despues = decodificar_cursor(request.args.get('despues'), claves)
+    antes = decodificar_cursor(request.args.get('antes'), claves) if despues is None else None
+    clave = tuple_(*claves)
+    if despues is not None:
+        consulta = consulta.filter(clave < despues if descendente else clave > despues)
+    elif antes is not None:
+        consulta = consulta.filter(clave > antes if descendente else clave < antes)
+    hacia_atras = antes is not None
+    invertir = descendente != hacia_atras
+    consulta = consulta.order_by(*[c.desc() if invertir else c.asc() for c in claves])
+    filas = consulta.limit(por_pagina + 1).all()
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+    anterior = siguiente = None
+    if filas:
+        primera = codificar_cursor([getattr(filas[0], c.key) for c in claves])
+        ultima = codificar_cursor([getattr(filas[-1], c.key) for c in claves])
+        anterior = primera if (despues is not None or (hacia_atras and hay_mas)) else None
+        siguiente = ultima if (hay_mas or hacia_atras) else None
+    return Pagina(filas, anterior, siguiente, por_pagina)
+
+def url_pagina(**cambios):
+    args = request.args.to_dict()
+    args.pop('despues', None)
+    args.pop('antes', None)
+    args.update({k: v for k, v in cambios.items() if v is not None})
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
@@ -0,0 +1,100 @@
+"""Plantillas: caché de fragmentos y caché persistente de bytecode.
+
+Caché de fragmentos. La etiqueta `{% cache ... %}` guarda el HTML que genera
+su cuerpo bajo una clave formada por la plantilla, la línea y los valores
+que recibe:
+
+    {% for libro in libros %}
+        {% cache libro %}<tr>...</tr>{% endcache %}
+    {% endfor %}
+
+Pasándole la fila entera (id y todas las columnas que muestra), la fila es
+su propio sello de versión: una escritura sobre un libro cambia sólo su
+clave, y al invalidarse la página (ver cache_respuestas.py) se vuelve a
+renderizar esa fila mientras las demás salen de la caché sin ejecutar sus
+`url_for`. Todo lo que el cuerpo use y no sea parte de la fila (la fecha de
+hoy, por ejemplo) tiene que ir también en la clave. Las entradas viven en un
+LRU por proceso de `CACHE_FRAGMENTOS_MAX` entradas (0 la desactiva).
+
+Bytecode. Jinja compila cada plantilla a Python la primera vez que se usa.
+Con `JINJA_CACHE_DIR` (por defecto `instance/jinja`) el resultado queda en
+disco y un worker nuevo carga el bytecode en lugar de compilar; si la
+plantilla cambió, Jinja lo detecta por la suma de control y la recompila.
+`flask compilar-plantillas` llena la caché antes de arrancar los workers.
+`JINJA_CACHE_DIR=` (vacío) la desactiva.
+"""
+import os
+
+from flask import has_request_context, request
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from cache_respuestas import CacheMemoria
+
+MAX_FRAGMENTOS = 20000
+
+
+class CacheFragmentos(Extension):
+    """Etiqueta `{% cache clave, ... %}...{% endcache %}`."""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragmentos=None, fragmentos_aciertos=0, fragmentos_fallos=0)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        partes = [nodes.Const(parser.name), nodes.Const(lineno), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            partes.append(parser.parse_expression())
+        cuerpo = parser.parse_statements(('name:endcache',), drop_needle=True)
+        llamada = self.call_method('_fragmento', [nodes.Tuple(partes, 'load')])
+        return nodes.CallBlock(llamada, [], [], cuerpo).set_lineno(lineno)
+
+    def _fragmento(self, partes, caller):
+        almacen = self.environment.fragmentos
+        if almacen is None:
+            return caller()
+        # Los url_for del cuerpo dependen de dónde está montada la aplicación
+        clave = (request.script_root if has_request_context() else '', *partes)
+        html = almacen.get(clave)
+        if html is None:
+            self.environment.fragmentos_fallos += 1
+            html = caller()
+            almacen.set(clave, html)
+        else:
+            self.environment.fragmentos_aciertos += 1
+        return html
+
+
+def estadisticas(entorno):
+    aciertos, fallos = entorno.fragmentos_aciertos, entorno.fragmentos_fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'ratio_aciertos': round(aciertos / (aciertos + fallos), 4) if aciertos + fallos else None,
+        'entradas': len(entorno.fragmentos) if entorno.fragmentos is not None else 0,
+        'max_entradas': entorno.fragmentos.max_entradas if entorno.fragmentos is not None else 0,
+    }
+
+
+def configurar(app):
+    """Llamar antes de que se use `app.jinja_env`: las opciones se aplican al crearlo."""
+    opciones = {'extensions': [*app.jinja_options.get('extensions', ()), CacheFragmentos]}
+    carpeta = os.environ.get('JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja'))
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+        opciones['bytecode_cache'] = FileSystemBytecodeCache(carpeta)
+    app.jinja_options = {**app.jinja_options, **opciones}
+
+    maximo = int(os.environ.get('CACHE_FRAGMENTOS_MAX', MAX_FRAGMENTOS))
+    app.jinja_env.fragmentos = CacheMemoria(maximo) if maximo > 0 else None
+
+
+def compilar(app):
+    """Carga todas las plantillas para dejar su bytecode en la caché. Devuelve cuántas."""
+    nombres = app.jinja_env.list_templates(extensions=('html',))
+    for nombre in nombres:
+        app.jinja_env.get_template(nombre)
+    return len(nombres)
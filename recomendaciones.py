@@ -0,0 +1,217 @@
+"""Recomendaciones "quienes pidieron este libro también pidieron".
+
+La similitud entre dos libros es el coseno entre sus columnas de la matriz
+usuario × libro (1 si el usuario lo pidió alguna vez, contando el histórico):
+
+    sim(a, b) = lectores en común / sqrt(lectores de a * lectores de b)
+
+`calcular` arma la matriz dispersa con NumPy/SciPy a partir de `prestamo` y
+`prestamo_historico`, multiplica Xᵀ·X por bloques de `BLOQUE` libros (la
+memoria depende del bloque y no del catálogo) y guarda los `K` vecinos de
+cada libro en `libro_similar`, un bloque por transacción. Servirlos es una
+lectura por clave primaria (`similares`), sin NumPy.
+
+La matriz queda guardada en `RECOMENDACIONES_MATRIZ` (por defecto
+`instance/recomendaciones.npz`) junto con el último id de préstamo que
+incluye. `actualizar` es la pasada incremental, pensada para cron como
+`flask actualizar-vencidos`: lee sólo los préstamos con id mayor (por clave
+primaria, incluidos los importados con fechas pasadas), los suma a la matriz
+guardada y recalcula los libros de esos usuarios, que son las filas de Xᵀ·X
+que cambiaron. Los puntajes de los demás libros quedan con la popularidad
+anterior de sus vecinos, y los préstamos de libros o usuarios eliminados
+siguen en la matriz, hasta el próximo `calcular` completo (semanal basta).
+
+NumPy y SciPy sólo hacen falta para calcular (pip install numpy scipy).
+"""
+import os
+from collections import namedtuple
+
+from sqlalchemy import bindparam, text
+
+K = 10
+BLOQUE = 2000
+
+# x: usuario × libro en CSR; xt: su traspuesta, también en CSR (filas por libro);
+# lectores: cuántos usuarios pidieron cada libro
+Matriz = namedtuple('Matriz', ['x', 'xt', 'lectores'])
+
+# Sin DISTINCT: los pares repetidos se suman al armar la matriz y después se binariza
+PARES = text("""
+    SELECT usuario_id, libro_id FROM prestamo
+    UNION ALL
+    SELECT usuario_id, libro_id FROM prestamo_historico
+""")
+# Los préstamos que se agregaron después del id :ultimo (por clave primaria);
+# el histórico conserva el id que tenía en `prestamo`
+PARES_NUEVOS = text("""
+    SELECT usuario_id, libro_id FROM prestamo WHERE id > :ultimo
+    UNION ALL
+    SELECT usuario_id, libro_id FROM prestamo_historico WHERE id > :ultimo
+""")
+ULTIMO = text("""
+    SELECT MAX(COALESCE((SELECT MAX(id) FROM prestamo), 0), COALESCE((SELECT MAX(id) FROM prestamo_historico), 0))
+""")
+LIBROS = text('SELECT id FROM libro ORDER BY id')
+BORRAR = text('DELETE FROM libro_similar WHERE libro_id IN :ids').bindparams(bindparam('ids', expanding=True))
+INSERTAR = text("""
+    INSERT INTO libro_similar (libro_id, posicion, similar_id, puntaje, comunes)
+    VALUES (:libro_id, :posicion, :similar_id, :puntaje, :comunes)
+""")
+SIMILARES = text("""
+    SELECT s.similar_id AS id, l.titulo, a.nombre AS autor, s.puntaje, s.comunes
+    FROM libro_similar s
+    JOIN libro l ON l.id = s.similar_id
+    JOIN autor a ON a.id = l.autor_id
+    WHERE s.libro_id = :libro_id
+    ORDER BY s.posicion
+    LIMIT :n
+""")
+
+
+def _numpy():
+    try:
+        import numpy
+        from scipy import sparse
+    except ImportError:
+        raise RuntimeError('Calcular las recomendaciones requiere numpy y scipy (pip install numpy scipy)')
+    return numpy, sparse
+
+
+def ruta_por_defecto(app):
+    return os.environ.get('RECOMENDACIONES_MATRIZ', os.path.join(app.instance_path, 'recomendaciones.npz'))
+
+
+def _pares(resultado, trozo=50000):
+    """Los pares (usuario_id, libro_id) de `resultado` como dos arreglos."""
+    np, _ = _numpy()
+    usuarios, libros = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for filas in resultado.partitions(trozo):
+        columnas = list(zip(*filas))
+        usuarios.append(np.array(columnas[0], dtype=np.int64))
+        libros.append(np.array(columnas[1], dtype=np.int64))
+    return np.concatenate(usuarios), np.concatenate(libros)
+
+
+def _sumar(x, usuarios, libros):
+    """`x` (o una matriz vacía) más los pares nuevos, binarizada y con su traspuesta."""
+    np, sparse = _numpy()
+    filas = max(x.shape[0] if x is not None else 0, usuarios.max() + 1 if len(usuarios) else 0)
+    columnas = max(x.shape[1] if x is not None else 0, libros.max() + 1 if len(libros) else 0)
+    nuevos = sparse.csr_matrix((np.ones(len(usuarios)), (usuarios, libros)), shape=(filas, columnas))
+    if x is not None:
+        x.resize((filas, columnas))
+        nuevos = nuevos + x
+    nuevos.data[:] = 1
+    return Matriz(nuevos, nuevos.T.tocsr(), np.asarray(nuevos.sum(axis=0)).ravel())
+
+
+def matriz(conexion, trozo=50000):
+    """La matriz usuario × libro, indexada directamente por los ids."""
+    return _sumar(None, *_pares(conexion.execution_options(stream_results=True).execute(PARES), trozo))
+
+
+def guardar(ruta, m, ultimo):
+    """Guarda la matriz binaria (sin los unos) y el último id de préstamo que incluye."""
+    np, _ = _numpy()
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as archivo:
+        np.savez(archivo, indices=m.x.indices, indptr=m.x.indptr, forma=m.x.shape, ultimo=ultimo)
+    # Reemplazo atómico: una corrida que lee a la vez ve la matriz anterior o la nueva
+    os.replace(temporal, ruta)
+
+
+def cargar(ruta):
+    """(x, ultimo) guardados por `guardar`, o (None, 0) si no hay matriz."""
+    np, sparse = _numpy()
+    if not os.path.exists(ruta):
+        return None, 0
+    with np.load(ruta) as datos:
+        indices = datos['indices']
+        x = sparse.csr_matrix((np.ones(len(indices)), indices, datos['indptr']), shape=tuple(datos['forma']))
+        return x, int(datos['ultimo'])
+
+
+def vecinos(m, libro_ids, k=K):
+    """Filas para `libro_similar` de los libros de `libro_ids` (un bloque) según la Matriz `m`."""
+    np, _ = _numpy()
+    libro_ids = np.asarray([i for i in libro_ids if i < m.xt.shape[0]], dtype=np.int64)
+    if not len(libro_ids):
+        return []
+    lectores = m.lectores
+    comunes = (m.xt[libro_ids] @ m.x).tocsr()
+    filas = []
+    for fila, libro_id in enumerate(libro_ids):
+        inicio, fin = comunes.indptr[fila], comunes.indptr[fila + 1]
+        columnas, cuentas = comunes.indices[inicio:fin], comunes.data[inicio:fin]
+        otros = columnas != libro_id
+        columnas, cuentas = columnas[otros], cuentas[otros]
+        if not len(columnas):
+            continue
+        puntajes = cuentas / np.sqrt(lectores[libro_id] * lectores[columnas])
+        # Mayor puntaje primero; a igual puntaje, más lectores en común y después el id más bajo
+        orden = np.lexsort((columnas, -cuentas, -puntajes))[:k]
+        filas.extend(
+            {
+                'libro_id': int(libro_id), 'posicion': posicion, 'similar_id': int(columnas[i]),
+                'puntaje': round(float(puntajes[i]), 6), 'comunes': int(cuentas[i]),
+            }
+            for posicion, i in enumerate(orden)
+        )
+    return filas
+
+
+def _recalcular(engine, m, libro_ids, k, bloque, progreso):
+    for i in range(0, len(libro_ids), bloque):
+        ids = libro_ids[i:i + bloque]
+        filas = vecinos(m, ids, k)
+        with engine.begin() as conexion:
+            conexion.execute(BORRAR, {'ids': ids})
+            if filas:
+                conexion.execute(INSERTAR, filas)
+        progreso(f'{min(i + bloque, len(libro_ids))}/{len(libro_ids)} libros')
+    return len(libro_ids)
+
+
+def calcular(engine, ruta=None, k=K, bloque=BLOQUE, progreso=print):
+    """Recalcula los vecinos de todos los libros y guarda la matriz en `ruta`.
+
+    Devuelve cuántos libros procesó.
+    """
+    with engine.connect() as conexion:
+        # Antes que los pares: lo que entre entre medio se vuelve a sumar la próxima vez, sin efecto
+        ultimo = conexion.execute(ULTIMO).scalar()
+        m = matriz(conexion)
+        libro_ids = conexion.execute(LIBROS).scalars().all()
+    total = _recalcular(engine, m, libro_ids, k, bloque, progreso)
+    if ruta:
+        guardar(ruta, m, ultimo)
+    return total
+
+
+def actualizar(engine, ruta, k=K, bloque=BLOQUE, progreso=print):
+    """Suma los préstamos nuevos a la matriz guardada y recalcula los libros de sus usuarios.
+
+    Sin matriz guardada (o si es de una base con menos préstamos, p. ej. tras
+    restaurar un respaldo) calcula todo. Devuelve cuántos libros procesó.
+    """
+    x, ultimo = cargar(ruta)
+    with engine.connect() as conexion:
+        hasta = conexion.execute(ULTIMO).scalar()
+        if x is None or ultimo > hasta:
+            return calcular(engine, ruta, k, bloque, progreso)
+        usuarios, libros = _pares(conexion.execute(PARES_NUEVOS, {'ultimo': ultimo}))
+    if not len(usuarios):
+        return 0
+    np, _ = _numpy()
+    m = _sumar(x, usuarios, libros)
+    # Las filas de Xᵀ·X que cambian: todos los libros de los usuarios con préstamos nuevos
+    libro_ids = np.unique(m.x[np.unique(usuarios)].indices).tolist()
+    total = _recalcular(engine, m, libro_ids, k, bloque, progreso)
+    guardar(ruta, m, hasta)
+    return total
+
+
+def similares(session, libro_id, n=K):
+    """[(id, titulo, autor, puntaje, comunes)] de los libros más parecidos, del más parecido al menos."""
+    return session.execute(SIMILARES, {'libro_id': libro_id, 'n': n}).all()
@@ -0,0 +1,272 @@
+"""Recordatorios por correo de préstamos vencidos.
+
+Cada usuario con préstamos vencidos recibe un solo correo con todos sus
+títulos. `enviar` empieza por `vencidos.actualizar`, para no depender de que
+la tarea diaria ya haya agregado los que vencieron ayer, y después recorre `usuario_vencidos` por id en lotes de `LOTE`
+usuarios: cada lote se lee con una conexión que se devuelve al pool antes de
+enviar nada, los correos del lote salen en paralelo y los enviados se anotan
+en `recordatorio` (uno por usuario y día) en una transacción corta. Volver a
+correrlo el mismo día sólo manda los que faltan; si el proceso se corta a
+mitad de un lote, como mucho se repiten los correos de ese lote.
+
+El envío usa asyncio sobre un pool de `SMTP_CONEXIONES` conexiones SMTP
+(smtplib en hilos): nunca hay más envíos en curso que conexiones, cada
+conexión se reutiliza para muchos mensajes y los errores transitorios
+(respuestas 4xx, desconexiones, timeouts) se reintentan con espera
+exponencial. Un error permanente (5xx, dirección rechazada) deja al usuario
+sin anotar y se informa al final.
+
+La conexión se configura por entorno:
+
+    SMTP_HOST, SMTP_PORT         por defecto localhost:25
+    SMTP_USUARIO, SMTP_CLAVE     autenticación opcional
+    SMTP_STARTTLS=1              STARTTLS antes de autenticar
+    SMTP_CONEXIONES              conexiones simultáneas (4)
+    RECORDATORIOS_REMITENTE      dirección del remitente
+
+Para probarlo sin un servidor real: `python benchmarks/recordatorios.py`
+levanta un SMTP local de prueba y mide el envío.
+"""
+import asyncio
+import logging
+import os
+import random
+import smtplib
+import time
+from collections import namedtuple
+from datetime import date, datetime, timezone
+from email.message import EmailMessage
+from itertools import groupby
+
+from sqlalchemy import Date, bindparam, text
+
+import vencidos
+
+logger = logging.getLogger(__name__)
+
+LOTE = 200
+CONEXIONES = 4
+REINTENTOS = 3
+ESPERA = 0.5
+
+Aviso = namedtuple('Aviso', ['usuario_id', 'nombre', 'email', 'prestamos'])
+Resumen = namedtuple('Resumen', ['enviados', 'fallidos', 'segundos'])
+
+# Usuarios con vencidos a los que todavía no se les escribió hoy, por id
+PENDIENTES = text("""
+    SELECT uv.usuario_id FROM usuario_vencidos uv
+    WHERE uv.total > 0 AND uv.usuario_id > :despues
+      AND NOT EXISTS (
+          SELECT 1 FROM recordatorio r WHERE r.usuario_id = uv.usuario_id AND r.fecha = :hoy
+      )
+    ORDER BY uv.usuario_id
+    LIMIT :lote
+""").bindparams(bindparam('hoy', type_=Date))
+DETALLE = text("""
+    SELECT v.usuario_id, u.nombre, u.email, l.titulo, v.fecha_devolucion
+    FROM prestamo_vencido v
+    JOIN usuario u ON u.id = v.usuario_id
+    JOIN prestamo p ON p.id = v.prestamo_id
+    JOIN libro l ON l.id = p.libro_id
+    WHERE v.usuario_id IN :ids
+    ORDER BY v.usuario_id, v.fecha_devolucion, v.prestamo_id
+""").bindparams(bindparam('ids', expanding=True)).columns(fecha_devolucion=Date)
+ANOTAR = text("""
+    INSERT INTO recordatorio (usuario_id, fecha, enviado, prestamos)
+    VALUES (:usuario_id, :fecha, :enviado, :prestamos)
+    ON CONFLICT (usuario_id, fecha) DO NOTHING
+""").bindparams(bindparam('fecha', type_=Date))
+
+
+def configuracion_smtp():
+    """Parámetros de `PoolSMTP` leídos del entorno."""
+    return {
+        'host': os.environ.get('SMTP_HOST', 'localhost'),
+        'puerto': int(os.environ.get('SMTP_PORT', 25)),
+        'usuario': os.environ.get('SMTP_USUARIO'),
+        'clave': os.environ.get('SMTP_CLAVE'),
+        'starttls': os.environ.get('SMTP_STARTTLS') == '1',
+        'conexiones': int(os.environ.get('SMTP_CONEXIONES', CONEXIONES)),
+    }
+
+
+def remitente():
+    return os.environ.get('RECORDATORIOS_REMITENTE', 'biblioteca@localhost')
+
+
+def _ahora():
+    return datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+
+
+# ---------------------------
+# LECTURA POR LOTES
+# ---------------------------
+def pendientes(engine, hoy, lote=LOTE):
+    """Genera listas de Aviso, `lote` usuarios por vez, sin dejar conexiones abiertas entre lotes."""
+    despues = 0
+    while True:
+        with engine.connect() as conexion:
+            ids = conexion.execute(PENDIENTES, {'despues': despues, 'hoy': hoy, 'lote': lote}).scalars().all()
+            if not ids:
+                return
+            filas = conexion.execute(DETALLE, {'ids': ids}).all()
+        avisos = []
+        for usuario_id, grupo in groupby(filas, key=lambda f: f.usuario_id):
+            grupo = list(grupo)
+            avisos.append(Aviso(
+                usuario_id, grupo[0].nombre, grupo[0].email, [(f.titulo, f.fecha_devolucion) for f in grupo],
+            ))
+        yield avisos
+        despues = ids[-1]
+
+
+def mensaje(aviso, hoy, de=None):
+    correo = EmailMessage()
+    correo['From'] = de or remitente()
+    correo['To'] = aviso.email
+    correo['Subject'] = 'Préstamos vencidos en la biblioteca'
+    lineas = [f'  - {titulo} (vencía el {fecha:%d/%m/%Y})' for titulo, fecha in aviso.prestamos]
+    correo.set_content(
+        f'Hola {aviso.nombre}:\n\n'
+        f'Al {hoy:%d/%m/%Y} figuran sin devolver estos préstamos vencidos:\n\n'
+        + '\n'.join(lineas)
+        + '\n\nPor favor, devolvelos en el mostrador o renovalos cuanto antes.\n\nBiblioteca\n'
+    )
+    return correo
+
+
+# ---------------------------
+# ENVÍO
+# ---------------------------
+def _transitorio(error):
+    """True si vale la pena reintentar: desconexiones, timeouts y respuestas 4xx."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= codigo < 500 for codigo, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # Las demás excepciones de smtplib también son OSError, pero no se arreglan reintentando
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class PoolSMTP:
+    """Hasta `conexiones` conexiones SMTP reutilizables, usadas desde asyncio.
+
+    `enviar` espera una conexión libre (así se limita la concurrencia), manda
+    el mensaje en un hilo y devuelve la conexión al pool; una conexión que se
+    cortó se descarta y el reintento abre otra.
+    """
+
+    def __init__(self, host='localhost', puerto=25, usuario=None, clave=None, starttls=False,
+                 conexiones=CONEXIONES, reintentos=REINTENTOS, espera=ESPERA, timeout=30):
+        self.host, self.puerto, self.timeout = host, puerto, timeout
+        self.usuario, self.clave, self.starttls = usuario, clave, starttls
+        self.reintentos, self.espera = reintentos, espera
+        self._cupo = asyncio.Semaphore(conexiones)
+        self._libres = []
+
+    def _conectar(self):
+        conexion = smtplib.SMTP(self.host, self.puerto, timeout=self.timeout)
+        if self.starttls:
+            conexion.starttls()
+        if self.usuario:
+            conexion.login(self.usuario, self.clave or '')
+        return conexion
+
+    @staticmethod
+    def _descartar(conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    async def enviar(self, correo):
+        async with self._cupo:
+            for intento in range(self.reintentos + 1):
+                conexion = self._libres.pop() if self._libres else None
+                try:
+                    if conexion is None:
+                        conexion = await asyncio.to_thread(self._conectar)
+                    await asyncio.to_thread(conexion.send_message, correo)
+                except Exception as error:
+                    if isinstance(error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                        # El servidor respondió y smtplib ya hizo RSET: la conexión sirve
+                        self._libres.append(conexion)
+                    elif conexion is not None:
+                        self._descartar(conexion)
+                    if intento == self.reintentos or not _transitorio(error):
+                        raise
+                    # Espera exponencial con algo de azar para no reintentar todos a la vez
+                    await asyncio.sleep(self.espera * 2 ** intento * (1 + random.random()))
+                else:
+                    self._libres.append(conexion)
+                    return
+
+    async def cerrar(self):
+        while self._libres:
+            conexion = self._libres.pop()
+            try:
+                await asyncio.to_thread(conexion.quit)
+            except Exception:
+                self._descartar(conexion)
+
+
+async def _enviar(engine, pool, hoy, lote, de, progreso):
+    enviados = fallidos = 0
+    try:
+        for avisos in pendientes(engine, hoy, lote):
+            resultados = await asyncio.gather(
+                *(pool.enviar(mensaje(aviso, hoy, de)) for aviso in avisos), return_exceptions=True,
+            )
+            anotar = []
+            for aviso, resultado in zip(avisos, resultados):
+                if isinstance(resultado, Exception):
+                    fallidos += 1
+                    logger.warning('No se pudo enviar el recordatorio a %s: %s', aviso.email, resultado)
+                else:
+                    anotar.append({
+                        'usuario_id': aviso.usuario_id, 'fecha': hoy,
+                        'enviado': _ahora(), 'prestamos': len(aviso.prestamos),
+                    })
+            if anotar:
+                with engine.begin() as conexion:
+                    conexion.execute(ANOTAR, anotar)
+            enviados += len(anotar)
+            progreso(f'{enviados} enviados, {fallidos} fallidos')
+    finally:
+        await pool.cerrar()
+    return enviados, fallidos
+
+
+def enviar(engine, hoy=None, lote=LOTE, de=None, progreso=print, **smtp):
+    """Envía los recordatorios del día que falten. Devuelve un Resumen.
+
+    `smtp` son los parámetros de PoolSMTP; por defecto, los de `configuracion_smtp()`.
+    """
+    hoy = hoy or date.today()
+    inicio = time.perf_counter()
+    with engine.begin() as conexion:
+        vencidos.actualizar(conexion, hoy)
+    enviados, fallidos = asyncio.run(
+        _enviar(engine, PoolSMTP(**{**configuracion_smtp(), **smtp}), hoy, lote, de, progreso),
+    )
+    return Resumen(enviados, fallidos, time.perf_counter() - inicio)
+
+
+def contar(engine, hoy=None):
+    """Cuántos usuarios recibirían hoy un recordatorio (para simular el envío).
+
+    Cuenta también los que agregaría `vencidos.actualizar`, pero sin guardarlos.
+    """
+    hoy = hoy or date.today()
+    with engine.connect() as conexion:
+        vencidos.actualizar(conexion, hoy)
+        total = conexion.execute(text("""
+            SELECT COUNT(*) FROM usuario_vencidos uv
+            WHERE uv.total > 0 AND NOT EXISTS (
+                SELECT 1 FROM recordatorio r WHERE r.usuario_id = uv.usuario_id AND r.fecha = :hoy
+            )
+        """).bindparams(bindparam('hoy', type_=Date)), {'hoy': hoy}).scalar()
+        conexion.rollback()
+    return total
@@ -0,0 +1,350 @@
+"""Respaldo en caliente y restauración verificada de la base SQLite.
+
+Copiar `biblioteca.db` con `cp` mientras la aplicación escribe puede dejar
+un archivo corrupto (y en WAL, sin las últimas transacciones). `respaldar`
+usa la API de backup de SQLite, `PAGINAS` páginas por paso. En WAL (el modo
+de la aplicación) la copia entera se hace dentro de una transacción de
+lectura: todos los pasos ven la misma instantánea y los escritores no
+esperan nunca. Con el journal clásico cada paso toma y suelta el bloqueo
+compartido, así que un escritor espera como mucho lo que dura un paso; si
+alguien escribe entre pasos SQLite reinicia la copia, y tras
+`MAX_REINICIOS` reinicios se termina en un solo paso.
+
+Cada respaldo queda en la carpeta de respaldos (RESPALDO_DIR, por defecto
+`instance/respaldos`) como:
+
+    <nombre>.db[.gz]        respaldo completo: la base tal cual, opcionalmente comprimida
+    <nombre>.inc[.gz]       incremental: sólo las páginas que cambiaron desde el anterior
+    <nombre>.paginas        huella (blake2b) de cada página, para calcular el siguiente incremental
+    <nombre>.json           manifiesto: tipo, respaldo base, sha256 y filas por tabla
+
+El manifiesto se escribe al final: un respaldo interrumpido no tiene
+manifiesto y se ignora. Un incremental se calcula sobre una copia
+consistente (la misma API de backup) comparando página por página con las
+huellas del respaldo anterior; no depende de que el WAL conserve sus
+frames, que la aplicación checkpointea sola.
+
+`restaurar` reconstruye la cadena (el completo más sus incrementales) en un
+archivo temporal y lo verifica antes de tocar nada: sha256 igual al del
+manifiesto, `PRAGMA integrity_check` y las mismas filas por tabla. Después
+lo deja en otra ruta o lo copia sobre la base activa con la misma API de
+backup, y sube las versiones de `version_tabla` por encima de las que había
+para que ninguna caché sirva páginas de antes de la restauración.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cache_respuestas
+
+PAGINAS = 256
+MAX_REINICIOS = 3
+DIGESTO = 16
+MAGIA = b'BIBLIOTECA-INCREMENTAL-1\n'
+BUSY_TIMEOUT = 30
+
+Resumen = namedtuple('Resumen', [
+    'nombre', 'tipo', 'bytes', 'archivo_bytes', 'paginas_cambiadas',
+    'segundos', 'pasos', 'paso_max_ms', 'reinicios',
+])
+# Cómo resultó la copia con la API de backup
+Copia = namedtuple('Copia', ['pasos', 'paso_max', 'reinicios'])
+
+
+class DemasiadosReinicios(Exception):
+    pass
+
+
+def carpeta_por_defecto(app):
+    return os.environ.get('RESPALDO_DIR', os.path.join(app.instance_path, 'respaldos'))
+
+
+def _ahora():
+    return datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+
+
+# ---------------------------
+# COPIA EN CALIENTE
+# ---------------------------
+def copiar(ruta_origen, ruta_destino, paginas=PAGINAS, pausa=0.0):
+    """Copia consistente de `ruta_origen` en `ruta_destino` con la API de backup. Devuelve una Copia.
+
+    `pausa` (segundos) se duerme entre pasos para dejar pasar a los escritores
+    con journal clásico.
+    """
+    estado = {'pasos': 0, 'paso_max': 0.0, 'reinicios': 0, 'restantes': None, 'inicio': time.perf_counter()}
+
+    def progreso(status, restantes, total):
+        ahora = time.perf_counter()
+        estado['pasos'] += 1
+        estado['paso_max'] = max(estado['paso_max'], ahora - estado['inicio'])
+        if estado['restantes'] is not None and restantes > estado['restantes']:
+            estado['reinicios'] += 1
+            if estado['reinicios'] > MAX_REINICIOS:
+                raise DemasiadosReinicios()
+        estado['restantes'] = restantes
+        if pausa and restantes:
+            time.sleep(pausa)
+        estado['inicio'] = time.perf_counter()
+
+    origen = sqlite3.connect(ruta_origen, timeout=BUSY_TIMEOUT, isolation_level=None)
+    destino = sqlite3.connect(ruta_destino)
+    try:
+        if origen.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+            # Una transacción de lectura abierta fija la instantánea del WAL: los
+            # pasos leen siempre la misma versión, las escrituras de otras
+            # conexiones no reinician la copia y los escritores no esperan
+            origen.execute('BEGIN')
+            origen.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        try:
+            origen.backup(destino, pages=paginas, progress=progreso)
+        except DemasiadosReinicios:
+            inicio = time.perf_counter()
+            origen.backup(destino)
+            estado['pasos'] += 1
+            estado['paso_max'] = max(estado['paso_max'], time.perf_counter() - inicio)
+        # La copia es un archivo suelto: sin WAL al lado
+        destino.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        destino.close()
+        origen.close()
+    return Copia(estado['pasos'], estado['paso_max'], estado['reinicios'])
+
+
+def huellas(ruta):
+    """(tamaño de página, [huella de cada página], sha256 del archivo)."""
+    with open(ruta, 'rb') as archivo:
+        encabezado = archivo.read(100)
+        tamanio = struct.unpack('>H', encabezado[16:18])[0]
+        tamanio = 65536 if tamanio == 1 else tamanio
+        archivo.seek(0)
+        total = hashlib.sha256()
+        paginas = []
+        while pagina := archivo.read(tamanio):
+            total.update(pagina)
+            paginas.append(hashlib.blake2b(pagina, digest_size=DIGESTO).digest())
+    return tamanio, paginas, total.hexdigest()
+
+
+def conteos(ruta):
+    """{tabla: filas} de las tablas comunes (no las virtuales ni las internas de SQLite)."""
+    conexion = sqlite3.connect(ruta)
+    try:
+        tablas = [nombre for nombre, in conexion.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'
+            ORDER BY name
+        """)]
+        return {tabla: conexion.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0] for tabla in tablas}
+    finally:
+        conexion.close()
+
+
+def _comprobar(ruta, pragma='quick_check'):
+    conexion = sqlite3.connect(ruta)
+    try:
+        resultado = [fila[0] for fila in conexion.execute(f'PRAGMA {pragma}')]
+    finally:
+        conexion.close()
+    if resultado != ['ok']:
+        raise RuntimeError(f'{ruta}: {pragma} falló: {"; ".join(resultado[:5])}')
+
+
+# ---------------------------
+# MANIFIESTOS
+# ---------------------------
+def listar(carpeta):
+    """Manifiestos de los respaldos terminados, del más viejo al más nuevo."""
+    carpeta = Path(carpeta)
+    if not carpeta.is_dir():
+        return []
+    manifiestos = [json.loads(ruta.read_text()) for ruta in carpeta.glob('*.json')]
+    return sorted(manifiestos, key=lambda m: (m['fecha'], m['nombre']))
+
+
+def cadena(carpeta, nombre=None):
+    """[completo, incremental, ...] necesarios para reconstruir `nombre` (por defecto, el último)."""
+    manifiestos = listar(carpeta)
+    if not manifiestos:
+        raise RuntimeError(f'No hay respaldos en {carpeta}')
+    por_nombre = {m['nombre']: m for m in manifiestos}
+    if nombre is None:
+        nombre = manifiestos[-1]['nombre']
+    elif nombre not in por_nombre:
+        raise RuntimeError(f'No existe el respaldo {nombre}')
+    resultado = [por_nombre[nombre]]
+    while resultado[-1]['base']:
+        base = resultado[-1]['base']
+        if base not in por_nombre:
+            raise RuntimeError(f'Falta el respaldo {base}, base de {resultado[-1]["nombre"]}')
+        resultado.append(por_nombre[base])
+    return resultado[::-1]
+
+
+def _abrir(ruta, modo):
+    return gzip.open(ruta, modo, compresslevel=6) if str(ruta).endswith('.gz') else open(ruta, modo)
+
+
+# ---------------------------
+# RESPALDO
+# ---------------------------
+def respaldar(ruta_origen, carpeta, incremental=False, comprimir=False, paginas=PAGINAS, pausa=0.0,
+              progreso=print):
+    """Hace un respaldo completo o incremental de `ruta_origen` en `carpeta`. Devuelve un Resumen."""
+    carpeta = Path(carpeta)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    anteriores = listar(carpeta) if incremental else []
+    anterior = anteriores[-1] if anteriores else None
+    if incremental and anterior is None:
+        raise RuntimeError('No hay un respaldo anterior: el primero tiene que ser completo')
+    tipo = 'incremental' if incremental else 'completo'
+    fecha = _ahora()
+    nombre = f'{Path(ruta_origen).stem}-{fecha:%Y%m%dT%H%M%S}-{tipo}'
+    if (carpeta / f'{nombre}.json').exists():
+        raise RuntimeError(f'Ya existe el respaldo {nombre}')
+
+    inicio = time.perf_counter()
+    temporal = carpeta / f'{nombre}.tmp'
+    try:
+        copia = copiar(ruta_origen, temporal, paginas, pausa)
+        segundos_copia = time.perf_counter() - inicio
+        progreso(f'Copiado en {copia.pasos} pasos ({copia.reinicios} reinicios)')
+        _comprobar(temporal)
+        tamanio, huellas_nuevas, sha256 = huellas(temporal)
+        filas = conteos(temporal)
+
+        if incremental:
+            previas = (carpeta / f'{anterior["nombre"]}.paginas').read_bytes()
+            previas = [previas[i:i + DIGESTO] for i in range(0, len(previas), DIGESTO)]
+            if tamanio != anterior['tamanio_pagina']:
+                raise RuntimeError('Cambió el tamaño de página: hace falta un respaldo completo')
+            cambiadas = [
+                numero for numero, huella in enumerate(huellas_nuevas)
+                if numero >= len(previas) or huella != previas[numero]
+            ]
+            archivo = carpeta / f'{nombre}.inc{".gz" if comprimir else ""}'
+            with open(temporal, 'rb') as base, _abrir(archivo, 'wb') as salida:
+                salida.write(MAGIA + struct.pack('>II', tamanio, len(huellas_nuevas)))
+                for numero in cambiadas:
+                    base.seek(numero * tamanio)
+                    salida.write(struct.pack('>I', numero) + base.read(tamanio))
+        else:
+            cambiadas = range(len(huellas_nuevas))
+            archivo = carpeta / f'{nombre}.db{".gz" if comprimir else ""}'
+            if comprimir:
+                with open(temporal, 'rb') as base, _abrir(archivo, 'wb') as salida:
+                    shutil.copyfileobj(base, salida, 1024 * 1024)
+            else:
+                temporal.rename(archivo)
+    finally:
+        temporal.unlink(missing_ok=True)
+
+    (carpeta / f'{nombre}.paginas').write_bytes(b''.join(huellas_nuevas))
+    (carpeta / f'{nombre}.json').write_text(json.dumps({
+        'nombre': nombre,
+        'tipo': tipo,
+        'base': anterior['nombre'] if anterior else None,
+        'fecha': fecha.isoformat(),
+        'archivo': archivo.name,
+        'tamanio_pagina': tamanio,
+        'paginas': len(huellas_nuevas),
+        'paginas_cambiadas': len(cambiadas),
+        'sha256': sha256,
+        'conteos': filas,
+    }, indent=2, ensure_ascii=False))
+    return Resumen(
+        nombre, tipo, tamanio * len(huellas_nuevas), archivo.stat().st_size, len(cambiadas),
+        segundos_copia, copia.pasos, copia.paso_max * 1000, copia.reinicios,
+    )
+
+
+# ---------------------------
+# RESTAURACIÓN
+# ---------------------------
+def _aplicar_incremental(ruta, archivo):
+    with _abrir(archivo, 'rb') as entrada, open(ruta, 'r+b') as base:
+        if entrada.read(len(MAGIA)) != MAGIA:
+            raise RuntimeError(f'{archivo} no es un respaldo incremental')
+        tamanio, total = struct.unpack('>II', entrada.read(8))
+        while numero := entrada.read(4):
+            pagina = entrada.read(tamanio)
+            if len(numero) < 4 or len(pagina) < tamanio:
+                raise RuntimeError(f'{archivo} está truncado')
+            base.seek(struct.unpack('>I', numero)[0] * tamanio)
+            base.write(pagina)
+        base.truncate(total * tamanio)
+
+
+def reconstruir(carpeta, nombre, ruta_salida):
+    """Arma en `ruta_salida` la base del respaldo `nombre` y la verifica. Devuelve su manifiesto."""
+    carpeta = Path(carpeta)
+    manifiestos = cadena(carpeta, nombre)
+    with _abrir(carpeta / manifiestos[0]['archivo'], 'rb') as entrada, open(ruta_salida, 'wb') as salida:
+        shutil.copyfileobj(entrada, salida, 1024 * 1024)
+    for manifiesto in manifiestos[1:]:
+        _aplicar_incremental(ruta_salida, carpeta / manifiesto['archivo'])
+
+    ultimo = manifiestos[-1]
+    _, _, sha256 = huellas(ruta_salida)
+    if sha256 != ultimo['sha256']:
+        raise RuntimeError(f'{ultimo["nombre"]}: el sha256 no coincide con el del manifiesto')
+    _comprobar(ruta_salida, 'integrity_check')
+    filas = conteos(ruta_salida)
+    if filas != ultimo['conteos']:
+        distintas = sorted(t for t in {*filas, *ultimo['conteos']} if filas.get(t) != ultimo['conteos'].get(t))
+        raise RuntimeError(f'{ultimo["nombre"]}: filas distintas en {", ".join(distintas)}')
+    return ultimo
+
+
+def _versiones(conexion):
+    try:
+        return dict(conexion.execute('SELECT tabla, version FROM version_tabla'))
+    except sqlite3.OperationalError:
+        return {}
+
+
+def restaurar(carpeta, nombre=None, ruta_destino=None, ruta_base=None):
+    """Verifica el respaldo `nombre` y lo deja en `ruta_destino` o sobre la base activa `ruta_base`.
+
+    Devuelve el manifiesto restaurado. Sin ninguna de las dos rutas sólo verifica.
+    """
+    carpeta = Path(carpeta)
+    temporal = carpeta / 'restauracion.tmp'
+    try:
+        manifiesto = reconstruir(carpeta, nombre, temporal)
+        if ruta_destino:
+            if Path(ruta_destino).exists():
+                raise RuntimeError(f'{ruta_destino} ya existe')
+            shutil.move(temporal, ruta_destino)
+        elif ruta_base:
+            origen = sqlite3.connect(temporal)
+            activa = sqlite3.connect(ruta_base, timeout=BUSY_TIMEOUT)
+            try:
+                anteriores = _versiones(activa)
+                origen.backup(activa)
+                # Versiones por encima de las de antes y de las restauradas: ninguna caché coincide
+                restauradas = _versiones(activa)
+                ahora = _ahora().isoformat(sep=' ')
+                with activa:
+                    activa.executemany(
+                        'INSERT INTO version_tabla (tabla, version, modificado) VALUES (?, ?, ?) '
+                        'ON CONFLICT (tabla) DO UPDATE SET version = excluded.version, modificado = excluded.modificado',
+                        [
+                            (tabla, max(anteriores.get(tabla, 0), restauradas.get(tabla, 0)) + 1, ahora)
+                            for tabla in cache_respuestas.TABLAS
+                        ],
+                    )
+            finally:
+                activa.close()
+                origen.close()
+    finally:
+        temporal.unlink(missing_ok=True)
+    return manifiesto
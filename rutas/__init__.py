@@ -0,0 +1,16 @@
+"""Vistas de la aplicación, un blueprint por recurso.
+
+Los endpoints llevan el nombre del blueprint (`libros.listar_libros`,
+`api.libros`...). Ningún módulo hace consultas al importarse.
+"""
+from rutas import api, autores, consultas, libros, prestamos, reservas, sistema, usuarios
+
+BLUEPRINTS = (
+    libros.bp, autores.bp, usuarios.bp, prestamos.bp, reservas.bp,
+    consultas.bp, api.bp, sistema.bp,
+)
+
+
+def registrar(app):
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
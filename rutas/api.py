@@ -0,0 +1,188 @@
+"""API JSON (v1).
+
+Cada recurso declara sus campos (columna y JOIN que necesita), los campos por
+defecto y las claves del cursor. `?fields=` elige las columnas del SELECT y
+sólo agrega los JOIN de esos campos; `?ids=` trae varios registros en una
+consulta. Los listados usan los mismos filtros y la misma paginación por
+clave que las páginas HTML: una página del catálogo es una sola consulta.
+"""
+import json
+from collections import namedtuple
+from datetime import date
+
+from flask import Blueprint, current_app, jsonify, request
+
+import cache_respuestas
+import configuracion
+from database import db
+from models import Autor, Libro, Prestamo, Usuario
+from paginacion import MAX_POR_PAGINA, paginar_keyset
+from rutas.prestamos import ESTADOS_PRESTAMO, filtrar_prestamos
+
+API_PREFIJO = '/api/v1'
+
+bp = Blueprint('api', __name__, url_prefix=API_PREFIJO)
+
+RecursoApi = namedtuple('RecursoApi', ['modelo', 'campos', 'por_defecto', 'claves', 'descendente'])
+
+UNIR_AUTOR = (Autor, Libro.autor_id == Autor.id)
+UNIR_LIBRO = (Libro, Prestamo.libro_id == Libro.id)
+UNIR_USUARIO = (Usuario, Prestamo.usuario_id == Usuario.id)
+
+def _campos(modelo, nombres, **unidos):
+    campos = {nombre: (getattr(modelo, nombre), None) for nombre in nombres}
+    campos.update(unidos)
+    return campos
+
+RECURSOS_API = {
+    'libros': RecursoApi(
+        Libro,
+        _campos(Libro, ['id', 'titulo', 'genero', 'anio_publicacion', 'autor_id'],
+                autor=(Autor.nombre, UNIR_AUTOR)),
+        ('id', 'titulo', 'genero', 'anio_publicacion', 'autor_id', 'autor'),
+        (Libro.titulo, Libro.id), False,
+    ),
+    'autores': RecursoApi(
+        Autor, _campos(Autor, ['id', 'nombre', 'nacionalidad']),
+        ('id', 'nombre', 'nacionalidad'), (Autor.id,), False,
+    ),
+    'usuarios': RecursoApi(
+        Usuario, _campos(Usuario, ['id', 'nombre', 'email', 'telefono', 'rol']),
+        ('id', 'nombre', 'email', 'telefono', 'rol'), (Usuario.id,), False,
+    ),
+    'prestamos': RecursoApi(
+        Prestamo,
+        _campos(Prestamo, ['id', 'libro_id', 'usuario_id', 'fecha_prestamo', 'fecha_devolucion', 'devuelto'],
+                libro=(Libro.titulo, UNIR_LIBRO), usuario=(Usuario.nombre, UNIR_USUARIO)),
+        ('id', 'fecha_prestamo', 'fecha_devolucion', 'devuelto', 'libro_id', 'libro', 'usuario_id', 'usuario'),
+        (Prestamo.fecha_prestamo, Prestamo.id), True,
+    ),
+}
+
+class ErrorApi(Exception):
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.estado = estado
+
+@bp.errorhandler(ErrorApi)
+def responder_error_api(error):
+    return jsonify({'error': str(error)}), error.estado
+
+def respuesta_json(cuerpo):
+    """JSON compacto; las fechas salen en ISO 8601."""
+    return current_app.response_class(
+        json.dumps(cuerpo, ensure_ascii=False, separators=(',', ':'), default=str),
+        mimetype='application/json',
+    )
+
+def leer_lista(nombre, convertir=str):
+    valor = request.args.get(nombre)
+    if not valor:
+        return None
+    try:
+        return list(dict.fromkeys(convertir(v.strip()) for v in valor.split(',') if v.strip()))
+    except ValueError:
+        raise ErrorApi(f'Valor inválido en {nombre}')
+
+def leer_fecha(nombre):
+    # request.args.get(type=...) se traga el ValueError y devuelve None: se convierte aquí
+    valor = request.args.get(nombre)
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ErrorApi(f'Fecha inválida en {nombre}: use AAAA-MM-DD')
+
+def consulta_api(recurso, campos):
+    """SELECT de `campos` (más las claves del cursor) con sólo los JOIN necesarios."""
+    desconocidos = [c for c in campos if c not in recurso.campos]
+    if desconocidos:
+        raise ErrorApi(
+            f"Campos desconocidos: {', '.join(desconocidos)}. Disponibles: {', '.join(recurso.campos)}"
+        )
+    columnas = [recurso.campos[c][0].label(c) for c in campos]
+    columnas += [clave.label(clave.key) for clave in recurso.claves if clave.key not in campos]
+    consulta = db.session.query(*columnas).select_from(recurso.modelo)
+    unidos = []
+    for c in campos:
+        union = recurso.campos[c][1]
+        if union is not None and union not in unidos:
+            unidos.append(union)
+            consulta = consulta.join(*union)
+    return consulta
+
+def serializar_api(filas, campos):
+    n = len(campos)
+    return [dict(zip(campos, fila[:n])) for fila in filas]
+
+def usuarios_activos(consulta):
+    # Los dados de baja quedan sólo para el historial de préstamos
+    return consulta.filter(Usuario.baja.is_(None))
+
+def listar_api(nombre, filtrar=None):
+    recurso = RECURSOS_API[nombre]
+    campos = leer_lista('fields') or list(recurso.por_defecto)
+    ids = leer_lista('ids', int)
+    consulta = consulta_api(recurso, campos)
+    if filtrar:
+        consulta = filtrar(consulta)
+    if ids is not None:
+        if len(ids) > MAX_POR_PAGINA:
+            raise ErrorApi(f'Como máximo {MAX_POR_PAGINA} ids por pedido')
+        # Se responde en el orden pedido; los que no existen se informan aparte
+        filas = consulta.add_columns(recurso.modelo.id.label('clave_api')).filter(recurso.modelo.id.in_(ids))
+        por_id = {fila[-1]: fila for fila in filas}
+        return respuesta_json({
+            'datos': serializar_api([por_id[i] for i in ids if i in por_id], campos),
+            'no_encontrados': [i for i in ids if i not in por_id],
+        })
+    pagina = paginar_keyset(consulta, list(recurso.claves), recurso.descendente)
+    return respuesta_json({
+        'datos': serializar_api(pagina.filas, campos),
+        'anterior': pagina.anterior,
+        'siguiente': pagina.siguiente,
+        'por_pagina': pagina.por_pagina,
+    })
+
+@bp.route('/libros')
+@configuracion.solo_lectura
+@cache_respuestas.cacheada('libro', 'autor')
+def libros():
+    return listar_api('libros')
+
+@bp.route('/autores')
+@configuracion.solo_lectura
+@cache_respuestas.cacheada('autor')
+def autores():
+    return listar_api('autores')
+
+@bp.route('/usuarios')
+@configuracion.solo_lectura
+@cache_respuestas.cacheada('usuario')
+def usuarios():
+    return listar_api('usuarios', usuarios_activos)
+
+@bp.route('/prestamos')
+@configuracion.solo_lectura
+def prestamos():
+    # Sin caché, como /prestamos: "vencidos" depende de la fecha de hoy
+    desde = leer_fecha('desde')
+    hasta = leer_fecha('hasta')
+    estado = request.args.get('estado')
+    if estado and estado not in ESTADOS_PRESTAMO:
+        raise ErrorApi(f"Estado inválido. Opciones: {', '.join(ESTADOS_PRESTAMO)}")
+    return listar_api('prestamos', lambda consulta: filtrar_prestamos(consulta, estado, desde, hasta, date.today()))
+
+@bp.route('/<any(libros, autores, usuarios, prestamos):recurso>/<int:registro_id>')
+@configuracion.solo_lectura
+def obtener(recurso, registro_id):
+    campos = leer_lista('fields') or list(RECURSOS_API[recurso].por_defecto)
+    modelo = RECURSOS_API[recurso].modelo
+    consulta = consulta_api(RECURSOS_API[recurso], campos).filter(modelo.id == registro_id)
+    if recurso == 'usuarios':
+        consulta = usuarios_activos(consulta)
+    fila = consulta.first()
+    if fila is None:
+        raise ErrorApi('No encontrado', 404)
+    return respuesta_json(serializar_api([fila], campos)[0])
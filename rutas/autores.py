@@ -0,0 +1,46 @@
+from flask import Blueprint, jsonify, redirect, render_template, request, url_for
+
+import cache_respuestas
+import configuracion
+import eliminacion
+import funciones
+from database import db
+from models import Autor
+
+bp = Blueprint('autores', __name__)
+
+
+@bp.route('/autores')
+@configuracion.solo_lectura
+@cache_respuestas.cacheada('autor')
+def listar_autores():
+    autores = Autor.query.all()
+    return render_template('autores.html', autores=autores)
+
+@bp.route('/autores/crear', methods=['GET', 'POST'])
+def crear_autor():
+    if request.method == 'POST':
+        funciones.crear_autor(db.session, request.form['nombre'], request.form['nacionalidad'])
+        db.session.commit()
+        return redirect(url_for('.listar_autores'))
+    return render_template('crear_autor.html')
+
+@bp.route('/autores/editar/<int:autor_id>', methods=['GET', 'POST'])
+def editar_autor(autor_id):
+    autor = Autor.query.get_or_404(autor_id)
+    if request.method == 'POST':
+        autor.nombre = request.form['nombre']
+        autor.nacionalidad = request.form['nacionalidad']
+        db.session.commit()
+        return redirect(url_for('.listar_autores'))
+    return render_template('editar_autor.html', autor=autor)
+
+@bp.route('/autores/eliminar/<int:autor_id>')
+def eliminar_autor(autor_id):
+    """Elimina el autor con sus libros; con ?simular=1 sólo informa cuántas filas se borrarían."""
+    Autor.query.get_or_404(autor_id)
+    if request.args.get('simular'):
+        return jsonify(eliminacion.contar(db.session, 'autor', [autor_id]))
+    funciones.eliminar_autor(db.session, autor_id)
+    db.session.commit()
+    return redirect(url_for('.listar_autores'))
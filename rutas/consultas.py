@@ -0,0 +1,109 @@
+"""Rankings, estadísticas de circulación, búsqueda de texto completo y autocompletado."""
+from datetime import date
+
+from flask import Blueprint, jsonify, render_template, request
+
+import busqueda
+import cache_respuestas
+import circulacion
+import configuracion
+import estadisticas
+from database import db
+from paginacion import leer_por_pagina
+
+bp = Blueprint('consultas', __name__)
+
+
+@bp.route('/autor/mas-libros')
+@configuracion.solo_lectura
+@cache_respuestas.cacheada('autor', 'libro')
+def autor_mas_libros():
+    resultado = next(iter(estadisticas.top_autores(db.session, 1)), None)
+    autor = type('AutorStats', (object,), {})()
+    autor.nombre = resultado.nombre if resultado else None
+    autor.total_libros = resultado.total_libros if resultado else 0
+    return render_template('autor_mas_libros.html', autor=autor)
+
+def leer_top_n():
+    return max(1, min(request.args.get('n', 10, type=int), 100))
+
+@bp.route('/ranking/autores')
+@configuracion.solo_lectura
+@cache_respuestas.cacheada('autor', 'libro')
+def ranking_autores():
+    filas = estadisticas.top_autores(db.session, leer_top_n())
+    return jsonify([{'id': f.id, 'nombre': f.nombre, 'total_libros': f.total_libros} for f in filas])
+
+@bp.route('/ranking/libros')
+@configuracion.solo_lectura
+@cache_respuestas.cacheada('libro', 'prestamo')
+def ranking_libros():
+    filas = estadisticas.top_libros(db.session, leer_top_n())
+    return jsonify([{'id': f.id, 'titulo': f.titulo, 'total_prestamos': f.total_prestamos} for f in filas])
+
+def leer_periodo():
+    """[desde, hasta] pedidos; por defecto, los últimos doce meses contando el actual."""
+    hasta = request.args.get('hasta', type=date.fromisoformat) or date.today()
+    desde = request.args.get('desde', type=date.fromisoformat)
+    if desde is None:
+        desde = date(hasta.year, 1, 1) if hasta.month == 12 else date(hasta.year - 1, hasta.month + 1, 1)
+    return desde, hasta
+
+def resumen_circulacion():
+    # Sólo lee los agregados diarios, nunca `prestamo`
+    desde, hasta = leer_periodo()
+    n = leer_top_n()
+
+    def filas(nombre):
+        return [
+            {'valor': f.valor, 'prestamos': f.prestamos, 'devoluciones': f.devoluciones}
+            for f in circulacion.por_dimension(db.session, nombre, desde, hasta, n)
+        ]
+
+    autores = circulacion.por_dimension(db.session, 'autor', desde, hasta, n)
+    return {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'meses': [
+            {'mes': mes, 'prestamos': prestamos, 'devoluciones': devoluciones}
+            for mes, prestamos, devoluciones in circulacion.por_mes(db.session, desde, hasta)
+        ],
+        'generos': filas('genero'),
+        'autores': [
+            {'id': f.id, 'nombre': f.valor, 'prestamos': f.prestamos, 'devoluciones': f.devoluciones}
+            for f in autores
+        ],
+        'roles': filas('rol'),
+    }
+
+@bp.route('/estadisticas')
+@configuracion.solo_lectura
+def estadisticas_circulacion():
+    return render_template('estadisticas.html', **resumen_circulacion())
+
+@bp.route('/estadisticas.json')
+@configuracion.solo_lectura
+def estadisticas_circulacion_json():
+    return jsonify(resumen_circulacion())
+
+@bp.route('/buscar')
+@configuracion.solo_lectura
+def buscar():
+    termino = request.args.get('q', '').strip()
+    campo = request.args.get('campo')
+    resultados = busqueda.buscar(
+        db.session, termino, campo=campo,
+        pagina=request.args.get('pagina', 1, type=int),
+        por_pagina=leer_por_pagina(),
+    )
+    return render_template(
+        'buscar.html', termino=termino, campo=campo,
+        campos=busqueda.CAMPOS, resultados=resultados,
+    )
+
+@bp.route('/autocompletar/<any(libros, autores, usuarios):tipo>')
+@configuracion.solo_lectura
+def autocompletar(tipo):
+    n = max(1, min(request.args.get('n', 10, type=int), 50))
+    filas = busqueda.autocompletar(db.session, tipo, request.args.get('q', ''), n)
+    return jsonify([{'id': f.id, 'texto': f.texto} for f in filas])
@@ -0,0 +1,104 @@
+from flask import Blueprint, abort, jsonify, redirect, render_template, request, url_for
+
+import cache_respuestas
+import configuracion
+import disponibilidad
+import eliminacion
+import funciones
+import recomendaciones
+from database import db
+from models import Autor, Libro
+from paginacion import paginar_keyset
+from rutas.lote import operacion_lote
+
+bp = Blueprint('libros', __name__)
+
+
+@bp.route('/')
+@bp.route('/libros')
+@configuracion.solo_lectura
+@cache_respuestas.cacheada('libro', 'autor')
+def listar_libros():
+    consulta = (
+        db.session.query(
+            Libro.id, Libro.titulo, Libro.genero, Libro.anio_publicacion,
+            Autor.nombre.label('autor'),
+        )
+        .join(Autor, Libro.autor_id == Autor.id)
+    )
+    pagina = paginar_keyset(consulta, [Libro.titulo, Libro.id])
+    return render_template('libros.html', libros=pagina.filas, pagina=pagina)
+
+@bp.route('/libros/crear', methods=['GET', 'POST'])
+def crear_libro():
+    if request.method == 'POST':
+        funciones.crear_libro(
+            db.session,
+            titulo=request.form['titulo'],
+            genero=request.form['genero'],
+            anio=request.form.get('anio_publicacion', type=int),
+            autor_id=request.form.get('autor_id', type=int),
+            ejemplares=max(request.form.get('ejemplares', 1, type=int), 0),
+        )
+        db.session.commit()
+        return redirect(url_for('.listar_libros'))
+    return render_template('crear_libro.html')
+
+@bp.route('/libros/editar/<int:libro_id>', methods=['GET', 'POST'])
+def editar_libro(libro_id):
+    libro = Libro.query.get_or_404(libro_id)
+    existencias = disponibilidad.consultar(db.session, libro_id)
+    error = None
+    if request.method == 'POST':
+        libro.titulo = request.form['titulo']
+        libro.genero = request.form['genero']
+        libro.anio_publicacion = request.form['anio_publicacion']
+        libro.autor_id = request.form['autor_id']
+        ejemplares = request.form.get('ejemplares', type=int)
+        if ejemplares is not None and existencias and ejemplares != existencias.ejemplares:
+            if ejemplares < 0 or not disponibilidad.fijar_ejemplares(db.session, libro_id, ejemplares):
+                error = 'No se pueden dejar menos ejemplares que los prestados o apartados.'
+        if error is None:
+            db.session.commit()
+            return redirect(url_for('.listar_libros'))
+        db.session.rollback()
+    return render_template(
+        'editar_libro.html', libro=libro, existencias=existencias, error=error,
+        similares=recomendaciones.similares(db.session, libro_id, 5),
+    )
+
+@bp.route('/libros/<int:libro_id>/disponibilidad')
+@configuracion.solo_lectura
+def disponibilidad_libro(libro_id):
+    existencias = disponibilidad.consultar(db.session, libro_id)
+    if existencias is None:
+        abort(404)
+    return jsonify(existencias._asdict())
+
+@bp.route('/libros/<int:libro_id>/similares')
+@configuracion.solo_lectura
+def similares_libro(libro_id):
+    """Los libros que más piden los lectores de este, precalculados por `flask recomendaciones`."""
+    n = min(max(request.args.get('n', recomendaciones.K, type=int), 1), recomendaciones.K)
+    filas = recomendaciones.similares(db.session, libro_id, n)
+    if not filas and db.session.get(Libro, libro_id) is None:
+        abort(404)
+    return jsonify({'libro_id': libro_id, 'similares': [fila._asdict() for fila in filas]})
+
+@bp.route('/libros/eliminar/<int:libro_id>')
+def eliminar_libro(libro_id):
+    """Elimina el libro con sus préstamos; con ?simular=1 sólo informa cuántas filas se borrarían."""
+    Libro.query.get_or_404(libro_id)
+    if request.args.get('simular'):
+        return jsonify(eliminacion.contar(db.session, 'libro', [libro_id]))
+    funciones.eliminar_libro(db.session, libro_id)
+    db.session.commit()
+    return redirect(url_for('.listar_libros'))
+
+@bp.route('/libros/retirar', methods=['GET', 'POST'])
+def retirar_libros():
+    return operacion_lote(
+        funciones.retirar_libros, 'Retirar libros',
+        'Ids de los libros a eliminar. Los que tienen préstamos registrados no se eliminan.',
+        url_for('.listar_libros'),
+    )
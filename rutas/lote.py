@@ -0,0 +1,54 @@
+"""Operaciones de mostrador sobre muchos ids (devolución por lote, retiro de libros)."""
+from collections import Counter
+
+from flask import abort, jsonify, render_template, request
+
+import funciones
+from database import db
+
+MAX_LOTE = 50000
+
+ETIQUETAS_LOTE = {
+    funciones.DEVUELTO: ('Devuelto', 'success'),
+    funciones.ELIMINADO: ('Eliminado', 'success'),
+    funciones.YA_DEVUELTO: ('Ya estaba devuelto', 'secondary'),
+    funciones.CON_PRESTAMOS: ('Tiene préstamos', 'warning'),
+    funciones.NO_EXISTE: ('No existe', 'danger'),
+}
+
+
+def ids_del_pedido():
+    """Ids de un JSON {"ids": [...]} o del campo `ids` del formulario (una lectura por línea)."""
+    if request.is_json:
+        valores = (request.get_json(silent=True) or {}).get('ids')
+        if not isinstance(valores, list):
+            abort(400, 'Se esperaba {"ids": [...]}')
+        ids = [v for v in valores if isinstance(v, int) and not isinstance(v, bool)]
+        invalidos = [str(v) for v in valores if not (isinstance(v, int) and not isinstance(v, bool))]
+        ids = list(dict.fromkeys(ids))
+    else:
+        ids, invalidos = funciones.leer_ids(request.form.get('ids', ''))
+    if len(ids) > MAX_LOTE:
+        abort(413, f'Como máximo {MAX_LOTE} ids por lote')
+    return ids, invalidos
+
+
+def operacion_lote(operacion, titulo, ayuda, volver):
+    """Formulario (GET) y ejecución (POST) de una operación de mostrador sobre muchos ids."""
+    contexto = {'titulo': titulo, 'ayuda': ayuda, 'volver': volver, 'etiquetas': ETIQUETAS_LOTE}
+    if request.method == 'GET':
+        return render_template('operacion_lote.html', **contexto)
+    ids, invalidos = ids_del_pedido()
+    # Una transacción para todo el lote: o se aplican todos o ninguno
+    resultados = operacion(db.session, ids)
+    db.session.commit()
+    resumen = dict(Counter(resultados.values()))
+    if request.is_json:
+        return jsonify({
+            'resultados': [{'id': i, 'resultado': r} for i, r in resultados.items()],
+            'invalidos': invalidos,
+            'resumen': resumen,
+        })
+    return render_template(
+        'operacion_lote.html', resultados=resultados, invalidos=invalidos, resumen=resumen, **contexto,
+    )
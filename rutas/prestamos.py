@@ -0,0 +1,117 @@
+from datetime import date
+
+from flask import Blueprint, abort, redirect, render_template, request, url_for
+
+import configuracion
+import disponibilidad
+import funciones
+from database import db
+from models import Libro, Prestamo, PrestamoVencido, Usuario, UsuarioVencidos
+from paginacion import paginar_keyset
+from rutas.lote import operacion_lote
+
+bp = Blueprint('prestamos', __name__)
+
+ESTADOS_PRESTAMO = ('pendientes', 'devueltos', 'vencidos')
+
+
+def filtrar_prestamos(consulta, estado, desde, hasta, hoy):
+    """Filtros de estado y rango de fechas de préstamo, compartidos por /prestamos y la API."""
+    if estado == 'pendientes':
+        consulta = consulta.filter(Prestamo.devuelto == False)
+    elif estado == 'devueltos':
+        consulta = consulta.filter(Prestamo.devuelto == True)
+    elif estado == 'vencidos':
+        consulta = consulta.filter(Prestamo.devuelto == False, Prestamo.fecha_devolucion < hoy)
+    if desde:
+        consulta = consulta.filter(Prestamo.fecha_prestamo >= desde)
+    if hasta:
+        consulta = consulta.filter(Prestamo.fecha_prestamo <= hasta)
+    return consulta
+
+@bp.route('/prestamos')
+@configuracion.solo_lectura
+def listar_prestamos():
+    hoy = date.today()
+    estado = request.args.get('estado')
+    desde = request.args.get('desde', type=date.fromisoformat)
+    hasta = request.args.get('hasta', type=date.fromisoformat)
+    consulta = (
+        db.session.query(
+            Prestamo.id, Prestamo.fecha_prestamo, Prestamo.fecha_devolucion, Prestamo.devuelto,
+            Libro.titulo.label('libro'), Usuario.nombre.label('usuario'),
+        )
+        .join(Libro, Prestamo.libro_id == Libro.id)
+        .join(Usuario, Prestamo.usuario_id == Usuario.id)
+    )
+    consulta = filtrar_prestamos(consulta, estado, desde, hasta, hoy)
+    # Los más recientes primero; el cursor es (fecha_prestamo, id)
+    pagina = paginar_keyset(consulta, [Prestamo.fecha_prestamo, Prestamo.id], descendente=True)
+    return render_template(
+        'prestamos.html', prestamos=pagina.filas, pagina=pagina, hoy=hoy,
+        estado=estado, estados=ESTADOS_PRESTAMO, desde=desde, hasta=hasta,
+    )
+
+@bp.route('/prestamos/crear', methods=['GET', 'POST'])
+def crear_prestamo():
+    if request.method == 'POST':
+        libro_id = request.form.get('libro_id', type=int)
+        usuario_id = request.form.get('usuario_id', type=int)
+        fecha_prestamo = request.form.get('fecha_prestamo', type=date.fromisoformat)
+        if libro_id is None or usuario_id is None or fecha_prestamo is None:
+            abort(400, 'Faltan el libro, el usuario o la fecha del préstamo')
+        try:
+            funciones.registrar_prestamo(
+                db.session, libro_id, usuario_id, fecha_prestamo,
+                request.form.get('fecha_devolucion', type=date.fromisoformat),
+            )
+        except disponibilidad.SinEjemplares:
+            db.session.rollback()
+            # Sin ejemplares libres: se ofrece reservar
+            return render_template(
+                'crear_prestamo.html', sin_ejemplares=True, libro_id=libro_id, usuario_id=usuario_id,
+            ), 409
+        except disponibilidad.UsuarioDeBaja as error:
+            db.session.rollback()
+            return render_template('crear_prestamo.html', error=str(error)), 409
+        db.session.commit()
+        return redirect(url_for('.listar_prestamos'))
+    return render_template('crear_prestamo.html')
+
+@bp.route('/prestamos/devolver/<int:prestamo_id>')
+def marcar_devueltos(prestamo_id):
+    if not funciones.marcar_devolucion(db.session, prestamo_id):
+        # Ya estaba devuelto (o no existe): no hay ejemplar que liberar
+        db.get_or_404(Prestamo, prestamo_id)
+    db.session.commit()
+    return redirect(url_for('.listar_prestamos'))
+
+@bp.route('/prestamos/devolver', methods=['GET', 'POST'])
+def devolver_prestamos():
+    return operacion_lote(
+        funciones.devolver_lote, 'Devolución por lote',
+        'Ids de los préstamos, uno por línea (se pueden leer con el lector de códigos de barras).',
+        url_for('.listar_prestamos'),
+    )
+
+@bp.route('/prestamos/vencidos')
+@configuracion.solo_lectura
+def usuarios_con_prestamos_vencidos():
+    # Lee la tabla precalculada; no recorre el historial de préstamos
+    consulta = (
+        db.session.query(
+            PrestamoVencido.prestamo_id, PrestamoVencido.fecha_devolucion,
+            Usuario.nombre.label('usuario'), Usuario.email, UsuarioVencidos.total,
+            Libro.titulo.label('libro'),
+        )
+        .join(Usuario, PrestamoVencido.usuario_id == Usuario.id)
+        .join(UsuarioVencidos, PrestamoVencido.usuario_id == UsuarioVencidos.usuario_id)
+        .join(Prestamo, PrestamoVencido.prestamo_id == Prestamo.id)
+        .join(Libro, Prestamo.libro_id == Libro.id)
+    )
+    usuario_id = request.args.get('usuario_id', type=int)
+    if usuario_id:
+        consulta = consulta.filter(PrestamoVencido.usuario_id == usuario_id)
+    # Los que vencieron hace más tiempo primero; el cursor es (fecha_devolucion, prestamo_id)
+    pagina = paginar_keyset(consulta, [PrestamoVencido.fecha_devolucion, PrestamoVencido.prestamo_id])
+    return render_template('prestamos_vencidos.html', vencidos=pagina.filas, pagina=pagina)
@@ -0,0 +1,50 @@
+from flask import Blueprint, abort, redirect, render_template, request, url_for
+
+import configuracion
+import disponibilidad
+from database import db
+from models import Libro, Reserva, Usuario
+from paginacion import paginar_keyset
+
+bp = Blueprint('reservas', __name__)
+
+
+@bp.route('/reservas')
+@configuracion.solo_lectura
+def listar_reservas():
+    consulta = (
+        db.session.query(
+            Reserva.id, Reserva.libro_id, Reserva.creada, Reserva.lista_desde, Reserva.estado,
+            Libro.titulo.label('libro'), Usuario.nombre.label('usuario'),
+        )
+        .join(Libro, Reserva.libro_id == Libro.id)
+        .join(Usuario, Reserva.usuario_id == Usuario.id)
+        .filter(Reserva.estado == request.args.get('estado', disponibilidad.PENDIENTE))
+    )
+    # Por orden de llegada, como la cola
+    pagina = paginar_keyset(consulta, [Reserva.id])
+    return render_template(
+        'reservas.html', reservas=pagina.filas, pagina=pagina,
+        estado=request.args.get('estado', disponibilidad.PENDIENTE), estados=disponibilidad.ACTIVAS,
+    )
+
+@bp.route('/reservas/crear', methods=['POST'])
+def crear_reserva():
+    libro_id = request.form.get('libro_id', type=int)
+    usuario_id = request.form.get('usuario_id', type=int)
+    if libro_id is None or usuario_id is None:
+        abort(400, 'Faltan el libro o el usuario')
+    try:
+        disponibilidad.reservar(db.session, libro_id, usuario_id)
+    except disponibilidad.ReservaInvalida as error:
+        db.session.rollback()
+        abort(409, str(error))
+    db.session.commit()
+    return redirect(url_for('.listar_reservas'))
+
+@bp.route('/reservas/cancelar/<int:reserva_id>')
+def cancelar_reserva(reserva_id):
+    if not disponibilidad.cancelar_reserva(db.session, reserva_id):
+        db.get_or_404(Reserva, reserva_id)
+    db.session.commit()
+    return redirect(url_for('.listar_reservas'))
@@ -0,0 +1,44 @@
+"""Caché, métricas y exportación."""
+from datetime import date
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+
+import configuracion
+import exportacion
+import metricas
+import plantillas
+from database import db
+
+bp = Blueprint('sistema', __name__)
+
+
+@bp.route('/cache/estadisticas')
+def estadisticas_cache():
+    return jsonify({
+        **current_app.extensions['cache_respuestas'].estadisticas(),
+        'fragmentos': plantillas.estadisticas(current_app.jinja_env),
+    })
+
+@bp.route('/metrics')
+def exponer_metricas():
+    return Response(current_app.extensions['metricas'].exponer(), content_type=metricas.TIPO_CONTENIDO)
+
+@bp.route('/export/<any(prestamos, libros):tipo>')
+def exportar(tipo):
+    formato = request.args.get('formato', 'csv')
+    if formato not in exportacion.FORMATOS:
+        abort(400, 'Formato no soportado')
+    comprimir = request.args.get('gzip', type=int) == 1
+    cuerpo = exportacion.exportar(
+        configuracion.motor_lectura(db), tipo, formato=formato,
+        desde=request.args.get('desde', type=date.fromisoformat),
+        hasta=request.args.get('hasta', type=date.fromisoformat),
+        gzip=comprimir,
+        historico=request.args.get('historico', type=int) == 1,
+    )
+    nombre = f'{tipo}.{formato}' + ('.gz' if comprimir else '')
+    return Response(
+        stream_with_context(cuerpo),
+        mimetype='application/gzip' if comprimir else exportacion.FORMATOS[formato],
+        headers={'Content-Disposition': f'attachment; filename={nombre}'},
+    )
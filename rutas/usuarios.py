@@ -0,0 +1,75 @@
+from flask import Blueprint, jsonify, redirect, render_template, request, url_for
+from sqlalchemy.exc import IntegrityError
+
+import cache_respuestas
+import configuracion
+import eliminacion
+import funciones
+from database import db
+from models import Usuario
+
+bp = Blueprint('usuarios', __name__)
+
+EMAIL_REPETIDO = 'Ya hay un usuario registrado con ese email.'
+
+
+@bp.route('/usuarios')
+@configuracion.solo_lectura
+@cache_respuestas.cacheada('usuario')
+def listar_usuarios():
+    # Filas y no objetos: cada fila es la clave de su fragmento en la plantilla
+    usuarios = (
+        db.session.query(Usuario.id, Usuario.nombre, Usuario.email, Usuario.telefono, Usuario.rol)
+        .filter(Usuario.baja.is_(None))
+        .all()
+    )
+    return render_template('usuarios.html', usuarios=usuarios)
+
+@bp.route('/usuarios/crear', methods=['GET', 'POST'])
+def crear_usuario():
+    error = None
+    if request.method == 'POST':
+        try:
+            funciones.crear_usuario(
+                db.session,
+                nombre=request.form['nombre'],
+                email=request.form['email'],
+                telefono=request.form['telefono'],
+                rol=request.form['rol'],
+            )
+            db.session.commit()
+            return redirect(url_for('.listar_usuarios'))
+        except IntegrityError:
+            db.session.rollback()
+            error = EMAIL_REPETIDO
+    return render_template('crear_usuario.html', error=error)
+
+@bp.route('/usuarios/editar/<int:usuario_id>', methods=['GET', 'POST'])
+def editar_usuario(usuario_id):
+    usuario = Usuario.query.get_or_404(usuario_id)
+    error = None
+    if request.method == 'POST':
+        usuario.nombre = request.form['nombre']
+        usuario.email = request.form['email']
+        usuario.telefono = request.form['telefono']
+        usuario.rol = request.form['rol']
+        try:
+            db.session.commit()
+            return redirect(url_for('.listar_usuarios'))
+        except IntegrityError:
+            db.session.rollback()
+            error = EMAIL_REPETIDO
+    return render_template('editar_usuario.html', usuario=usuario, error=error)
+
+@bp.route('/usuarios/eliminar/<int:usuario_id>')
+def eliminar_usuario(usuario_id):
+    """Elimina el usuario, o lo da de baja si tiene préstamos registrados.
+
+    Con ?simular=1 sólo informa cuántas filas se borrarían.
+    """
+    Usuario.query.get_or_404(usuario_id)
+    if request.args.get('simular'):
+        return jsonify(eliminacion.contar(db.session, 'usuario', [usuario_id], baja=True))
+    funciones.eliminar_usuario(db.session, usuario_id, baja=True)
+    db.session.commit()
+    return redirect(url_for('.listar_usuarios'))
@@ -0,0 +1,56 @@
+// Campos con autocompletado: un <input data-autocompletar="url" data-destino="id_oculto">
+// consulta la URL mientras se escribe y guarda el id elegido en el campo oculto.
+document.querySelectorAll('[data-autocompletar]').forEach(function (entrada) {
+    var destino = document.getElementById(entrada.dataset.destino);
+    var lista = document.createElement('div');
+    lista.className = 'list-group position-absolute w-100 shadow-sm';
+    lista.style.zIndex = 1000;
+    entrada.parentNode.appendChild(lista);
+    var espera = null;
+    var pedido = 0;
+
+    function validar() {
+        entrada.setCustomValidity(destino.value ? '' : 'Seleccione una opción de la lista');
+    }
+
+    function mostrar(opciones) {
+        lista.innerHTML = '';
+        opciones.forEach(function (opcion) {
+            var boton = document.createElement('button');
+            boton.type = 'button';
+            boton.className = 'list-group-item list-group-item-action';
+            boton.textContent = opcion.texto;
+            boton.addEventListener('mousedown', function (evento) {
+                evento.preventDefault();
+                entrada.value = opcion.texto;
+                destino.value = opcion.id;
+                lista.innerHTML = '';
+                validar();
+            });
+            lista.appendChild(boton);
+        });
+    }
+
+    entrada.addEventListener('input', function () {
+        destino.value = '';
+        validar();
+        clearTimeout(espera);
+        var termino = entrada.value.trim();
+        if (termino.length < 2) {
+            mostrar([]);
+            return;
+        }
+        espera = setTimeout(function () {
+            var numero = ++pedido;
+            fetch(entrada.dataset.autocompletar + '?q=' + encodeURIComponent(termino))
+                .then(function (respuesta) { return respuesta.json(); })
+                .then(function (opciones) {
+                    if (numero === pedido) {
+                        mostrar(opciones);
+                    }
+                });
+        }, 150);
+    });
+    entrada.addEventListener('blur', function () { mostrar([]); });
+    validar();
+});
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Aplicación sobre una base SQLite vacía, con el esquema de `db.create_all()`."""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'biblioteca.db'}")
+    monkeypatch.delenv('DATABASE_REPLICA_URL', raising=False)
+    monkeypatch.setenv('JINJA_CACHE_DIR', '')
+    from app import create_app
+    from database import db
+
+    app = create_app({'TESTING': True})
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def sesion(app):
+    from database import db
+
+    return db.session
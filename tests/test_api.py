@@ -0,0 +1,24 @@
+from datetime import date, timedelta
+
+import funciones
+
+
+def test_prestamos_con_fecha_invalida_responde_400(cliente):
+    respuesta = cliente.get('/api/v1/prestamos?desde=xx')
+
+    assert respuesta.status_code == 400
+    assert 'desde' in respuesta.get_json()['error']
+
+
+def test_prestamos_filtra_por_fecha(cliente, sesion):
+    autor_id, = funciones.crear_autores(sesion, [{'nombre': 'Autora'}])
+    libro_id, = funciones.crear_libros(sesion, [{'titulo': 'Libro', 'autor_id': autor_id, 'ejemplares': 2}])
+    usuario_id = funciones.crear_usuario(sesion, 'Lectora', 'lectora@example.org')
+    hoy = date.today()
+    funciones.registrar_prestamo(sesion, libro_id, usuario_id, hoy - timedelta(days=30), hoy)
+    nuevo = funciones.registrar_prestamo(sesion, libro_id, usuario_id, hoy, hoy + timedelta(days=14))
+    sesion.commit()
+
+    datos = cliente.get(f'/api/v1/prestamos?desde={hoy - timedelta(days=1)}').get_json()['datos']
+
+    assert [p['id'] for p in datos] == [nuevo]
@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+import pytest
+
+import busqueda
+import disponibilidad
+import funciones
+
+
+@pytest.fixture
+def dada_de_baja(sesion):
+    """Una usuaria con historial de préstamos, dada de baja, y otra activa con el mismo nombre."""
+    autor_id, = funciones.crear_autores(sesion, [{'nombre': 'Autora'}])
+    libro_id, = funciones.crear_libros(sesion, [{'titulo': 'Libro', 'autor_id': autor_id}])
+    baja = funciones.crear_usuario(sesion, 'Lectora Antigua', 'antigua@example.org')
+    activa = funciones.crear_usuario(sesion, 'Lectora Nueva', 'nueva@example.org')
+    hoy = date.today()
+    prestamo_id = funciones.registrar_prestamo(sesion, libro_id, baja, hoy, hoy + timedelta(days=14))
+    funciones.marcar_devolucion(sesion, prestamo_id)
+    funciones.eliminar_usuario(sesion, baja, baja=True)
+    sesion.commit()
+    return {'libro_id': libro_id, 'baja': baja, 'activa': activa}
+
+
+def test_la_api_no_lista_usuarios_dados_de_baja(cliente, dada_de_baja):
+    datos = cliente.get('/api/v1/usuarios').get_json()['datos']
+    assert [u['id'] for u in datos] == [dada_de_baja['activa']]
+
+    pedido = cliente.get(f"/api/v1/usuarios?ids={dada_de_baja['baja']}").get_json()
+    assert pedido['datos'] == [] and pedido['no_encontrados'] == [dada_de_baja['baja']]
+
+    assert cliente.get(f"/api/v1/usuarios/{dada_de_baja['baja']}").status_code == 404
+    assert cliente.get(f"/api/v1/usuarios/{dada_de_baja['activa']}").status_code == 200
+
+
+def test_el_autocompletado_no_ofrece_usuarios_dados_de_baja(sesion, dada_de_baja):
+    ids = [fila.id for fila in busqueda.autocompletar(sesion, 'usuarios', 'Lectora')]
+    assert ids == [dada_de_baja['activa']]
+
+
+def test_no_se_presta_a_un_usuario_dado_de_baja(cliente, sesion, dada_de_baja):
+    respuesta = cliente.post('/prestamos/crear', data={
+        'libro_id': dada_de_baja['libro_id'], 'usuario_id': dada_de_baja['baja'],
+        'fecha_prestamo': date.today().isoformat(),
+    })
+
+    assert respuesta.status_code == 409
+    assert 'dado de baja' in respuesta.get_data(as_text=True)
+    assert disponibilidad.consultar(sesion, dada_de_baja['libro_id']).disponibles == 1
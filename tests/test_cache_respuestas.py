@@ -0,0 +1,18 @@
+import funciones
+
+
+def test_solo_el_etag_decide_el_304(cliente, sesion):
+    primera = cliente.get('/usuarios')
+    assert cliente.get('/usuarios', headers={'If-None-Match': primera.headers['ETag']}).status_code == 304
+
+    funciones.crear_usuario(sesion, 'Ana', 'ana@example.org')
+    sesion.commit()
+    anterior = cliente.get('/usuarios')
+
+    # Otra escritura, casi siempre dentro del mismo segundo: Last-Modified no cambia
+    funciones.crear_usuario(sesion, 'Bea', 'bea@example.org')
+    sesion.commit()
+    respuesta = cliente.get('/usuarios', headers={'If-Modified-Since': anterior.headers['Last-Modified']})
+    assert respuesta.status_code == 200
+    assert 'Bea' in respuesta.get_data(as_text=True)
+    assert cliente.get('/usuarios', headers={'If-None-Match': anterior.headers['ETag']}).status_code == 200
@@ -0,0 +1,15 @@
+import pytest
+
+import configuracion
+
+
+def test_rechaza_motores_que_no_son_sqlite(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://biblioteca@localhost/biblioteca')
+    from app import create_app
+
+    with pytest.raises(RuntimeError, match='postgresql'):
+        create_app({'TESTING': True})
+
+
+def test_acepta_sqlite():
+    assert configuracion.comprobar_uri('sqlite:///biblioteca.db') == 'sqlite:///biblioteca.db'
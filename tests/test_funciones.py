@@ -0,0 +1,22 @@
+from sqlalchemy import event, text
+
+import funciones
+from database import db
+
+
+def test_crear_autores_un_insert_por_trozo(app, sesion):
+    sentencias = []
+
+    def registrar(conexion, cursor, sql, parametros, contexto, executemany):
+        sentencias.append(sql)
+
+    event.listen(db.engine, 'before_cursor_execute', registrar)
+    try:
+        ids = funciones.crear_autores(sesion, [{'nombre': f'Autor {i}'} for i in range(1000)])
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', registrar)
+
+    inserts = [sql for sql in sentencias if sql.lstrip().upper().startswith('INSERT INTO AUTOR')]
+    assert len(inserts) == 1000 // funciones.TROZO
+    nombres = dict(sesion.execute(text('SELECT id, nombre FROM autor')).all())
+    assert [nombres[i] for i in ids] == [f'Autor {i}' for i in range(1000)]
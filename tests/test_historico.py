@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+import funciones
+import historico
+from database import db
+
+
+def test_un_prestamo_nuevo_no_reutiliza_el_id_de_uno_archivado(sesion):
+    autor_id, = funciones.crear_autores(sesion, [{'nombre': 'Autora'}])
+    libro_id, = funciones.crear_libros(sesion, [{'titulo': 'Libro', 'autor_id': autor_id, 'ejemplares': 2}])
+    usuario_id = funciones.crear_usuario(sesion, 'Lectora', 'lectora@example.org')
+    hace_dos_anios = date.today() - timedelta(days=730)
+    viejos = [
+        funciones.registrar_prestamo(sesion, libro_id, usuario_id, hace_dos_anios, hace_dos_anios + timedelta(days=14))
+        for _ in range(2)
+    ]
+    funciones.marcar_devoluciones(sesion, viejos)
+    sesion.commit()
+
+    assert historico.archivar(db.engine, dias=365, progreso=lambda mensaje: None) == 2
+
+    hoy = date.today()
+    nuevo = funciones.registrar_prestamo(sesion, libro_id, usuario_id, hoy, hoy + timedelta(days=14))
+    sesion.commit()
+    assert nuevo > max(viejos)
+    archivados = sesion.execute(text('SELECT id FROM prestamo_historico ORDER BY id')).scalars().all()
+    assert archivados == viejos
+
+
+def test_devolver_un_prestamo_archivado_informa_ya_devuelto(sesion):
+    autor_id, = funciones.crear_autores(sesion, [{'nombre': 'Autora'}])
+    libro_id, = funciones.crear_libros(sesion, [{'titulo': 'Libro', 'autor_id': autor_id}])
+    usuario_id = funciones.crear_usuario(sesion, 'Lectora', 'lectora@example.org')
+    hace_dos_anios = date.today() - timedelta(days=730)
+    viejo = funciones.registrar_prestamo(sesion, libro_id, usuario_id, hace_dos_anios, hace_dos_anios)
+    funciones.marcar_devolucion(sesion, viejo)
+    sesion.commit()
+    historico.archivar(db.engine, dias=365, progreso=lambda mensaje: None)
+
+    assert funciones.devolver_lote(sesion, [viejo, 999]) == {viejo: funciones.YA_DEVUELTO, 999: funciones.NO_EXISTE}
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from sqlalchemy import text
+
+import funciones
+import importacion
+from database import db
+
+
+def _escribir(ruta, registros):
+    ruta.write_text(''.join(json.dumps(r) + '\n' for r in registros), encoding='utf-8')
+    return str(ruta)
+
+
+def _titulos(sesion):
+    return sesion.execute(text('SELECT titulo FROM libro ORDER BY id')).scalars().all()
+
+
+def test_reanudar_tras_un_corte_no_duplica_filas(app, sesion, tmp_path, monkeypatch):
+    ruta = _escribir(tmp_path / 'libros.jsonl', [{'titulo': f'Libro {i}', 'autor': 'Autora'} for i in range(6)])
+    guardar = importacion.guardar_checkpoint
+    llamadas = []
+
+    def cortar_en_el_segundo_lote(conexion, ruta, estado):
+        llamadas.append(estado)
+        guardar(conexion, ruta, estado)
+        if len(llamadas) == 2:
+            raise RuntimeError('corte')
+
+    monkeypatch.setattr(importacion, 'guardar_checkpoint', cortar_en_el_segundo_lote)
+    with pytest.raises(RuntimeError):
+        importacion.importar(db.engine, 'libros', ruta, lote=2, progreso=lambda mensaje: None)
+    monkeypatch.setattr(importacion, 'guardar_checkpoint', guardar)
+
+    # El segundo lote y su checkpoint se deshicieron juntos
+    assert _titulos(sesion) == ['Libro 0', 'Libro 1']
+    with db.engine.connect() as conexion:
+        assert importacion.leer_checkpoint(conexion, ruta)['procesados'] == 2
+
+    resumen = importacion.importar(db.engine, 'libros', ruta, lote=2, reanudar=True, progreso=lambda mensaje: None)
+
+    assert resumen.insertados == 6
+    assert _titulos(sesion) == [f'Libro {i}' for i in range(6)]
+    with db.engine.connect() as conexion:
+        assert importacion.leer_checkpoint(conexion, ruta)['procesados'] == 0
+
+
+def test_prestamos_por_email_sin_distinguir_mayusculas(app, sesion, tmp_path):
+    autor_id, = funciones.crear_autores(sesion, [{'nombre': 'Autora'}])
+    libro_id, = funciones.crear_libros(sesion, [{'titulo': 'Libro', 'autor_id': autor_id}])
+    usuario_id = funciones.crear_usuario(sesion, 'Lectora', 'lectora@example.org')
+    sesion.commit()
+    ruta = _escribir(tmp_path / 'prestamos.jsonl', [
+        {'libro_id': libro_id, 'email': 'Lectora@Example.org', 'fecha_prestamo': '2026-01-10', 'devuelto': True},
+    ])
+
+    resumen = importacion.importar(db.engine, 'prestamos', ruta, progreso=lambda mensaje: None)
+
+    assert (resumen.insertados, resumen.rechazados) == (1, 0)
+    assert sesion.execute(text('SELECT usuario_id FROM prestamo')).scalars().all() == [usuario_id]
+
+
+def test_prestamos_de_usuarios_con_email_en_mayusculas(app, sesion, tmp_path):
+    autor_id, = funciones.crear_autores(sesion, [{'nombre': 'Autora'}])
+    libro_id, = funciones.crear_libros(sesion, [{'titulo': 'Libro', 'autor_id': autor_id, 'ejemplares': 2}])
+    usuario_id = funciones.crear_usuario(sesion, 'Ana', 'Ana@X.org')
+    sesion.commit()
+    ruta = _escribir(tmp_path / 'prestamos.jsonl', [
+        {'libro_id': libro_id, 'email': 'Ana@X.org', 'fecha_prestamo': '2026-01-10'},
+    ])
+
+    resumen = importacion.importar(db.engine, 'prestamos', ruta, progreso=lambda mensaje: None)
+
+    assert (resumen.insertados, resumen.rechazados) == (1, 0)
+    assert sesion.execute(text('SELECT usuario_id FROM prestamo')).scalars().all() == [usuario_id]
+    # El préstamo pendiente importado ocupa un ejemplar en la misma transacción
+    assert sesion.execute(
+        text('SELECT disponibles FROM disponibilidad WHERE libro_id = :id'), {'id': libro_id},
+    ).scalar() == 1
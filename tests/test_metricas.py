@@ -0,0 +1,19 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database import db
+
+
+def test_una_consulta_fallida_no_deja_inicios_en_la_conexion(app):
+    with db.engine.connect() as conexion:
+        with pytest.raises(OperationalError):
+            conexion.execute(text('SELECT * FROM tabla_que_no_existe'))
+        conexion.execute(text('SELECT 1'))
+        assert not conexion.info.get('metricas_inicio')
+
+
+def test_las_consultas_de_una_peticion_se_miden(cliente):
+    assert cliente.get('/usuarios').status_code == 200
+    expuesto = cliente.get('/metrics').get_data(as_text=True)
+    assert 'biblioteca_peticion_consultas_sql_count{ruta="/usuarios"} 1' in expuesto
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, event, text
+
+import funciones
+import recomendaciones
+from database import db
+
+
+def _similares(sesion, libro_ids):
+    return sesion.execute(
+        text('SELECT libro_id, posicion, similar_id, puntaje, comunes FROM libro_similar '
+             'WHERE libro_id IN :ids ORDER BY libro_id, posicion').bindparams(bindparam('ids', expanding=True)),
+        {'ids': libro_ids},
+    ).all()
+
+
+def test_actualizar_suma_solo_los_prestamos_nuevos(sesion, tmp_path):
+    ruta = str(tmp_path / 'recomendaciones.npz')
+    autor_id, = funciones.crear_autores(sesion, [{'nombre': 'Autora'}])
+    libros = funciones.crear_libros(sesion, [
+        {'titulo': f'Libro {i}', 'autor_id': autor_id, 'ejemplares': 10} for i in range(6)
+    ])
+    usuarios = funciones.crear_usuarios(sesion, [
+        {'nombre': f'Lector {i}', 'email': f'lector{i}@example.org'} for i in range(5)
+    ])
+    hace_un_mes = date.today() - timedelta(days=30)
+    # Dos grupos de lectores que no comparten libros
+    lecturas = [(0, 0), (0, 1), (1, 0), (1, 2), (2, 1), (2, 2), (3, 3), (3, 4), (4, 4), (4, 5)]
+    funciones.registrar_prestamos(sesion, [
+        {'libro_id': libros[l], 'usuario_id': usuarios[u], 'fecha_prestamo': hace_un_mes} for u, l in lecturas
+    ])
+    sesion.commit()
+    recomendaciones.calcular(db.engine, ruta, progreso=lambda mensaje: None)
+    # Un préstamo nuevo, aunque tenga fecha pasada (p. ej. importado)
+    funciones.registrar_prestamo(sesion, libros[3], usuarios[0], hace_un_mes, None)
+    sesion.commit()
+
+    sentencias = []
+
+    def registrar(conexion, cursor, sql, parametros, contexto, executemany):
+        sentencias.append(sql)
+
+    event.listen(db.engine, 'before_cursor_execute', registrar)
+    try:
+        total = recomendaciones.actualizar(db.engine, ruta, progreso=lambda mensaje: None)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', registrar)
+    afectados = [libros[0], libros[1], libros[3]]
+    incremental = _similares(sesion, afectados)
+
+    # Los libros del lector 0, sin volver a leer todos los préstamos
+    assert total == len(afectados)
+    assert str(recomendaciones.PARES) not in sentencias
+    # Las filas recalculadas son las mismas que da el cálculo completo
+    recomendaciones.calcular(db.engine, progreso=lambda mensaje: None)
+    assert incremental == _similares(sesion, afectados)
+    assert recomendaciones.actualizar(db.engine, ruta, progreso=lambda mensaje: None) == 0
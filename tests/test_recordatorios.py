@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+import funciones
+import recordatorios
+import vencidos
+from database import db
+
+
+def _vence_hoy(sesion):
+    """Un préstamo que vence hoy, con la tarea de vencidos ya corrida hoy: mañana estará vencido."""
+    autor_id, = funciones.crear_autores(sesion, [{'nombre': 'Autora'}])
+    libro_id, = funciones.crear_libros(sesion, [{'titulo': 'Libro', 'autor_id': autor_id}])
+    usuario_id = funciones.crear_usuario(sesion, 'Lectora', 'lectora@example.org')
+    hoy = date.today()
+    funciones.registrar_prestamo(sesion, libro_id, usuario_id, hoy - timedelta(days=14), hoy)
+    vencidos.actualizar(sesion, hoy)
+    sesion.commit()
+    return hoy + timedelta(days=1)
+
+
+def test_enviar_actualiza_los_vencidos_antes_de_leerlos(sesion, monkeypatch):
+    manana = _vence_hoy(sesion)
+    enviados = []
+
+    async def enviar(pool, correo):
+        enviados.append(correo['To'])
+
+    monkeypatch.setattr(recordatorios.PoolSMTP, 'enviar', enviar)
+    resumen = recordatorios.enviar(db.engine, hoy=manana, progreso=lambda mensaje: None)
+
+    assert (resumen.enviados, resumen.fallidos) == (1, 0)
+    assert enviados == ['lectora@example.org']
+
+
+def test_simular_cuenta_los_nuevos_vencidos_sin_guardarlos(sesion):
+    manana = _vence_hoy(sesion)
+
+    assert recordatorios.contar(db.engine, manana) == 1
+    assert sesion.execute(text('SELECT COUNT(*) FROM prestamo_vencido')).scalar() == 0
@@ -0,0 +1,39 @@
+import funciones
+from models import Usuario
+
+
+def _formulario(email, nombre='Ana'):
+    return {'nombre': nombre, 'email': email, 'telefono': '', 'rol': 'lector'}
+
+
+def test_crear_usuario_con_email_repetido(cliente, sesion):
+    funciones.crear_usuario(sesion, 'Ana', 'ana@example.org')
+    sesion.commit()
+
+    respuesta = cliente.post('/usuarios/crear', data=_formulario('ana@example.org', 'Otra Ana'))
+
+    assert respuesta.status_code == 200
+    assert 'Ya hay un usuario registrado con ese email.' in respuesta.get_data(as_text=True)
+    assert 'value="Otra Ana"' in respuesta.get_data(as_text=True)
+    assert sesion.query(Usuario).count() == 1
+
+
+def test_editar_usuario_con_email_repetido(cliente, sesion):
+    ana = funciones.crear_usuario(sesion, 'Ana', 'ana@example.org')
+    bea = funciones.crear_usuario(sesion, 'Bea', 'bea@example.org')
+    sesion.commit()
+
+    respuesta = cliente.post(f'/usuarios/editar/{bea}', data=_formulario('ana@example.org', 'Bea'))
+
+    assert respuesta.status_code == 200
+    assert 'Ya hay un usuario registrado con ese email.' in respuesta.get_data(as_text=True)
+    sesion.expire_all()
+    assert sesion.get(Usuario, bea).email == 'bea@example.org'
+    assert sesion.get(Usuario, ana).email == 'ana@example.org'
+
+
+def test_crear_usuario_redirige_al_listado(cliente, sesion):
+    respuesta = cliente.post('/usuarios/crear', data=_formulario('nueva@example.org'))
+
+    assert respuesta.status_code == 302
+    assert sesion.query(Usuario).filter_by(email='nueva@example.org').count() == 1
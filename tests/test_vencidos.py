@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+import funciones
+import vencidos
+
+
+def _prestamo_vencido(sesion, dias=3):
+    autor_id, = funciones.crear_autores(sesion, [{'nombre': 'Autora'}])
+    libro_id, = funciones.crear_libros(sesion, [{'titulo': 'Libro', 'autor_id': autor_id}])
+    usuario_id, = funciones.crear_usuarios(sesion, [{'nombre': 'Lectora', 'email': 'lectora@example.org'}])
+    hoy = date.today()
+    prestamo_id = funciones.registrar_prestamo(
+        sesion, libro_id, usuario_id, hoy - timedelta(days=30), hoy - timedelta(days=dias),
+    )
+    sesion.commit()
+    return prestamo_id, usuario_id
+
+
+def _usuarios_vencidos(sesion):
+    return sesion.execute(text('SELECT usuario_id, total FROM usuario_vencidos')).all()
+
+
+def test_devolver_saca_el_prestamo_de_los_vencidos(sesion):
+    prestamo_id, usuario_id = _prestamo_vencido(sesion)
+    assert [nombre for nombre, _, _ in vencidos.listar(sesion)] == ['Lectora']
+    assert _usuarios_vencidos(sesion) == [(usuario_id, 1)]
+
+    assert funciones.devolver_lote(sesion, [prestamo_id]) == {prestamo_id: funciones.DEVUELTO}
+    sesion.commit()
+
+    assert vencidos.listar(sesion) == []
+    assert _usuarios_vencidos(sesion) == []
+
+
+def test_devolucion_por_lote_desde_la_web(cliente, sesion):
+    prestamo_id, _ = _prestamo_vencido(sesion)
+
+    respuesta = cliente.post('/prestamos/devolver', data={'ids': str(prestamo_id)})
+
+    assert respuesta.status_code == 200
+    assert vencidos.listar(sesion) == []
+    assert _usuarios_vencidos(sesion) == []
+
+
+def test_prorrogar_saca_al_usuario_sin_vencidos(sesion):
+    prestamo_id, _ = _prestamo_vencido(sesion)
+
+    sesion.execute(
+        text('UPDATE prestamo SET fecha_devolucion = :fecha WHERE id = :id'),
+        {'fecha': date.today() + timedelta(days=7), 'id': prestamo_id},
+    )
+    sesion.commit()
+
+    assert vencidos.listar(sesion) == []
+    assert _usuarios_vencidos(sesion) == []
+
+
+def test_eliminar_el_libro_saca_al_usuario_sin_vencidos(sesion):
+    prestamo_id, _ = _prestamo_vencido(sesion)
+    libro_id = sesion.execute(text('SELECT libro_id FROM prestamo WHERE id = :id'), {'id': prestamo_id}).scalar()
+
+    funciones.eliminar_libro(sesion, libro_id)
+    sesion.commit()
+
+    assert _usuarios_vencidos(sesion) == []
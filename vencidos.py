@@ -0,0 +1,149 @@
+"""Seguimiento precalculado de préstamos vencidos.
+
+`prestamo_vencido` contiene los préstamos sin devolver cuya fecha de
+devolución ya pasó, y `usuario_vencidos` cuántos tiene cada usuario. Los
+triggers sobre `prestamo` mantienen ambas tablas al registrar, devolver,
+prorrogar o borrar un préstamo, y el usuario que se queda sin vencidos sale
+de `usuario_vencidos`. Lo único que no detecta un trigger es que cambie el
+día, y de eso se encarga `actualizar`: agrega los préstamos que vencieron
+desde la última corrida buscando por rango en el índice de pendientes, sin
+recorrer el historial.
+
+`actualizar` se puede correr por cron (`flask actualizar-vencidos`) o con el
+hilo de `iniciar_programador` (VENCIDOS_PROGRAMADOR=1), que se despierta poco
+después de medianoche.
+"""
+import logging
+import threading
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import DDL, Date, bindparam, event, text
+
+logger = logging.getLogger(__name__)
+
+TAREA = 'vencidos'
+
+# Condición de "vencido" dentro de los triggers; date('now', 'localtime') es el
+# mismo día que date.today() en la aplicación
+ESTA_VENCIDO = "COALESCE(new.devuelto, 0) = 0 AND new.fecha_devolucion < date('now', 'localtime')"
+
+DDL_SQLITE = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS prestamo_vencido_ai AFTER INSERT ON prestamo
+    WHEN {ESTA_VENCIDO} BEGIN
+        INSERT INTO prestamo_vencido (prestamo_id, usuario_id, fecha_devolucion)
+        VALUES (new.id, new.usuario_id, new.fecha_devolucion)
+        ON CONFLICT (prestamo_id) DO NOTHING;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS prestamo_vencido_au
+    AFTER UPDATE OF devuelto, fecha_devolucion, usuario_id ON prestamo BEGIN
+        DELETE FROM prestamo_vencido WHERE prestamo_id = old.id;
+        INSERT INTO prestamo_vencido (prestamo_id, usuario_id, fecha_devolucion)
+        SELECT new.id, new.usuario_id, new.fecha_devolucion WHERE {ESTA_VENCIDO};
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prestamo_vencido_ad AFTER DELETE ON prestamo BEGIN
+        DELETE FROM prestamo_vencido WHERE prestamo_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS usuario_vencidos_ai AFTER INSERT ON prestamo_vencido BEGIN
+        INSERT INTO usuario_vencidos (usuario_id, total) VALUES (new.usuario_id, 1)
+        ON CONFLICT (usuario_id) DO UPDATE SET total = total + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS usuario_vencidos_ad AFTER DELETE ON prestamo_vencido BEGIN
+        UPDATE usuario_vencidos SET total = total - 1 WHERE usuario_id = old.usuario_id;
+        DELETE FROM usuario_vencidos WHERE usuario_id = old.usuario_id AND total <= 0;
+    END
+    """,
+]
+
+AGREGAR_VENCIDOS = """
+    INSERT INTO prestamo_vencido (prestamo_id, usuario_id, fecha_devolucion)
+    SELECT id, usuario_id, fecha_devolucion FROM prestamo
+    WHERE devuelto = false AND fecha_devolucion < :hoy {desde}
+    ON CONFLICT (prestamo_id) DO NOTHING
+"""
+LEER_MARCA = text('SELECT fecha FROM estado_tarea WHERE tarea = :tarea').columns(fecha=Date)
+GUARDAR_MARCA = text("""
+    INSERT INTO estado_tarea (tarea, fecha) VALUES (:tarea, :fecha)
+    ON CONFLICT (tarea) DO UPDATE SET fecha = :fecha
+""").bindparams(bindparam('fecha', type_=Date))
+
+
+def registrar(metadata):
+    """Crea los triggers junto con las tablas en `db.create_all()`."""
+    for sentencia in DDL_SQLITE:
+        event.listen(metadata, 'after_create', DDL(sentencia).execute_if(dialect='sqlite'))
+
+
+def actualizar(conexion, hoy=None):
+    """Agrega los préstamos que vencieron desde la última corrida. Devuelve cuántos agregó."""
+    hoy = hoy or date.today()
+    marca = conexion.execute(LEER_MARCA, {'tarea': TAREA}).scalar()
+    consulta = text(AGREGAR_VENCIDOS.format(desde='')).bindparams(bindparam('hoy', type_=Date))
+    parametros = {'hoy': hoy}
+    if marca is not None:
+        # Sólo los que vencieron entre la última corrida y ayer
+        consulta = text(AGREGAR_VENCIDOS.format(desde='AND fecha_devolucion >= :desde')).bindparams(
+            bindparam('hoy', type_=Date), bindparam('desde', type_=Date),
+        )
+        parametros['desde'] = marca
+    agregados = conexion.execute(consulta, parametros).rowcount
+    conexion.execute(GUARDAR_MARCA, {'tarea': TAREA, 'fecha': hoy})
+    return agregados
+
+
+def reconstruir(conexion, hoy=None):
+    """Recalcula ambas tablas desde cero a partir de `prestamo`."""
+    hoy = hoy or date.today()
+    conexion.execute(text('DELETE FROM prestamo_vencido'))
+    conexion.execute(text('DELETE FROM usuario_vencidos'))
+    conexion.execute(text('DELETE FROM estado_tarea WHERE tarea = :tarea'), {'tarea': TAREA})
+    return actualizar(conexion, hoy)
+
+
+def listar(session):
+    """Usuarios con préstamos vencidos: (nombre, email, fecha_devolucion), los más antiguos primero."""
+    return session.execute(text("""
+        SELECT u.nombre, u.email, v.fecha_devolucion
+        FROM prestamo_vencido v JOIN usuario u ON u.id = v.usuario_id
+        ORDER BY v.fecha_devolucion, v.prestamo_id
+    """)).all()
+
+
+# ---------------------------
+# PROGRAMADOR EN PROCESO
+# ---------------------------
+def segundos_hasta_medianoche(ahora=None, margen=timedelta(minutes=1)):
+    ahora = ahora or datetime.now()
+    siguiente = datetime.combine(ahora.date() + timedelta(days=1), time()) + margen
+    return (siguiente - ahora).total_seconds()
+
+
+def iniciar_programador(engine):
+    """Lanza un hilo que ejecuta `actualizar` al arrancar y cada medianoche.
+
+    Pensado para despliegues de un solo proceso; con varios workers conviene
+    usar cron con `flask actualizar-vencidos` (correrlo dos veces no duplica nada).
+    """
+    detener = threading.Event()
+
+    def ciclo():
+        while not detener.is_set():
+            try:
+                with engine.begin() as conexion:
+                    agregados = actualizar(conexion)
+                logger.info('Vencidos actualizados: %d préstamos nuevos', agregados)
+            except Exception:
+                logger.exception('No se pudieron actualizar los préstamos vencidos')
+            detener.wait(segundos_hasta_medianoche())
+
+    hilo = threading.Thread(target=ciclo, name='vencidos', daemon=True)
+    hilo.start()
+    return detener
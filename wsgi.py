@@ -0,0 +1,16 @@
+"""Punto de entrada WSGI.
+
+    gunicorn --preload -w 4 wsgi:app
+
+Con `--preload` la aplicación (módulos, plantillas compiladas, rutas) se
+construye una vez en el proceso maestro y los workers nacen por fork ya
+listos; no hay conexiones abiertas que heredar y, si las hubiera, cada
+worker descarta el pool del padre (ver `configuracion.descartar_al_bifurcar`).
+Antes de arrancar, `flask compilar-plantillas` deja el bytecode de las
+plantillas en JINJA_CACHE_DIR para que ningún worker las compile al atender.
+El programador de vencidos (VENCIDOS_PROGRAMADOR=1) corre en un hilo, que no
+sobrevive al fork: con varios workers, usar cron con `flask actualizar-vencidos`.
+"""
+from app import create_app
+
+app = create_app()